@@ -1,3 +1,4 @@
 from django.contrib import admin
+from analytics.models import StageDurationRollup
 
-# Register your models here.
+admin.site.register(StageDurationRollup)
@@ -0,0 +1,30 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from analytics.services.stage_durations import rollup_stage_durations
+
+
+class Command(BaseCommand):
+    help = "Compute the daily stage duration rollups (yesterday by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--day", help="Last day to compute (YYYY-MM-DD)")
+        parser.add_argument(
+            "--days", type=int, default=1, help="Number of days to (re)compute"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            last_day = (
+                date.fromisoformat(options["day"])
+                if options["day"]
+                else timezone.localdate() - timedelta(days=1)
+            )
+        except ValueError:
+            raise CommandError(f"Invalid day: {options['day']}")
+
+        for offset in range(options["days"] - 1, -1, -1):
+            day = last_day - timedelta(days=offset)
+            rows = rollup_stage_durations(day)
+            self.stdout.write(f"{day}: {rows} rollups")
+        self.stdout.write(self.style.SUCCESS("Stage duration rollups computed"))
@@ -1,3 +1,35 @@
 from django.db import models
+from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.models.workorders import WorkOrder
 
-# Create your models here.
+
+class StageDurationRollup(models.Model):
+    """
+    Time spent by workorders in a stage, per workshop and day (the day the
+    stage was left). Precomputed from the transition log, see
+    analytics/services/stage_durations.py.
+    """
+
+    workshop = models.ForeignKey(
+        MechanicWorkshop, on_delete=models.CASCADE, related_name="stage_rollups"
+    )
+    day = models.DateField()
+    stage = models.CharField(max_length=16, choices=WorkOrder.Stage.choices)
+    samples = models.PositiveIntegerField(default=0)
+    p50_seconds = models.FloatField()
+    p90_seconds = models.FloatField()
+    avg_seconds = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Stage Duration Rollup"
+        verbose_name_plural = "Stage Duration Rollups"
+        ordering = ["day", "stage"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["workshop", "day", "stage"], name="uniq_stage_rollup_day"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.workshop_id} | {self.day} | {self.stage}"
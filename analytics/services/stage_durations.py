@@ -0,0 +1,83 @@
+from datetime import date, datetime, time, timedelta
+from django.db import connection, transaction
+from django.utils import timezone
+from analytics.models import StageDurationRollup
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderTransition
+
+# Time in a stage = from the previous stage change (or the workorder creation)
+# to the transition that leaves it. Only workorders that left a stage during
+# the day are read, through the (created_at) and (work_order, created_at)
+# covering indexes of the transition log.
+STAGE_DURATIONS_SQL = """
+WITH touched AS (
+    SELECT DISTINCT work_order_id
+    FROM {transitions}
+    WHERE created_at >= %(start)s AND created_at < %(end)s
+      AND from_stage IS DISTINCT FROM to_stage
+),
+stage_changes AS (
+    SELECT tr.workshop_id,
+           tr.from_stage AS stage,
+           tr.created_at AS left_at,
+           COALESCE(
+               LAG(tr.created_at) OVER (
+                   PARTITION BY tr.work_order_id ORDER BY tr.created_at, tr.id
+               ),
+               wo.created_at
+           ) AS entered_at
+    FROM {transitions} tr
+    JOIN touched ON touched.work_order_id = tr.work_order_id
+    JOIN {workorders} wo ON wo.id = tr.work_order_id
+    WHERE tr.from_stage IS DISTINCT FROM tr.to_stage AND tr.created_at < %(end)s
+),
+durations AS (
+    SELECT workshop_id, stage,
+           GREATEST(EXTRACT(EPOCH FROM left_at - entered_at), 0) AS seconds
+    FROM stage_changes
+    WHERE left_at >= %(start)s AND workshop_id IS NOT NULL AND stage IS NOT NULL
+)
+SELECT workshop_id, stage, COUNT(*),
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds),
+       percentile_cont(0.9) WITHIN GROUP (ORDER BY seconds),
+       AVG(seconds)
+FROM durations
+GROUP BY workshop_id, stage
+"""
+
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    """Start and end of `day` in the project time zone."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(
+        datetime.combine(day + timedelta(days=1), time.min)
+    )
+
+
+def rollup_stage_durations(day: date) -> int:
+    """(Re)compute the stage duration rollups of every workshop for `day`."""
+    quote = connection.ops.quote_name
+    sql = STAGE_DURATIONS_SQL.format(
+        transitions=quote(WorkOrderTransition._meta.db_table),
+        workorders=quote(WorkOrder._meta.db_table),
+    )
+    start, end = day_bounds(day)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"start": start, "end": end})
+        rows = cursor.fetchall()
+
+    rollups = [
+        StageDurationRollup(
+            workshop_id=workshop_id,
+            day=day,
+            stage=stage,
+            samples=samples,
+            p50_seconds=float(p50),
+            p90_seconds=float(p90),
+            avg_seconds=float(avg),
+        )
+        for workshop_id, stage, samples, p50, p90, avg in rows
+    ]
+    with transaction.atomic():
+        StageDurationRollup.objects.filter(day=day).delete()
+        StageDurationRollup.objects.bulk_create(rollups)
+    return len(rollups)
@@ -0,0 +1,194 @@
+from datetime import date, datetime, time, timedelta
+from uuid import UUID
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from core.ctmodels import Day
+from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderAssignment
+
+PERIOD_DAY = "day"
+PERIOD_WEEK = "week"
+PERIODS = (PERIOD_DAY, PERIOD_WEEK)
+
+# Reports that include today change as technicians work, past ones only when
+# a segment is edited (which bumps the workshop version, see analytics/signals.py)
+UTILIZATION_LIVE_TTL = 60
+UTILIZATION_PAST_TTL = 24 * 60 * 60
+
+ISO_WEEKDAYS = {
+    Day.MONDAY: 1,
+    Day.TUESDAY: 2,
+    Day.WEDNESDAY: 3,
+    Day.THURSDAY: 4,
+    Day.FRIDAY: 5,
+    Day.SATURDAY: 6,
+    Day.SUNDAY: 7,
+}
+# Used when a workshop has no working hours configured: the whole day counts
+ALL_DAY_SLOTS = [(weekday, "00:00", "24:00") for weekday in range(1, 8)]
+
+# Billed time per technician and period, clipped to the working hours.
+# Segments (open ones end now) are cut to the report range, split into the
+# local days they touch and intersected with that day's working windows, so
+# a segment crossing midnight or lunch only counts its hours inside windows.
+# Local days -> UTC bounds with AT TIME ZONE, so DST days have 23/25 hours.
+UTILIZATION_SQL = """
+WITH slots AS (
+    SELECT * FROM unnest(%(weekdays)s::int[], %(starts)s::time[], %(ends)s::time[])
+        AS s(weekday, start_time, end_time)
+),
+windows AS (
+    SELECT d::date AS day,
+           (d::date + s.start_time) AT TIME ZONE %(tz)s AS window_start,
+           (d::date + s.end_time) AT TIME ZONE %(tz)s AS window_end
+    FROM generate_series(%(from_day)s::date, %(to_day)s::date, interval '1 day') d
+    JOIN slots s ON s.weekday = EXTRACT(ISODOW FROM d)
+),
+segments AS (
+    SELECT a.assignee_id,
+           GREATEST(a.started_at, %(start)s) AS started_at,
+           LEAST(COALESCE(a.ended_at, NOW()), %(end)s) AS ended_at
+    FROM {assignments} a
+    JOIN {workorders} wo ON wo.id = a.work_order_id
+    WHERE wo.workshop_id = %(workshop_id)s
+      AND a.assignee_id IS NOT NULL
+      AND a.started_at < %(end)s
+      AND (a.ended_at IS NULL OR a.ended_at > %(start)s)
+),
+segment_days AS (
+    SELECT seg.assignee_id, seg.started_at, seg.ended_at, d::date AS day
+    FROM segments seg,
+         generate_series(
+             (seg.started_at AT TIME ZONE %(tz)s)::date,
+             (seg.ended_at AT TIME ZONE %(tz)s)::date,
+             interval '1 day'
+         ) d
+    WHERE seg.ended_at > seg.started_at
+),
+worked AS (
+    SELECT sd.assignee_id,
+           date_trunc(%(period)s, w.day::timestamp)::date AS period,
+           SUM(EXTRACT(EPOCH FROM
+               LEAST(sd.ended_at, w.window_end) - GREATEST(sd.started_at, w.window_start)
+           )) AS seconds
+    FROM segment_days sd
+    JOIN windows w
+      ON w.day = sd.day
+     AND sd.started_at < w.window_end
+     AND sd.ended_at > w.window_start
+    GROUP BY sd.assignee_id, 2
+),
+capacity AS (
+    SELECT date_trunc(%(period)s, day::timestamp)::date AS period,
+           SUM(EXTRACT(EPOCH FROM window_end - window_start)) AS seconds
+    FROM windows
+    GROUP BY 1
+)
+SELECT worked.assignee_id, worked.period, worked.seconds, capacity.seconds
+FROM worked
+JOIN capacity ON capacity.period = worked.period
+ORDER BY worked.period, worked.assignee_id
+"""
+
+
+def workshop_time_zone(workshop: MechanicWorkshop) -> str:
+    """IANA name of the workshop time zone (project default when invalid)."""
+    try:
+        return str(ZoneInfo(workshop.time_zone))
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return settings.TIME_ZONE
+
+
+def working_slots(workshop: MechanicWorkshop) -> list[tuple[int, str, str]]:
+    """(ISO weekday, start, end) of every active working hours slot."""
+    slots = [
+        (
+            ISO_WEEKDAYS[row.day],
+            row.time_slot.start.isoformat(),
+            row.time_slot.end.isoformat(),
+        )
+        for row in workshop.week_hours.filter(
+            deactivate_working_hours=False
+        ).select_related("time_slot")
+        if row.day in ISO_WEEKDAYS
+    ]
+    return slots or ALL_DAY_SLOTS
+
+
+def version_key(workshop_id: UUID) -> str:
+    return f"utilization-version:{workshop_id}"
+
+
+def bump_utilization_version(workshop_id: UUID) -> None:
+    """Invalidate every cached utilization report of a workshop."""
+    key = version_key(workshop_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def compute_utilization(
+    workshop: MechanicWorkshop, from_day: date, to_day: date, period: str
+) -> list[dict]:
+    """Billed hours per technician and day/week between two local dates (inclusive)."""
+    tz = workshop_time_zone(workshop)
+    zone = ZoneInfo(tz)
+    start = datetime.combine(from_day, time.min, tzinfo=zone)
+    end = datetime.combine(to_day + timedelta(days=1), time.min, tzinfo=zone)
+    weekdays, starts, ends = zip(*working_slots(workshop))
+
+    quote = connection.ops.quote_name
+    sql = UTILIZATION_SQL.format(
+        assignments=quote(WorkOrderAssignment._meta.db_table),
+        workorders=quote(WorkOrder._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "workshop_id": workshop.pk,
+                "tz": tz,
+                "period": period,
+                "from_day": from_day,
+                "to_day": to_day,
+                "start": start,
+                "end": end,
+                "weekdays": list(weekdays),
+                "starts": list(starts),
+                "ends": list(ends),
+            },
+        )
+        rows = cursor.fetchall()
+
+    return [
+        {
+            "assignee": str(assignee_id),
+            "period": period_start.isoformat(),
+            "billed_hours": round(float(worked) / 3600, 2),
+            "available_hours": round(float(available) / 3600, 2),
+            "utilization": (
+                round(float(worked) / float(available), 4) if available else None
+            ),
+        }
+        for assignee_id, period_start, worked, available in rows
+    ]
+
+
+def get_utilization(
+    workshop: MechanicWorkshop, from_day: date, to_day: date, period: str = PERIOD_DAY
+) -> list[dict]:
+    """`compute_utilization`, cached per (workshop, period, range)."""
+    version = cache.get(version_key(workshop.pk), 0)
+    key = f"utilization:{workshop.pk}:{version}:{period}:{from_day}:{to_day}"
+    report = cache.get(key)
+    if report is None:
+        report = compute_utilization(workshop, from_day, to_day, period)
+        live = to_day >= timezone.localdate(
+            timezone=ZoneInfo(workshop_time_zone(workshop))
+        )
+        cache.set(key, report, UTILIZATION_LIVE_TTL if live else UTILIZATION_PAST_TTL)
+    return report
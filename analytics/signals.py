@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from analytics.services.utilization import bump_utilization_version
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderAssignment
+
+
+# Cached utilization reports are stale once a segment changes
+@receiver(post_save, sender=WorkOrderAssignment)
+@receiver(post_delete, sender=WorkOrderAssignment)
+def invalidate_utilization(sender, instance, **kwargs):
+    workorder = instance._state.fields_cache.get("work_order")
+    if workorder is not None:
+        workshop_id = workorder.workshop_id
+    else:
+        workshop_id = (
+            WorkOrder.objects.filter(pk=instance.work_order_id)
+            .values_list("workshop_id", flat=True)
+            .first()
+        )
+    if workshop_id is not None:
+        bump_utilization_version(workshop_id)
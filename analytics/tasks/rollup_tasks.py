@@ -0,0 +1,13 @@
+from datetime import date, timedelta
+from django.utils import timezone
+from core.workers import worker
+from analytics.services.stage_durations import rollup_stage_durations
+
+
+@worker(queue="default")
+def rollup_daily_stage_durations(day: str | None = None) -> int:
+    """Roll up the stage durations of `day` (ISO date, yesterday by default). Run daily."""
+    target = (
+        date.fromisoformat(day) if day else timezone.localdate() - timedelta(days=1)
+    )
+    return rollup_stage_durations(target)
@@ -1,3 +1,174 @@
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
+from django.utils import timezone
+from analytics.models import StageDurationRollup
+from analytics.services.stage_durations import day_bounds, rollup_stage_durations
+from analytics.services.utilization import (
+    ALL_DAY_SLOTS,
+    PERIOD_DAY,
+    compute_utilization,
+    working_slots,
+)
+from core.ctmodels import Day, TimeSlot, WeekWorkingHours
+from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import (
+    WorkOrder,
+    WorkOrderAssignment,
+    WorkOrderTransition,
+)
+from mechanic_workshop.tests import create_member, create_workshop
+from users.models import WorkspaceMember
 
-# Create your tests here.
+MADRID = ZoneInfo("Europe/Madrid")
+# Monday
+MONDAY = date(2026, 10, 12)
+
+
+def local(day: date, hour: int, minute: int = 0) -> datetime:
+    return datetime.combine(day, time(hour, minute), tzinfo=MADRID)
+
+
+class UtilizationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.workspace, cls.workshop = create_workshop("B00000045")
+        cls.workshop.time_zone = "Europe/Madrid"
+        cls.workshop.save(update_fields=["time_zone"])
+        cls.technician = create_member(
+            cls.workspace,
+            "tech@example.com",
+            role=WorkspaceMember.WorkspaceRole.TECHNICHIAN,
+        )
+        vehicle = CustomerVehicle.objects.create(
+            main_workshop=cls.workshop, license_plate="4500UTL"
+        )
+        cls.workorder = WorkOrder.objects.create(
+            workshop=cls.workshop, customer_vehicle=vehicle
+        )
+
+    def add_hours(self, day: str, start: time, end: time) -> None:
+        WeekWorkingHours.objects.create(
+            time_slot=TimeSlot.objects.create(start=start, end=end),
+            day=day,
+            content_type=ContentType.objects.get_for_model(MechanicWorkshop),
+            object_id=self.workshop.pk,
+        )
+
+    def add_segment(self, started_at: datetime, ended_at: datetime | None) -> None:
+        WorkOrderAssignment.objects.create(
+            work_order=self.workorder,
+            assignee=self.technician,
+            started_at=started_at,
+            ended_at=ended_at,
+        )
+
+    def report(self, from_day: date, to_day: date) -> dict[str, tuple]:
+        rows = compute_utilization(self.workshop, from_day, to_day, PERIOD_DAY)
+        self.assertTrue(all(r["assignee"] == str(self.technician.pk) for r in rows))
+        return {r["period"]: (r["billed_hours"], r["available_hours"]) for r in rows}
+
+    def test_no_hours_configured_counts_the_whole_day(self):
+        self.assertEqual(working_slots(self.workshop), ALL_DAY_SLOTS)
+
+    def test_segment_crossing_midnight_is_split_by_day(self):
+        self.add_segment(local(MONDAY, 22), local(MONDAY + timedelta(days=1), 2))
+        self.assertEqual(
+            self.report(MONDAY, MONDAY + timedelta(days=1)),
+            {"2026-10-12": (2.0, 24.0), "2026-10-13": (2.0, 24.0)},
+        )
+
+    def test_segment_is_clipped_to_lunch_and_closing_time(self):
+        self.add_hours(Day.MONDAY, time(9), time(13))
+        self.add_hours(Day.MONDAY, time(15), time(19))
+        # 12:00-13:00 and 15:00-19:00 count, lunch and after 19:00 do not
+        self.add_segment(local(MONDAY, 12), local(MONDAY, 20))
+        self.assertEqual(self.report(MONDAY, MONDAY), {"2026-10-12": (5.0, 8.0)})
+
+    def test_segment_is_clipped_to_the_report_range(self):
+        self.add_segment(local(MONDAY, 20), local(MONDAY + timedelta(days=1), 3))
+        self.assertEqual(
+            self.report(MONDAY + timedelta(days=1), MONDAY + timedelta(days=1)),
+            {"2026-10-13": (3.0, 24.0)},
+        )
+
+    def test_open_segment_counts_until_now(self):
+        started_at = timezone.now() - timedelta(hours=2)
+        self.add_segment(started_at, None)
+        report = self.report(
+            timezone.localdate(started_at, timezone=MADRID),
+            timezone.localdate(timezone=MADRID),
+        )
+        self.assertAlmostEqual(
+            sum(billed for billed, _ in report.values()), 2.0, delta=0.05
+        )
+
+    def test_dst_days_have_23_and_25_hours(self):
+        # Clocks go forward on 2026-03-29 (02:00 -> 03:00) and back on 2026-10-25
+        spring, autumn = date(2026, 3, 29), date(2026, 10, 25)
+        self.add_segment(local(spring, 0), local(spring, 6))
+        self.add_segment(local(autumn, 0), local(autumn, 6))
+        self.assertEqual(self.report(spring, spring), {"2026-03-29": (5.0, 23.0)})
+        self.assertEqual(self.report(autumn, autumn), {"2026-10-25": (7.0, 25.0)})
+
+
+class StageDurationRollupTests(TestCase):
+    DAY = date(2026, 10, 12)
+
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.workshop = create_workshop("B00000043")
+        cls.vehicle = CustomerVehicle.objects.create(
+            main_workshop=cls.workshop, license_plate="4300STG"
+        )
+
+    def at(self, hour: int) -> datetime:
+        return day_bounds(self.DAY)[0] + timedelta(hours=hour)
+
+    def workorder(self, created_hour: int) -> WorkOrder:
+        workorder = WorkOrder.objects.create(
+            workshop=self.workshop, customer_vehicle=self.vehicle
+        )
+        WorkOrder.objects.filter(pk=workorder.pk).update(
+            created_at=self.at(created_hour)
+        )
+        return workorder
+
+    def transition(self, workorder, hour, from_stage, to_stage, to_status="OPEN"):
+        WorkOrderTransition.objects.create(
+            work_order=workorder,
+            workshop=self.workshop,
+            from_stage=from_stage,
+            to_stage=to_stage,
+            from_status="OPEN",
+            to_status=to_status,
+            created_at=self.at(hour),
+        )
+
+    def test_time_in_stage_since_creation_or_previous_change(self):
+        first, second = self.workorder(8), self.workorder(8)
+        self.transition(first, 9, "CHECKIN", "DIAGNOSIS")
+        self.transition(first, 12, "DIAGNOSIS", "REPAIR")
+        # Status only: does not end the REPAIR stage
+        self.transition(first, 13, "REPAIR", "REPAIR", to_status="ON_HOLD")
+        self.transition(second, 11, "CHECKIN", "DIAGNOSIS")
+        # Left the next day: not part of this day's rollup
+        self.transition(second, 30, "DIAGNOSIS", "REPAIR")
+
+        self.assertEqual(rollup_stage_durations(self.DAY), 2)
+        # Recomputing a day replaces its rollups
+        self.assertEqual(rollup_stage_durations(self.DAY), 2)
+
+        rollups = {r.stage: r for r in StageDurationRollup.objects.filter(day=self.DAY)}
+        self.assertEqual(set(rollups), {"CHECKIN", "DIAGNOSIS"})
+        checkin = rollups["CHECKIN"]
+        self.assertEqual(checkin.samples, 2)
+        self.assertEqual(checkin.p50_seconds, 2 * 3600)
+        self.assertAlmostEqual(checkin.p90_seconds, 2.8 * 3600)
+        self.assertEqual(checkin.avg_seconds, 2 * 3600)
+        self.assertEqual(
+            (rollups["DIAGNOSIS"].samples, rollups["DIAGNOSIS"].avg_seconds),
+            (1, 3 * 3600),
+        )
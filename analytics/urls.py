@@ -0,0 +1,7 @@
+from analytics.views import StageDurationsViewSet, UtilizationViewSet
+from rest_framework.routers import DefaultRouter
+
+router = DefaultRouter()
+router.register(r"stage-durations", StageDurationsViewSet, basename="stage-durations")
+router.register(r"utilization", UtilizationViewSet, basename="utilization")
+urlpatterns = router.urls
@@ -1,3 +1,127 @@
-from django.shortcuts import render
+from datetime import date, timedelta
+from django.utils import timezone
+from rest_framework import status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from analytics.models import StageDurationRollup
+from analytics.services.utilization import PERIOD_DAY, PERIODS, get_utilization
+from mechanic_workshop.models.base import MechanicWorkshop
+from workspace_modules.utils.memberships import (
+    WORKSPACE_MANAGER_ROLES,
+    get_workspace_membership,
+)
 
-# Create your views here.
+DEFAULT_ROLLUP_DAYS = 30
+MAX_ROLLUP_DAYS = 366
+
+
+class StageDurationsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """
+        Daily p50/p90 time spent per stage (`from`/`to` dates, last 30 days by
+        default), read from the precomputed rollups.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_MANAGER_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not allowed to see this workspace analytics"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            to_day = date.fromisoformat(
+                request.query_params.get("to") or timezone.localdate().isoformat()
+            )
+            from_day = date.fromisoformat(
+                request.query_params.get("from")
+                or (to_day - timedelta(days=DEFAULT_ROLLUP_DAYS - 1)).isoformat()
+            )
+        except ValueError:
+            return Response(
+                {"error": "Dates must be YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if from_day > to_day or (to_day - from_day).days >= MAX_ROLLUP_DAYS:
+            return Response(
+                {"error": f"The range must be 1 to {MAX_ROLLUP_DAYS} days"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = StageDurationRollup.objects.filter(
+            workshop_id=membership.workspace.main_business_id,
+            day__range=(from_day, to_day),
+        ).values("day", "stage", "samples", "p50_seconds", "p90_seconds", "avg_seconds")
+        return Response(
+            {"detail": "OK", "from": from_day, "to": to_day, "rollups": list(rows)},
+            status=status.HTTP_200_OK,
+        )
+
+
+class UtilizationViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """
+        Billed hours per technician and `period` (day or week) between the
+        `from`/`to` local dates (last 30 days by default), clipped to the
+        workshop working hours.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_MANAGER_ROLES,
+        )
+        workshop = (
+            MechanicWorkshop.objects.filter(
+                pk=membership.workspace.main_business_id
+            ).first()
+            if membership is not None
+            else None
+        )
+        if workshop is None:
+            return Response(
+                {"error": "You are not allowed to see this workspace analytics"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        period = request.query_params.get("period") or PERIOD_DAY
+        if period not in PERIODS:
+            return Response(
+                {"error": f"period must be one of {', '.join(PERIODS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            to_day = date.fromisoformat(
+                request.query_params.get("to") or timezone.localdate().isoformat()
+            )
+            from_day = date.fromisoformat(
+                request.query_params.get("from")
+                or (to_day - timedelta(days=DEFAULT_ROLLUP_DAYS - 1)).isoformat()
+            )
+        except ValueError:
+            return Response(
+                {"error": "Dates must be YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if from_day > to_day or (to_day - from_day).days >= MAX_ROLLUP_DAYS:
+            return Response(
+                {"error": f"The range must be 1 to {MAX_ROLLUP_DAYS} days"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "detail": "OK",
+                "from": from_day,
+                "to": to_day,
+                "period": period,
+                "utilization": get_utilization(workshop, from_day, to_day, period),
+            },
+            status=status.HTTP_200_OK,
+        )
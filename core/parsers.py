@@ -0,0 +1,7 @@
+from rest_framework.parsers import JSONParser
+
+
+class MergePatchJSONParser(JSONParser):
+    """Parses `application/merge-patch+json` bodies (RFC 7396)."""
+
+    media_type = "application/merge-patch+json"
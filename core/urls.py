@@ -29,4 +29,6 @@ urlpatterns = [
     path("api/v1/", include("workspace_modules.urls")),
     # Workspaces
     path("api/v1/mechanic-workshop/", include("mechanic_workshop.urls")),
+    # Analytics
+    path("api/v1/analytics/", include("analytics.urls")),
 ]
@@ -5,6 +5,7 @@ from datetime import datetime, time, date
 import pytz
 from django.core.validators import RegexValidator
 import re
+from typing import Any
 from nanoid import generate
 
 HEX_COLOR_VALIDATOR = RegexValidator(
@@ -119,3 +120,26 @@ def get_local_time(
 def collapse_inline_spaces(text: str) -> str:
     # Keep line breaks, but collapse runs of spaces/tabs
     return re.sub(r"[^\S\r\n]+", " ", text)
+
+
+def json_merge_patch(target: Any, patch: Any) -> Any:
+    """
+    Apply a JSON Merge Patch (RFC 7396) and return the patched document.
+
+    Objects are merged recursively, `null` removes a key and any other value
+    (including lists) replaces the previous one. `target` is not modified.
+
+    Example:
+        >>> json_merge_patch({"a": 1, "b": {"c": 2}}, {"b": {"c": None, "d": 3}})
+        {'a': 1, 'b': {'d': 3}}
+    """
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = json_merge_patch(result.get(key), value)
+    return result
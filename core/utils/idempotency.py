@@ -0,0 +1,114 @@
+import hashlib
+import json
+from functools import wraps
+from typing import Any, Callable
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from core.utils.locks import cache_lock
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAY_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How long the first response is kept
+IDEMPOTENCY_TTL = 24 * 60 * 60
+# Max time a request may hold the key while it is being processed
+IDEMPOTENCY_LOCK_TTL = 30
+# How long a concurrent duplicate waits for the first request to finish
+IDEMPOTENCY_WAIT = 5
+
+
+def request_fingerprint(request) -> str:
+    """Hash of what makes a write unique, to detect a key reused for another payload."""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    raw = f"{request.method}|{request.path}|{request.query_params.urlencode()}|{body}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Stored responses of idempotent requests, keyed by (scope, owner, key)."""
+
+    def __init__(self, scope: str, owner: Any, key: str):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        self.cache_key = f"idempotency:{scope}:{owner}:{digest}"
+        self.lock_key = f"{self.cache_key}:lock"
+
+    def get(self) -> dict[str, Any] | None:
+        return cache.get(self.cache_key)
+
+    def save(self, fingerprint: str, status_code: int, data: Any) -> None:
+        cache.set(
+            self.cache_key,
+            {"fingerprint": fingerprint, "status": status_code, "data": data},
+            IDEMPOTENCY_TTL,
+        )
+
+    @staticmethod
+    def replay(stored: dict[str, Any], fingerprint: str) -> Response:
+        if stored["fingerprint"] != fingerprint:
+            return Response(
+                {"error": "This Idempotency-Key was already used with another payload"},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(stored["data"], status=stored["status"])
+        response[IDEMPOTENCY_REPLAY_HEADER] = "true"
+        return response
+
+
+def idempotent(scope: str) -> Callable:
+    """
+    Make a write view method idempotent through the `Idempotency-Key` header.
+
+    - The first successful (2xx) response is stored for IDEMPOTENCY_TTL seconds.
+    - Retries with the same key get the stored response back without running
+      the view again (and without touching the database).
+    - Concurrent duplicates block on a short lock until the first request ends.
+    - Requests without the header are processed as usual.
+
+    Apply it on top of any `@transaction.atomic`, so the response is only
+    stored once the transaction has been committed.
+    """
+
+    def decorator(view_method: Callable) -> Callable:
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+
+            if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+                return Response(
+                    {"error": f"{IDEMPOTENCY_HEADER} is too long"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            store = IdempotencyStore(scope=scope, owner=request.user.pk, key=key)
+            fingerprint = request_fingerprint(request)
+
+            # Fast path: already processed
+            if stored := store.get():
+                return store.replay(stored, fingerprint)
+
+            with cache_lock(
+                store.lock_key,
+                timeout=IDEMPOTENCY_LOCK_TTL,
+                blocking_timeout=IDEMPOTENCY_WAIT,
+            ) as acquired:
+                if not acquired:
+                    return Response(
+                        {"error": "A request with this Idempotency-Key is in progress"},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
+                # The first request may have finished while we were waiting
+                if stored := store.get():
+                    return store.replay(stored, fingerprint)
+
+                response = view_method(self, request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    store.save(fingerprint, response.status_code, response.data)
+                return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,40 @@
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+from django.core.cache import cache
+
+
+@contextmanager
+def cache_lock(
+    key: str,
+    timeout: int = 30,
+    blocking_timeout: float = 0.0,
+    poll_interval: float = 0.05,
+) -> Iterator[bool]:
+    """
+    Short-lived distributed lock on top of the shared cache (Redis).
+
+    Yields True if the lock was acquired, False if it was still held by
+    someone else after waiting `blocking_timeout` seconds. The lock expires on
+    its own after `timeout` seconds, so a crashed holder never blocks forever.
+
+    Example:
+        >>> with cache_lock("lock:entrance:123", blocking_timeout=2) as acquired:
+        ...     if not acquired:
+        ...         raise Conflict()
+    """
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + blocking_timeout
+
+    acquired = cache.add(key, token, timeout)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        acquired = cache.add(key, token, timeout)
+
+    try:
+        yield acquired
+    finally:
+        # Never release a lock that expired and was taken by someone else
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
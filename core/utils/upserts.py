@@ -0,0 +1,46 @@
+from typing import Iterable, TypeVar
+from django.db import connection, models
+
+ModelT = TypeVar("ModelT", bound=models.Model)
+
+
+def upsert(
+    obj: ModelT, unique_fields: Iterable[str], update_fields: Iterable[str]
+) -> ModelT:
+    """
+    Insert `obj`, or update `update_fields` of the row that conflicts on
+    `unique_fields`, in a single INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+    `obj.pk` is set to the pk of the inserted or updated row.
+
+    Use it instead of bulk_create(update_conflicts=True) for models whose pk
+    has a client-side default (BaseUUID): Django never overwrites a pk that is
+    already set, so on conflict the object would keep a pk that is not in the
+    database.
+    """
+    meta = obj._meta
+    quote = connection.ops.quote_name
+    fields = [field for field in meta.concrete_fields if not field.generated]
+    values = [
+        field.get_db_prep_save(field.pre_save(obj, True), connection)
+        for field in fields
+    ]
+    conflict = ", ".join(quote(meta.get_field(name).column) for name in unique_fields)
+    updates = ", ".join(
+        f"{quote(column)} = EXCLUDED.{quote(column)}"
+        for column in (meta.get_field(name).column for name in update_fields)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(meta.db_table)} "
+            f"({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {updates} "
+            f"RETURNING {quote(meta.pk.column)}",
+            values,
+        )
+        obj.pk = meta.pk.to_python(cursor.fetchone()[0])
+
+    obj._state.adding = False
+    obj._state.db = connection.alias
+    return obj
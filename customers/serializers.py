@@ -1,5 +1,23 @@
 from rest_framework import serializers
 from users.models import WorkspaceMember, Account
+from users.utils.accounts import upsert_customer_account
+from core.utils.upserts import upsert
+from customers.models import CustomerExtraData
+from mechanic_workshop.serializers.vehicles import CustomerVehicleSummarySerializer
+from mechanic_workshop.serializers.workorders import WorkorderSummarySerializer
+from mechanic_workshop.serializers.appointments import AppointmentSummarySerializer
+
+CUSTOMER_PROFILE_FIELDS = [
+    "name",
+    "surname",
+    "phone",
+    "postal_code",
+    "country",
+    "city",
+    "address",
+    "tax_id",
+    "document_type",
+]
 
 
 class WorkshopCustomerSerializer(serializers.ModelSerializer):
@@ -44,44 +62,94 @@ class WorkshopCustomerCreateSerializer(serializers.ModelSerializer):
     def validate_email(self, v):
         return (v or "").strip().lower()
 
-    def create(self, validated_data):
-        mechanic_workshop = self.context.get("mechanic_workshop")
-        workspace = self.context.get("workspace")
-        if mechanic_workshop is None:
+    def validate(self, attrs):
+        # The customer Account is looked up by email, so it cannot be empty
+        if not attrs.get("email"):
             raise serializers.ValidationError(
-                {
-                    "mechanic_workshop": "Missing mechanic_workshop in serializer context."
-                }
+                {"email": ["An email is required to register the customer"]}
             )
+        return attrs
+
+    def create(self, validated_data):
+        workspace = self.context.get("workspace")
         if workspace is None:
             raise serializers.ValidationError(
                 {"workspace": "Missing workspace in serializer context."}
             )
 
         email = validated_data["email"]
-        # Check if we have an Account for this email, if not, just create it
-        account, account_created = Account.objects.get_or_create(email=email)
-        print("account_created: ", account_created, "account: ", account)
+        # Create the basic Account for this email or reuse the existing one
+        account = upsert_customer_account(
+            email=email,
+            first_name=validated_data.get("name"),
+            last_name=validated_data.get("surname"),
+        )
 
+        # Only overwrite what was actually sent
         defaults = {
-            "name": validated_data.get("name"),
-            "surname": validated_data.get("surname"),
-            "phone": validated_data.get("phone"),
-            "postal_code": validated_data.get("postal_code"),
-            "country": validated_data.get("country"),
-            "city": validated_data.get("city"),
-            "address": validated_data.get("address"),
-            "tax_id": validated_data.get("tax_id"),
-            "document_type": validated_data.get("document_type"),
+            field: validated_data[field]
+            for field in CUSTOMER_PROFILE_FIELDS
+            if field in validated_data
         }
 
-        obj, created = WorkspaceMember.objects.update_or_create(
-            workspace=workspace,
-            account=account,
-            email=email,
-            defaults=defaults,
+        # Single INSERT ... ON CONFLICT (workspace, account) DO UPDATE
+        obj = WorkspaceMember(workspace=workspace, account=account, email=email)
+        for field, value in defaults.items():
+            setattr(obj, field, value)
+        return upsert(
+            obj,
+            unique_fields=["workspace", "account"],
+            update_fields=[*defaults, "email", "updated_at"],
         )
 
-        # Just to know if it was created or updated
-        self._created = created
-        return obj
+
+class CustomerExtraDataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomerExtraData
+        fields = ["id", "version", "comments"]
+        read_only_fields = fields
+
+
+class WorkshopCustomerOverviewSerializer(WorkshopCustomerSerializer):
+    """
+    Customer card ("customer 360"). Every nested list is read from the
+    `to_attr` of a bounded Prefetch, so no query is issued while serializing.
+    """
+
+    owned_vehicles = CustomerVehicleSummarySerializer(
+        many=True, read_only=True, source="owned_vehicles_list"
+    )
+    authorized_vehicles = CustomerVehicleSummarySerializer(
+        many=True, read_only=True, source="authorized_vehicles_list"
+    )
+    recent_workorders = WorkorderSummarySerializer(many=True, read_only=True)
+    upcoming_appointments = AppointmentSummarySerializer(many=True, read_only=True)
+    extra_data = CustomerExtraDataSerializer(
+        many=True, read_only=True, source="extra_data_list"
+    )
+    counts = serializers.SerializerMethodField()
+
+    class Meta(WorkshopCustomerSerializer.Meta):
+        # document_number and state are not WorkspaceMember fields
+        fields = [
+            field
+            for field in WorkshopCustomerSerializer.Meta.fields
+            if field not in ("document_number", "state")
+        ] + [
+            "tax_id",
+            "owned_vehicles",
+            "authorized_vehicles",
+            "recent_workorders",
+            "upcoming_appointments",
+            "extra_data",
+            "counts",
+        ]
+
+    def get_counts(self, obj: WorkspaceMember) -> dict[str, int]:
+        # Totals are annotated on the main query, the lists above are truncated
+        return {
+            "owned_vehicles": obj.owned_vehicles_count,
+            "authorized_vehicles": obj.authorized_vehicles_count,
+            "workorders": obj.workorders_count,
+            "upcoming_appointments": obj.upcoming_appointments_count,
+        }
@@ -1,3 +1,107 @@
+from datetime import timedelta
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
+from django.utils import timezone
+from customers.models import CustomerExtraData
+from customers.serializers import WorkshopCustomerOverviewSerializer
+from customers.views import get_customer_overview_queryset
+from mechanic_workshop.models.appointments import Appointment
+from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder
+from users.models import Account, WorkspaceMember
+from workspace_modules.models.base import Workspace
 
-# Create your tests here.
+# Member row + owned vehicles, authorized vehicles, workorders,
+# appointments and extra data prefetches
+OVERVIEW_QUERIES = 6
+
+
+class CustomerOverviewQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.workshop = MechanicWorkshop.objects.create(
+            business_name="Talleres Test", tax_id="B00000027", email="t@example.com"
+        )
+        cls.workspace = Workspace.objects.create(
+            short_name="Talleres Test",
+            main_business_ct=ContentType.objects.get_for_model(MechanicWorkshop),
+            main_business_id=cls.workshop.pk,
+        )
+        account = Account.objects.create_user(email="customer@example.com")
+        cls.customer = WorkspaceMember.objects.create(
+            workspace=cls.workspace,
+            account=account,
+            role=WorkspaceMember.WorkspaceRole.CUSTOMER,
+            name="Ana",
+            tax_id="00000000T",
+        )
+        cls.next_plate = 0
+
+    def add_related_rows(self, count: int) -> None:
+        """Give the customer `count` more rows of every nested list."""
+        for _ in range(count):
+            self.next_plate += 1
+            vehicle = CustomerVehicle.objects.create(
+                main_workshop=self.workshop,
+                owner=self.customer,
+                license_plate=f"{self.next_plate:04d}TST",
+            )
+            vehicle.authorized_people.add(self.customer)
+            WorkOrder.objects.create(
+                workshop=self.workshop,
+                customer_vehicle=vehicle,
+                vehicle_presenter=self.customer,
+            )
+            Appointment.objects.create(
+                workshop=self.workshop,
+                workshop_customer=self.customer,
+                customer_vehicle=vehicle,
+                appointment_start=timezone.now() + timedelta(days=self.next_plate),
+            )
+            CustomerExtraData.objects.create(
+                customer=self.customer, version=self.next_plate
+            )
+
+    def serialize_overview(self, limit: int) -> dict:
+        customer = get_customer_overview_queryset(
+            workspace_id=self.workspace.pk, limit=limit
+        ).get(pk=self.customer.pk)
+        return WorkshopCustomerOverviewSerializer(customer).data
+
+    def test_query_count_does_not_grow_with_related_rows(self):
+        self.add_related_rows(1)
+        with self.assertNumQueries(OVERVIEW_QUERIES):
+            self.serialize_overview(limit=10)
+
+        self.add_related_rows(14)
+        with self.assertNumQueries(OVERVIEW_QUERIES):
+            data = self.serialize_overview(limit=10)
+
+        for field in (
+            "owned_vehicles",
+            "authorized_vehicles",
+            "recent_workorders",
+            "upcoming_appointments",
+            "extra_data",
+        ):
+            self.assertEqual(len(data[field]), 10, field)
+        self.assertEqual(
+            data["counts"],
+            {
+                "owned_vehicles": 15,
+                "authorized_vehicles": 15,
+                "workorders": 15,
+                "upcoming_appointments": 15,
+            },
+        )
+
+    def test_nested_lists_are_newest_or_next_first(self):
+        self.add_related_rows(3)
+        data = self.serialize_overview(limit=2)
+
+        self.assertEqual(
+            [row["license_plate"] for row in data["upcoming_appointments"]],
+            ["0001TST", "0002TST"],
+        )
+        self.assertEqual([row["version"] for row in data["extra_data"]], [3, 2])
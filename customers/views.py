@@ -3,11 +3,127 @@ from rest_framework import viewsets
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from customers.serializers import WorkshopCustomerSerializer
+from customers.serializers import (
+    WorkshopCustomerSerializer,
+    WorkshopCustomerOverviewSerializer,
+)
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
+from django.db.models import Q, Count, OuterRef, Prefetch, QuerySet, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from customers.models import CustomerExtraData
+from mechanic_workshop.models.appointments import Appointment, AppointmentStatus
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder
 from rest_framework.decorators import action
 from users.models import WorkspaceMember
+from core.utils.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    streaming_export_response,
+)
+from workspace_modules.utils.memberships import (
+    WORKSPACE_MANAGER_ROLES,
+    get_workspace_membership,
+)
+
+CUSTOMER_EXPORT_FIELDS = [
+    "uuid",
+    "created_at",
+    "updated_at",
+    "name",
+    "surname",
+    "alias",
+    "email",
+    "phone",
+    "birth_date",
+    "tax_id",
+    "document_type",
+    "address",
+    "postal_code",
+    "city",
+    "country",
+]
+
+# Bounds for the nested lists of the customer overview
+OVERVIEW_DEFAULT_LIMIT = 10
+OVERVIEW_MAX_LIMIT = 50
+CLOSED_APPOINTMENT_STATUSES = [
+    AppointmentStatus.COMPLETED,
+    AppointmentStatus.NO_SHOW,
+    AppointmentStatus.CANCELED,
+]
+
+
+def _count_subquery(queryset: QuerySet, outer_field: str) -> Coalesce:
+    """COUNT(*) of `queryset` rows pointing to the outer row, as a subquery."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{outer_field: OuterRef("pk")})
+            .order_by()
+            .values(outer_field)
+            .annotate(total=Count("*"))
+            .values("total")[:1]
+        ),
+        0,
+    )
+
+
+def get_customer_overview_queryset(workspace_id: str, limit: int) -> QuerySet:
+    """
+    Customer 360 queryset: the member row plus one query per nested list,
+    whatever the amount of related rows (1 + 5 queries).
+    """
+    now = timezone.now()
+    upcoming_appointments = Appointment.objects.filter(
+        appointment_start__gte=now
+    ).exclude(status__in=CLOSED_APPOINTMENT_STATUSES)
+
+    return (
+        WorkspaceMember.objects.filter(workspace_id=workspace_id)
+        .annotate(
+            owned_vehicles_count=_count_subquery(CustomerVehicle.objects, "owner"),
+            authorized_vehicles_count=_count_subquery(
+                CustomerVehicle.objects, "authorized_people"
+            ),
+            workorders_count=_count_subquery(WorkOrder.objects, "vehicle_presenter"),
+            upcoming_appointments_count=_count_subquery(
+                upcoming_appointments, "workshop_customer"
+            ),
+        )
+        .prefetch_related(
+            Prefetch(
+                "owned_vehicles",
+                queryset=CustomerVehicle.objects.order_by("-updated_at")[:limit],
+                to_attr="owned_vehicles_list",
+            ),
+            Prefetch(
+                "authorized_vehicles",
+                queryset=CustomerVehicle.objects.order_by("-updated_at")[:limit],
+                to_attr="authorized_vehicles_list",
+            ),
+            Prefetch(
+                "vehicles_presented_to_workshops",
+                queryset=WorkOrder.objects.select_related("customer_vehicle").order_by(
+                    "-created_at"
+                )[:limit],
+                to_attr="recent_workorders",
+            ),
+            Prefetch(
+                "customer_appointments",
+                queryset=upcoming_appointments.select_related(
+                    "customer_vehicle"
+                ).order_by("appointment_start")[:limit],
+                to_attr="upcoming_appointments",
+            ),
+            Prefetch(
+                "extra_data",
+                queryset=CustomerExtraData.objects.order_by("-version")[:limit],
+                to_attr="extra_data_list",
+            ),
+        )
+    )
 
 
 class SmallResultsSetPagination(PageNumberPagination):
@@ -52,3 +168,84 @@ class WorkshopCustomersViewSet(viewsets.ModelViewSet):
         serializer = WorkshopCustomerSerializer(page, many=True)
 
         return paginator.get_paginated_response({"data": serializer.data, "query": q})
+
+    @action(detail=True, methods=["get"], url_path="overview")
+    def overview(self, request, pk=None):
+        """
+        Everything needed to open a customer card in a fixed number of queries:
+        vehicles (owned/authorized), recent workorders, upcoming appointments
+        and extra data. Nested lists are bounded by `?limit=` (default 10).
+        """
+        membership = get_workspace_membership(
+            account=request.user, workspace_id=request.query_params.get("wsId")
+        )
+        if membership is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            limit = int(request.query_params.get("limit", OVERVIEW_DEFAULT_LIMIT))
+        except ValueError:
+            limit = OVERVIEW_DEFAULT_LIMIT
+        limit = max(1, min(limit, OVERVIEW_MAX_LIMIT))
+
+        try:
+            customer = (
+                get_customer_overview_queryset(
+                    workspace_id=membership.workspace_id, limit=limit
+                )
+                .filter(pk=pk)
+                .first()
+            )
+        except ValidationError:  # Malformed UUID
+            customer = None
+
+        if customer is None:
+            return Response(
+                {"error": "Customer not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = WorkshopCustomerOverviewSerializer(customer)
+        return Response({"data": serializer.data}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export(self, request):
+        """
+        Stream every customer of the workspace as CSV or NDJSON.
+        Rows are read through a server-side cursor with a `values()` projection,
+        so memory stays flat regardless of the workspace size.
+        """
+        export_format = (request.query_params.get("fmt") or "csv").lower()
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unsupported export format: {export_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_MANAGER_ROLES,
+        )
+        if membership is None:
+            return Response(
+                {"error": "You are not allowed to export this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        rows = (
+            WorkspaceMember.objects.filter(workspace_id=membership.workspace_id)
+            .order_by("created_at", "pk")
+            .values(*CUSTOMER_EXPORT_FIELDS)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_export_response(
+            request,
+            rows=rows,
+            fields=CUSTOMER_EXPORT_FIELDS,
+            export_format=export_format,
+            filename=f"customers-{membership.workspace_id}",
+        )
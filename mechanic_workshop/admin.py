@@ -14,8 +14,12 @@ from mechanic_workshop.models.workorders import (
     ReplacementPart,
     WorkOrderAssignment,
     Discount,
+    WorkOrderTransition,
+    WorkOrderDocument,
 )
 from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.sync import SyncTombstone
+from mechanic_workshop.models.counters import WorkshopCounter
 
 # Base
 admin.site.register(MechanicWorkshop)
@@ -37,5 +41,10 @@ admin.site.register(WorkOrderAssignment)
 admin.site.register(Discount)
 admin.site.register(ReplacementPart)
 admin.site.register(WorkOrderDamageSketch)
+admin.site.register(WorkOrderTransition)
+admin.site.register(WorkOrderDocument)
+admin.site.register(WorkshopCounter)
 # Customer Vehicles
 admin.site.register(CustomerVehicle)
+# Sync
+admin.site.register(SyncTombstone)
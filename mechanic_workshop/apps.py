@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class MechanicWorkshopConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mechanic_workshop"
+
+    def ready(self):
+        # Register signal receivers
+        from mechanic_workshop import signals  # noqa: F401
+
+        # `__trigram_similar` (also registered by django.contrib.postgres)
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.db.models import CharField
+
+        CharField.register_lookup(TrigramSimilar)
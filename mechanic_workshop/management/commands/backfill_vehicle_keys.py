@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from mechanic_workshop.utils.vehicles import backfill_vehicle_keys
+
+
+class Command(BaseCommand):
+    help = "Fill the canonical plate/VIN keys and the plate search key of existing vehicles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Also run by migrate when vehicles are missing their keys
+        updated, duplicates = backfill_vehicle_keys(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} vehicles"))
+        if duplicates:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(duplicates)} vehicles share a plate or VIN with another "
+                    f"one and were left without it (merge them by hand): "
+                    f"{sorted(duplicates)[:50]}"
+                )
+            )
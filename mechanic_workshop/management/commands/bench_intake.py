@@ -0,0 +1,104 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from mechanic_workshop.services.intake import (
+    INTAKE_QUERY_BUDGET,
+    EntranceIntakeService,
+)
+from users.models import Account
+
+SAVEPOINT_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+def build_payload(i: int, customer: int) -> dict:
+    return {
+        "customer": {
+            "name": "Bench",
+            "surname": f"Customer {customer}",
+            "email": f"bench.intake.{customer}@example.com",
+            "phone": f"+34600{customer:06d}",
+            "tax_id": {"value": f"BENCH{customer:06d}", "document_type": "DNI"},
+            "is_vehicle_owner": True,
+        },
+        "vehicle": {
+            "brand": "Seat",
+            "model": "Ibiza",
+            "license_plate": f"{i:04d}BNC",
+            "fuel_type": "PETROL",
+        },
+        "workorder": {
+            "description": "Benchmark entrance",
+            "mileage": 120000,
+            "damage": {"front": [[[10, 10], [20, 20], [30, 25]]]},
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark of the entrance intake pipeline. Runs inside a "
+        "transaction that is rolled back, and fails if an entrance exceeds "
+        "the query budget."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workspace", required=True, help="Workspace wid")
+        parser.add_argument("--email", required=True, help="Caller account email")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--customers",
+            type=int,
+            help="Distinct customers (default: half of the iterations, so the "
+            "other half are returning customers)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            caller = Account.objects.get(email=options["email"])
+        except Account.DoesNotExist:
+            raise CommandError(f"Unknown account: {options['email']}")
+
+        customers = max(1, options["customers"] or options["iterations"] // 2)
+        timings: list[float] = []
+        query_counts: list[int] = []
+
+        with transaction.atomic():
+            for i in range(options["iterations"]):
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    intake = EntranceIntakeService.for_caller(
+                        account=caller, workspace_id=options["workspace"]
+                    )
+                    intake.run(build_payload(i, customer=i % customers))
+                    timings.append((time.perf_counter() - started) * 1000)
+
+                query_counts.append(
+                    sum(
+                        1
+                        for q in ctx.captured_queries
+                        if not q["sql"].startswith(SAVEPOINT_PREFIXES)
+                    )
+                )
+
+            # Never keep the benchmark rows
+            transaction.set_rollback(True)
+
+        # The first entrance of a workshop may also seed its workorder counter
+        steady_counts = query_counts[1:] or query_counts
+        max_queries = max(steady_counts)
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        self.stdout.write(
+            f"entrances: {len(timings)} | mean: {statistics.mean(timings):.2f} ms | "
+            f"p50: {statistics.median(timings):.2f} ms | p95: {p95:.2f} ms | "
+            f"queries: max {max_queries} (budget {INTAKE_QUERY_BUDGET})"
+        )
+
+        if max_queries > INTAKE_QUERY_BUDGET:
+            raise CommandError(
+                f"Intake query budget exceeded: {max_queries} > {INTAKE_QUERY_BUDGET}"
+            )
+        self.stdout.write(self.style.SUCCESS("Intake query budget respected"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from mechanic_workshop.models.workorders import WorkOrder
+from mechanic_workshop.services.totals import (
+    TOTALS_BATCH_SIZE,
+    refresh_workorder_totals,
+)
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized totals of workorders, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workshop", help="Only this workshop (uuid)")
+        parser.add_argument("--batch-size", type=int, default=TOTALS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        workorders = WorkOrder.objects.order_by("pk")
+        if options["workshop"]:
+            workorders = workorders.filter(workshop_id=options["workshop"])
+
+        batch_size = options["batch_size"]
+        updated, last_pk = 0, 0
+        # Keyset batches: each one is a single SELECT of ids + a single UPDATE
+        while ids := list(
+            workorders.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size]
+        ):
+            updated += refresh_workorder_totals(ids)
+            last_pk = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {updated} workorders"))
@@ -125,6 +125,10 @@ class Appointment(BaseTimestamp):
                 name="ck_appt_start_before_end",
             ),
         ]
+        indexes = [
+            # Delta sync ("changes since")
+            models.Index(fields=["workshop", "updated_at"]),
+        ]
 
     def __str__(self):
         who = self.workshop_customer or self.customer_vehicle or "Unassigned"
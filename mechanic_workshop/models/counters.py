@@ -0,0 +1,120 @@
+from typing import Callable
+from django.conf import settings
+from django.db import ProgrammingError, connection, models, transaction
+from mechanic_workshop.models.base import MechanicWorkshop
+
+# Numbering modes (settings.WORKSHOP_NUMBERING_MODE)
+# - gapless: counter row incremented in the caller's transaction. A rolled
+#   back check-in gives its number back, and concurrent check-ins of the same
+#   workshop wait for each other only until the first one commits.
+# - sequence: one Postgres sequence per (workshop, counter). Never blocks,
+#   but numbers of rolled back transactions are lost (gaps).
+NUMBERING_GAPLESS = "gapless"
+NUMBERING_SEQUENCE = "sequence"
+
+
+def get_numbering_mode() -> str:
+    return getattr(settings, "WORKSHOP_NUMBERING_MODE", NUMBERING_GAPLESS)
+
+
+class WorkshopCounter(models.Model):
+    """
+    Last number handed out per (workshop, counter name), e.g. workorders.
+    Always updated with raw `UPDATE ... RETURNING`, see `next_value`.
+    """
+
+    workshop = models.ForeignKey(
+        MechanicWorkshop, on_delete=models.CASCADE, related_name="counters"
+    )
+    name = models.CharField(max_length=32)
+    value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Workshop Counter"
+        verbose_name_plural = "Workshop Counters"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["workshop", "name"], name="uniq_workshop_counter_name"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.workshop_id} | {self.name} = {self.value}"
+
+    @classmethod
+    def next_value(
+        cls, workshop_id, name: str, seed: Callable[[], int] | None = None
+    ) -> int:
+        """
+        Return the next number of the counter `name` for a workshop.
+
+        `seed` returns the last number already used (e.g. MAX over existing
+        rows); it is only called the first time a counter is used.
+        """
+        if get_numbering_mode() == NUMBERING_SEQUENCE:
+            return cls._next_from_sequence(workshop_id, name, seed)
+        return cls._next_from_table(workshop_id, name, seed)
+
+    @classmethod
+    def _next_from_table(cls, workshop_id, name, seed) -> int:
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            # Common path: a single statement that locks only this counter row
+            cursor.execute(
+                f"UPDATE {table} SET value = value + 1 "
+                "WHERE workshop_id = %s AND name = %s RETURNING value",
+                [workshop_id, name],
+            )
+            row = cursor.fetchone()
+            if row is not None:
+                return row[0]
+
+            # First number of the workshop. If another transaction creates the
+            # row meanwhile, ON CONFLICT turns the insert into the increment.
+            cursor.execute(
+                f"INSERT INTO {table} (workshop_id, name, value) VALUES (%s, %s, %s) "
+                f"ON CONFLICT (workshop_id, name) DO UPDATE "
+                f"SET value = {table}.value + 1 RETURNING value",
+                [workshop_id, name, (seed() if seed else 0) + 1],
+            )
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def sequence_name(workshop_id, name: str) -> str:
+        return f"wsc_{name}_{str(workshop_id).replace('-', '')}"
+
+    @classmethod
+    def create_sequence(cls, workshop_id, name: str, start: int = 1) -> None:
+        """
+        Create the sequence of a counter if it does not exist yet. Sequences
+        are created with the workshop and on migrate (see signals.py), not
+        while numbering. CREATE SEQUENCE IF NOT EXISTS alone is not safe when
+        two transactions create the same sequence (both pass the check and
+        one fails on pg_class), so creations are serialized with an advisory
+        lock held until the creating transaction ends.
+        """
+        sequence = cls.sequence_name(workshop_id, name)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [sequence])
+            cursor.execute(
+                f"CREATE SEQUENCE IF NOT EXISTS {connection.ops.quote_name(sequence)} "
+                f"START WITH {int(start)}"
+            )
+
+    @classmethod
+    def _next_from_sequence(cls, workshop_id, name, seed) -> int:
+        sequence = cls.sequence_name(workshop_id, name)
+        with connection.cursor() as cursor:
+            try:
+                # Savepoint: a missing sequence must not abort the caller's transaction
+                with transaction.atomic():
+                    cursor.execute("SELECT nextval(%s)", [sequence])
+                    return cursor.fetchone()[0]
+            except ProgrammingError:
+                pass
+
+            # Workshop numbered before the sequence mode was enabled and
+            # not migrated since: create it now, racing numbering requests
+            cls.create_sequence(workshop_id, name, start=(seed() if seed else 0) + 1)
+            cursor.execute("SELECT nextval(%s)", [sequence])
+            return cursor.fetchone()[0]
@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SyncTombstone(models.Model):
+    """
+    Deletion record read by the delta sync endpoint, so tablets can drop rows
+    that no longer exist. Scopes are plain columns (no FKs) on purpose: the
+    tombstones of a deleted workspace/workshop must be writable during the
+    cascade and are pruned after SYNC_TOMBSTONE_RETENTION.
+    """
+
+    # Rows scoped by workspace (WorkspaceMember)
+    workspace_id = models.CharField(max_length=12, null=True, blank=True)
+    # Rows scoped by workshop (CustomerVehicle, WorkOrder, Appointment)
+    workshop_id = models.UUIDField(null=True, blank=True)
+
+    model = models.CharField(max_length=32)  # e.g. "vehicles"
+    object_id = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Sync Tombstone"
+        verbose_name_plural = "Sync Tombstones"
+        ordering = ["deleted_at", "id"]
+        indexes = [
+            models.Index(fields=["workspace_id", "deleted_at", "id"]),
+            models.Index(fields=["workshop_id", "deleted_at", "id"]),
+            models.Index(fields=["deleted_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id} @ {self.deleted_at.isoformat()}"
@@ -1,5 +1,12 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models import F, Q
 from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.utils.identifiers import (
+    canonical_plate,
+    canonical_vin,
+    search_key,
+)
 from core.models import BaseTimestamp
 from users.models import WorkspaceMember
 
@@ -26,6 +33,12 @@ class CustomerVehicle(BaseTimestamp):
     model = models.CharField(max_length=128, null=True, blank=True)
     license_plate = models.CharField(max_length=32, null=True, blank=True)
     vin_number = models.CharField(max_length=64, null=True, blank=True)
+    # Canonical keys (see utils/identifiers.py), kept in sync by save().
+    # plate_key and vin_key are exact and unique per workshop when set;
+    # plate_search_key folds confusable characters for lookups only.
+    plate_key = models.CharField(max_length=32, blank=True, default="")
+    plate_search_key = models.CharField(max_length=32, blank=True, default="")
+    vin_key = models.CharField(max_length=64, blank=True, default="")
     color = models.CharField(max_length=32, null=True, blank=True)
     manufactured_at = models.PositiveIntegerField(null=True, blank=True)  # Car year
 
@@ -46,11 +59,56 @@ class CustomerVehicle(BaseTimestamp):
         verbose_name_plural = "Customer Vehicles"
         ordering = ["-created_at"]
         constraints = [
+            # Also the indexes of the exact plate/VIN matches of the upsert
             models.UniqueConstraint(
-                fields=["main_workshop", "vin_number", "license_plate"],
-                name="uq_vehicle_workshop_vin_plate",
-            )
+                fields=["main_workshop", "plate_key"],
+                condition=~Q(plate_key=""),
+                name="uq_vehicle_workshop_plate",
+            ),
+            models.UniqueConstraint(
+                fields=["main_workshop", "vin_key"],
+                condition=~Q(vin_key=""),
+                name="uq_vehicle_workshop_vin",
+            ),
+        ]
+        indexes = [
+            # Delta sync ("changes since")
+            models.Index(fields=["main_workshop", "updated_at"]),
+            # Plate lookup tolerant to O/0, I/1, exact or by prefix (the
+            # pattern opclass serves LIKE 'key%' whatever the DB collation)
+            models.Index(
+                F("main_workshop"),
+                OpClass(F("plate_search_key"), name="varchar_pattern_ops"),
+                name="vehicle_plate_search_prefix",
+            ),
+            # Similar/partial lookup (requires pg_trgm, see signals.py)
+            GinIndex(
+                fields=["plate_search_key"],
+                name="vehicle_plate_search_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            GinIndex(
+                fields=["vin_key"],
+                name="vehicle_vin_key_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
         ]
 
     def __str__(self):
         return f"{self.brand} {self.model} ({self.license_plate} - {self.main_workshop.business_name})"
+
+    def save(self, *args, **kwargs):
+        self.plate_key = canonical_plate(self.license_plate)
+        self.plate_search_key = search_key(self.license_plate)
+        self.vin_key = canonical_vin(self.vin_number)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "license_plate" in update_fields:
+                update_fields.update(("plate_key", "plate_search_key"))
+            if "vin_number" in update_fields:
+                update_fields.add("vin_key")
+            kwargs["update_fields"] = update_fields
+
+        super().save(*args, **kwargs)
@@ -8,6 +8,9 @@ from django.db import transaction
 from mechanic_workshop.models.warehouses import WarehouseItem
 from core.utils.base import HEX_COLOR_VALIDATOR
 from users.models import WorkspaceMember
+from mechanic_workshop.models.counters import WorkshopCounter
+
+WORKORDER_COUNTER = "workorder"
 
 
 class WorkOrderAssignment(BaseTimestamp):
@@ -35,6 +38,21 @@ class WorkOrderAssignment(BaseTimestamp):
         indexes = [
             models.Index(fields=["assignee", "started_at"]),
             models.Index(fields=["work_order", "started_at"]),
+            # Open segments only (live dashboard, clock-in/out)
+            models.Index(
+                fields=["work_order", "started_at"],
+                condition=models.Q(ended_at__isnull=True, started_at__isnull=False),
+                name="assignment_open_idx",
+            ),
+        ]
+        constraints = [
+            # A technician is clocked in one workorder at a time. Planned
+            # segments (not started yet) are not open and are not limited.
+            models.UniqueConstraint(
+                fields=["assignee"],
+                condition=models.Q(ended_at__isnull=True, started_at__isnull=False),
+                name="uniq_open_assignment",
+            )
         ]
 
     def __str__(self):
@@ -89,6 +107,9 @@ class WorkOrder(BaseTimestamp):
     # General information
     # Checksum is used to hash all the data while signing the document by the customer
     checksum = models.CharField(max_length=64, null=True, blank=True)
+    # Per-section hashes of the signed snapshot, see services/snapshots.py
+    checksum_sections = models.JSONField(default=dict, blank=True)
+    signed_at = models.DateTimeField(null=True, blank=True)
     customer_vehicle = models.ForeignKey(
         CustomerVehicle,
         on_delete=models.CASCADE,
@@ -131,6 +152,9 @@ class WorkOrder(BaseTimestamp):
     )
     vehicle_sketch_model = models.CharField(max_length=64, null=True, blank=True)
     damage = models.JSONField(null=True, blank=True)
+    # Rendered damage views ({view: storage name}), see tasks/sketch_tasks.py
+    damage_hash = models.CharField(max_length=64, null=True, blank=True)
+    damage_thumbnails = models.JSONField(default=dict, blank=True)
     lights = models.JSONField(null=True, blank=True)
 
     # Legal information
@@ -151,6 +175,12 @@ class WorkOrder(BaseTimestamp):
         max_digits=10, decimal_places=2, null=True, blank=True
     )
     currency = models.CharField(max_length=3, default="EUR")  # ISO 4217
+    # Materialized totals, kept up to date by services/totals.py
+    labor_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    parts_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    discount_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    totals_updated_at = models.DateTimeField(null=True, blank=True)
 
     # Timing
     car_entered = models.DateField(default=timezone.now)
@@ -172,6 +202,15 @@ class WorkOrder(BaseTimestamp):
                 name="uniq_workshop_workshop_number",
             )
         ]
+        indexes = [
+            # Delta sync ("changes since")
+            models.Index(fields=["workshop", "updated_at"]),
+            # Kanban board (services/board.py)
+            models.Index(
+                fields=["workshop", "stage", "status", "-created_at"],
+                name="workorder_board_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.workshop} | {self.workshop_number}"
@@ -188,8 +227,8 @@ class WorkOrder(BaseTimestamp):
     def ensure_sequential_number(self):
         """
         Assign a sequential number unique per workshop if not already set.
-        Keep it simple; if you need race-safety at scale, wrap in a DB-level
-        transaction and SELECT ... FOR UPDATE on a counter table.
+        Numbers come from the workshop counter (see WorkshopCounter), so the
+        insert does not scan or lock the workshop's workorders.
         """
         if self.workshop_number is not None:
             return
@@ -202,16 +241,18 @@ class WorkOrder(BaseTimestamp):
                 "WorkOrder.ensure_sequential_number: workshop is required."
             )
 
-        with transaction.atomic():
-            # Lock existing rows for this workshop while we compute the next number.
-            last_number = (
-                WorkOrder.objects.select_for_update()
-                .filter(workshop=self.workshop)
-                .aggregate(max_no=models.Max("workshop_number"))
-                .get("max_no")
-                or 0
-            )
-            self.workshop_number = last_number + 1
+        self.workshop_number = WorkshopCounter.next_value(
+            self.workshop_id, WORKORDER_COUNTER, seed=self._last_workshop_number
+        )
+
+    def _last_workshop_number(self) -> int:
+        """Highest number already used by the workshop (seeds its counter)."""
+        return (
+            WorkOrder.objects.filter(workshop_id=self.workshop_id)
+            .aggregate(max_no=models.Max("workshop_number"))
+            .get("max_no")
+            or 0
+        )
 
     def assign_next_number(self):
         """Assign the next available workshop_number to this work order."""
@@ -231,22 +272,79 @@ class WorkOrder(BaseTimestamp):
         """Return distinct assignees currently active on this WO."""
         return self.active_assignments().values_list("assignee", flat=False).distinct()
 
-    def save(self, *args, **kwargs) -> None:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Loaded stage/status (None if deferred), to log transitions on save()
+        instance._loaded_state = (
+            instance.__dict__.get("stage"),
+            instance.__dict__.get("status"),
+        )
+        # Inputs of the materialized totals owned by the workorder itself
+        instance._loaded_pricing = (
+            instance.__dict__.get("price_per_hour"),
+            instance.__dict__.get("car_entered"),
+        )
+        return instance
+
+    @property
+    def pricing_changed(self) -> bool:
+        """True if the rate or entry date differ from the loaded ones."""
+        loaded = getattr(self, "_loaded_pricing", None)
+        return loaded is not None and loaded != (self.price_per_hour, self.car_entered)
+
+    def save(self, *args, changed_by: WorkspaceMember | None = None, **kwargs) -> None:
         """
         Override save to automatically assign workshop_number on creation.
 
         If you ever need to manually override workshop_number,
         just set it before calling save(), and this logic will not touch it.
+
+        Stage/status changes of loaded workorders are appended to the
+        transition log (`changed_by` is recorded as the author).
         """
         is_new = self.pk is None
 
         # Always ensure workshop is consistent
         self._ensure_workshop()
 
-        if is_new:
-            self.ensure_sequential_number()
+        if is_new and self.workshop_number is None:
+            # Number and insert in one transaction, so a failed insert gives
+            # its gapless number back. No savepoint when nested: the caller's
+            # transaction already covers both.
+            try:
+                with transaction.atomic(savepoint=False):
+                    self.ensure_sequential_number()
+                    super().save(*args, **kwargs)
+            except Exception:
+                # The counter was rolled back, the number may be handed out again
+                self.workshop_number = None
+                raise
+            return
+
+        loaded_stage, loaded_status = getattr(self, "_loaded_state", (None, None))
+        changed = (
+            not is_new
+            and loaded_stage is not None
+            and loaded_status is not None
+            and (loaded_stage, loaded_status) != (self.stage, self.status)
+        )
+        if not changed:
+            super().save(*args, **kwargs)
+            return
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            WorkOrderTransition.objects.create(
+                work_order_id=self.pk,
+                workshop_id=self.workshop_id,
+                from_stage=loaded_stage,
+                to_stage=self.stage,
+                from_status=loaded_status,
+                to_status=self.status,
+                changed_by=changed_by,
+            )
+        self._loaded_state = (self.stage, self.status)
 
     # NOTE: This is a very expensive query, so you should use it sparingly.
     # qs = (
@@ -269,6 +367,134 @@ class WorkOrder(BaseTimestamp):
         return self.customer_vehicle.customer
 
 
+class WorkOrderTransition(models.Model):
+    """Append-only log of the stage/status changes of a workorder."""
+
+    work_order = models.ForeignKey(
+        WorkOrder, on_delete=models.CASCADE, related_name="transitions"
+    )
+    # Denormalized so per-workshop analytics do not join workorders
+    workshop = models.ForeignKey(
+        MechanicWorkshop,
+        on_delete=models.CASCADE,
+        related_name="workorder_transitions",
+        null=True,
+        blank=True,
+    )
+    from_stage = models.CharField(
+        max_length=16, choices=WorkOrder.Stage.choices, null=True, blank=True
+    )
+    to_stage = models.CharField(max_length=16, choices=WorkOrder.Stage.choices)
+    from_status = models.CharField(
+        max_length=16, choices=WorkOrder.Status.choices, null=True, blank=True
+    )
+    to_status = models.CharField(max_length=16, choices=WorkOrder.Status.choices)
+    changed_by = models.ForeignKey(
+        WorkspaceMember,
+        on_delete=models.SET_NULL,
+        related_name="workorder_transitions",
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Work Order Transition"
+        verbose_name_plural = "Work Order Transitions"
+        ordering = ["created_at", "id"]
+        indexes = [
+            # History of a workorder (stage durations use LAG over it)
+            models.Index(
+                fields=["work_order", "created_at"],
+                include=["from_stage", "to_stage"],
+                name="wo_transition_history_idx",
+            ),
+            # Daily rollups per workshop (index-only scans)
+            models.Index(
+                fields=["workshop", "created_at"],
+                include=["work_order", "from_stage", "to_stage"],
+                name="wo_transition_workshop_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                include=["work_order", "from_stage", "to_stage"],
+                name="wo_transition_created_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.work_order_id}: {self.from_stage}/{self.from_status} -> "
+            f"{self.to_stage}/{self.to_status}"
+        )
+
+
+class WorkOrderDocument(BaseTimestamp):
+    """
+    A PDF of a workorder rendered by the pdf-renderer service. Files are
+    content-addressed (`content_key`, derived from the snapshot checksum), so
+    an unchanged workorder is never rendered twice. See services/documents.py.
+    """
+
+    class Kind(models.TextChoices):
+        RECEPTION_RECEIPT = "RECEPTION_RECEIPT", "Reception receipt"
+        REPAIR_ORDER = "REPAIR_ORDER", "Repair order"
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RENDERING = "RENDERING", "Rendering"
+        READY = "READY", "Ready"
+        FAILED = "FAILED", "Failed"
+
+    work_order = models.ForeignKey(
+        WorkOrder, on_delete=models.CASCADE, related_name="documents"
+    )
+    workshop = models.ForeignKey(
+        MechanicWorkshop,
+        on_delete=models.CASCADE,
+        related_name="workorder_documents",
+        null=True,
+        blank=True,
+    )
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    # Snapshot checksum the document was rendered from (services/snapshots.py)
+    checksum = models.CharField(max_length=64)
+    content_key = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    file = models.CharField(max_length=255, blank=True, default="")  # storage name
+    size = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.CharField(max_length=512, blank=True, default="")
+    requested_by = models.ForeignKey(
+        WorkspaceMember,
+        on_delete=models.SET_NULL,
+        related_name="requested_workorder_documents",
+        null=True,
+        blank=True,
+    )
+    rendered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Work Order Document"
+        verbose_name_plural = "Work Order Documents"
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["work_order", "kind", "content_key"],
+                name="uniq_workorder_document_content",
+            )
+        ]
+        indexes = [
+            # Delta sync ("changes since")
+            models.Index(fields=["workshop", "updated_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.work_order_id} | {self.kind} | {self.status}"
+
+
 class WorkOrderDamageSketch(BaseTimestamp):
     work_order = models.ForeignKey(
         WorkOrder, on_delete=models.CASCADE, related_name="damage_sketches"
@@ -283,12 +509,27 @@ class WorkOrderDamageSketch(BaseTimestamp):
     rear_strokes = models.JSONField(null=True, blank=True)
     left_strokes = models.JSONField(null=True, blank=True)
     right_strokes = models.JSONField(null=True, blank=True)
+    # Points received vs. kept after simplification (all views)
+    original_point_count = models.PositiveIntegerField(default=0)
+    stored_point_count = models.PositiveIntegerField(default=0)
+    # Rendered views ({view: storage name}), see tasks/sketch_tasks.py
+    strokes_hash = models.CharField(max_length=64, null=True, blank=True)
+    thumbnails = models.JSONField(default=dict, blank=True)
 
     class Meta:
         verbose_name = "Work Order Damage Sketch"
         verbose_name_plural = "Work Order Damage Sketches"
         ordering = ["-created_at"]
 
+    @property
+    def views(self) -> dict:
+        return {
+            "front": self.front_strokes,
+            "rear": self.rear_strokes,
+            "left": self.left_strokes,
+            "right": self.right_strokes,
+        }
+
 
 # class CarSketchTemplate(models.Model):
 #     brand = models.CharField(max_length=50)
@@ -0,0 +1,24 @@
+from rest_framework import serializers
+from mechanic_workshop.models.appointments import Appointment
+
+
+class AppointmentSummarySerializer(serializers.ModelSerializer):
+    # Requires `select_related("customer_vehicle")` to avoid one query per row
+    license_plate = serializers.CharField(
+        source="customer_vehicle.license_plate", read_only=True, default=None
+    )
+
+    class Meta:
+        model = Appointment
+        fields = [
+            "id",
+            "appointment_start",
+            "appointment_end",
+            "appointment_type",
+            "status",
+            "title",
+            "onsite",
+            "customer_vehicle",
+            "license_plate",
+        ]
+        read_only_fields = fields
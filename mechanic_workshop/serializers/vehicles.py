@@ -1,7 +1,21 @@
 from rest_framework import serializers
 from mechanic_workshop.models.vehicles import CustomerVehicle
 from django.db import transaction
-from users.serializers import UserMinimalSerializer
+from users.serializers import WorkspaceMemberMinimalSerializer
+from mechanic_workshop.utils.vehicles import upsert_customer_vehicle
+
+# Descriptive fields written on every check-in (identity fields excluded)
+VEHICLE_ATTRIBUTE_FIELDS = [
+    "brand",
+    "model",
+    "manufactured_at",
+    "fuel_type",
+    "motor_type",
+    "motor_brand",
+    "cylinders",
+    "cylinder_size",
+    "engine_power",
+]
 
 
 class CustomerVehicleCreateSerializer(serializers.ModelSerializer):
@@ -14,6 +28,7 @@ class CustomerVehicleCreateSerializer(serializers.ModelSerializer):
             # General information
             "brand",
             "model",
+            "manufactured_at",
             "fuel_type",
             "license_plate",
             "vin_number",
@@ -45,6 +60,8 @@ class CustomerVehicleCreateSerializer(serializers.ModelSerializer):
                     ]
                 }
             )
+        # What the staff left empty is prefilled from the VIN on insert only,
+        # see upsert_customer_vehicle
         return attrs
 
     @transaction.atomic
@@ -52,8 +69,6 @@ class CustomerVehicleCreateSerializer(serializers.ModelSerializer):
         main_workshop = validated_data.get("main_workshop")
         owner = validated_data.get("owner")
         authorized_people = validated_data.get("authorized_people")
-        vin_number = validated_data.get("vin_number")
-        license_plate = validated_data.get("license_plate")
 
         if main_workshop is None or authorized_people is None:
             raise serializers.ValidationError(
@@ -63,54 +78,42 @@ class CustomerVehicleCreateSerializer(serializers.ModelSerializer):
                 }
             )
 
-        defaults: dict[str, str | int] = {
-            "brand": validated_data.get("brand"),
-            "model": validated_data.get("model"),
-            "fuel_type": validated_data.get("fuel_type"),
-            "motor_type": validated_data.get("motor_type"),
-            "motor_brand": validated_data.get("motor_brand"),
-            "cylinders": validated_data.get("cylinders"),
-            "cylinder_size": validated_data.get("cylinder_size"),
-            "engine_power": validated_data.get("engine_power"),
-        }
-
-        # If the vehicle is owned by a person how broutgh the vehicle to the workstation
-        if owner:
-            defaults["owner"] = owner
-
-        # Update the vehicle
-        if vehicle := CustomerVehicle.objects.filter(
-            main_workshop=main_workshop,
-            vin_number=vin_number,
-            license_plate=license_plate,
-        ).first():
-            for k, v in defaults.items():
-                setattr(vehicle, k, v)
-
-            vehicle.authorized_people.add(*authorized_people)
-            vehicle.save()
-
-            # Just to know if it was created or updated
-            self._created = False
-            return vehicle
-
-        vehicle = CustomerVehicle.objects.create(
-            main_workshop=main_workshop,
-            vin_number=vin_number,
-            license_plate=license_plate,
-            **defaults,
+        return upsert_customer_vehicle(
+            main_workshop_id=main_workshop.pk,
+            vin_number=validated_data.get("vin_number"),
+            license_plate=validated_data.get("license_plate"),
+            attributes={
+                field: validated_data[field]
+                for field in VEHICLE_ATTRIBUTE_FIELDS
+                if field in validated_data
+            },
+            # If the vehicle is owned by a person how broutgh the vehicle to the workstation
+            owner_id=owner.pk if owner else None,
+            authorized_people_ids=[member.pk for member in authorized_people],
         )
-        vehicle.authorized_people.add(*authorized_people)
-        vehicle.save()
-        self._created = True
-        return vehicle
+
+
+class CustomerVehicleIntakeSerializer(CustomerVehicleCreateSerializer):
+    """
+    Validates only the vehicle attributes. Relations (workshop, owner,
+    authorized people) are resolved by the intake service, which saves the
+    three lookup queries the related fields would run during validation.
+    """
+
+    class Meta(CustomerVehicleCreateSerializer.Meta):
+        fields = ["license_plate", "vin_number", *VEHICLE_ATTRIBUTE_FIELDS]
+
+    def create(self, validated_data):
+        raise NotImplementedError("Use EntranceIntakeService to persist vehicles")
 
 
 class CustomerVehicleWorkshopListSerializer(serializers.ModelSerializer):
-    authorized_people = UserMinimalSerializer(
+    # Requires select_related("owner") and
+    # Prefetch("authorized_people", to_attr="authorized_people_cached")
+    authorized_people = WorkspaceMemberMinimalSerializer(
         many=True, read_only=True, source="authorized_people_cached"
     )
-    owner = UserMinimalSerializer()
+    owner = WorkspaceMemberMinimalSerializer(read_only=True)
 
     class Meta:
         model = CustomerVehicle
@@ -130,3 +133,20 @@ class CustomerVehicleWorkshopListSerializer(serializers.ModelSerializer):
             "engine_power",
             "authorized_people",
         ]
+
+
+class CustomerVehicleSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomerVehicle
+        fields = [
+            "id",
+            "brand",
+            "model",
+            "license_plate",
+            "vin_number",
+            "color",
+            "manufactured_at",
+            "fuel_type",
+            "updated_at",
+        ]
+        read_only_fields = fields
@@ -1,9 +1,102 @@
 from rest_framework import serializers
-from mechanic_workshop.models.workorders import WorkOrder
+from django.core.files.storage import default_storage
+from mechanic_workshop.models.workorders import (
+    WorkOrder,
+    WorkOrderDamageSketch,
+    WorkOrderDocument,
+)
 from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.services.sketches import thumbnail_urls
+from mechanic_workshop.utils.strokes import (
+    EncodedStrokesError,
+    PointBudget,
+    SketchTooLarge,
+    StrokeFormatError,
+    count_points,
+    decode_damage,
+    decode_strokes,
+    encode_damage,
+    encode_strokes,
+)
+
+
+class StrokesField(serializers.JSONField):
+    """
+    List of strokes stored with the compact stroke codec. Clients keep
+    sending and receiving plain point arrays; legacy raw values are returned
+    as they are stored.
+    """
+
+    default_error_messages = {
+        "too_large": "The sketch is too large.",
+        "encoded": "Send the strokes as points.",
+        "invalid": "The sketch is not valid.",
+    }
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        if data is None:
+            return None
+        try:
+            return encode_strokes(data, PointBudget())
+        except SketchTooLarge:
+            self.fail("too_large")
+        except EncodedStrokesError:
+            self.fail("encoded")
+        except StrokeFormatError:
+            self.fail("invalid")
+
+    def to_representation(self, value):
+        try:
+            value = decode_strokes(value)
+        except StrokeFormatError:
+            value = None  # unreadable stored value: do not fail the whole record
+        return super().to_representation(value)
+
+
+class ThumbnailURLsField(serializers.ReadOnlyField):
+    """Rendered sketch views ({view: storage name}) exposed as {view: URL}."""
+
+    def to_representation(self, value):
+        return thumbnail_urls(value)
+
+
+class DamageStrokesField(StrokesField):
+    """Damage sketches keyed by view (`{"front": [strokes], ...}`), one budget for all."""
+
+    default_error_messages = {
+        "not_a_dict": "Expected an object keyed by view.",
+        "too_large": "The damage sketches are too large.",
+        "encoded": "Send the strokes as points.",
+        "invalid": "The damage sketches are not valid.",
+    }
+
+    def to_internal_value(self, data):
+        data = serializers.JSONField.to_internal_value(self, data)
+        if data is None:
+            return None
+        if not isinstance(data, dict):
+            self.fail("not_a_dict")
+        try:
+            return encode_damage(data, PointBudget())
+        except SketchTooLarge:
+            self.fail("too_large")
+        except EncodedStrokesError:
+            self.fail("encoded")
+        except StrokeFormatError:
+            self.fail("invalid")
+
+    def to_representation(self, value):
+        try:
+            value = decode_damage(value)
+        except StrokeFormatError:
+            value = None
+        return serializers.JSONField.to_representation(self, value)
 
 
 class WorkorderCreateSerializer(serializers.ModelSerializer):
+    damage = DamageStrokesField(required=False, allow_null=True)
+
     class Meta:
         model = WorkOrder
         fields = [
@@ -21,3 +114,132 @@ class WorkorderCreateSerializer(serializers.ModelSerializer):
             "client_wants_replacements_back",
             "vehicle_sketch_model",
         ]
+
+
+class WorkorderIntakeSerializer(WorkorderCreateSerializer):
+    """
+    Validates only the workorder data. Relations are set by id by the intake
+    service, so validation does not fetch workshop/vehicle/members.
+    """
+
+    class Meta(WorkorderCreateSerializer.Meta):
+        fields = [
+            field
+            for field in WorkorderCreateSerializer.Meta.fields
+            if field
+            not in ("workshop", "customer_vehicle", "vehicle_presenter", "attended_by")
+        ]
+
+    def create(self, validated_data):
+        raise NotImplementedError("Use EntranceIntakeService to persist workorders")
+
+
+class WorkorderSummarySerializer(serializers.ModelSerializer):
+    # Requires `select_related("customer_vehicle")` to avoid one query per row
+    license_plate = serializers.CharField(
+        source="customer_vehicle.license_plate", read_only=True
+    )
+    vehicle_brand = serializers.CharField(
+        source="customer_vehicle.brand", read_only=True
+    )
+    vehicle_model = serializers.CharField(
+        source="customer_vehicle.model", read_only=True
+    )
+    damage_thumbnails = ThumbnailURLsField()
+
+    class Meta:
+        model = WorkOrder
+        fields = [
+            "id",
+            "workshop_number",
+            "customer_vehicle",
+            "license_plate",
+            "vehicle_brand",
+            "vehicle_model",
+            "stage",
+            "status",
+            "priority",
+            "description",
+            "car_entered",
+            "car_left",
+            "total",
+            "currency",
+            "damage_thumbnails",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+
+class WorkOrderDamageSketchSerializer(serializers.ModelSerializer):
+    front_strokes = StrokesField(required=False, allow_null=True)
+    rear_strokes = StrokesField(required=False, allow_null=True)
+    left_strokes = StrokesField(required=False, allow_null=True)
+    right_strokes = StrokesField(required=False, allow_null=True)
+    thumbnails = ThumbnailURLsField()
+
+    class Meta:
+        model = WorkOrderDamageSketch
+        fields = [
+            "id",
+            "work_order",
+            "bg_car_id",
+            "stroke_color",
+            "front_strokes",
+            "rear_strokes",
+            "left_strokes",
+            "right_strokes",
+            "original_point_count",
+            "stored_point_count",
+            "thumbnails",
+            "created_at",
+            "updated_at",
+        ]
+        # The workorder comes from the URL, see WorkOrdersViewSet.damage_sketches
+        read_only_fields = [
+            "id",
+            "work_order",
+            "original_point_count",
+            "stored_point_count",
+            "created_at",
+            "updated_at",
+        ]
+
+    STROKE_FIELDS = ("front_strokes", "rear_strokes", "left_strokes", "right_strokes")
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        # Partial updates keep the counts of the views that are not sent
+        views = {
+            field: attrs.get(field, getattr(self.instance, field, None))
+            for field in self.STROKE_FIELDS
+        }
+        counts = [count_points(value) for value in views.values()]
+        attrs["original_point_count"] = sum(original for original, _ in counts)
+        attrs["stored_point_count"] = sum(stored for _, stored in counts)
+        return attrs
+
+
+class WorkOrderDocumentSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WorkOrderDocument
+        fields = [
+            "id",
+            "work_order",
+            "kind",
+            "status",
+            "checksum",
+            "url",
+            "size",
+            "error",
+            "rendered_at",
+            "created_at",
+            "updated_at",
+        ]
+        read_only_fields = fields
+
+    def get_url(self, obj) -> str | None:
+        if obj.status != WorkOrderDocument.Status.READY or not obj.file:
+            return None
+        return default_storage.url(obj.file)
@@ -0,0 +1,118 @@
+import json
+from typing import Any
+from uuid import UUID
+from django.db import connection
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder
+from mechanic_workshop.services.sketches import thumbnail_urls
+
+BOARD_DEFAULT_CARDS = 20
+BOARD_MAX_CARDS = 100
+
+# One round-trip: per-stage counts (GROUPING SETS) and the newest N cards of
+# every column (row_number window), folded into a single JSON document.
+# Served by the (workshop, stage, status, -created_at) index.
+BOARD_SQL = """
+WITH scoped AS (
+    SELECT id, workshop_number, customer_vehicle_id, stage, status, priority,
+           description, car_entered, created_at, damage_thumbnails
+    FROM {workorders}
+    WHERE workshop_id = %(workshop_id)s {status_filter}
+),
+counts AS (
+    SELECT stage, status, priority, COUNT(*) AS total,
+           GROUPING(status) AS no_status, GROUPING(priority) AS no_priority
+    FROM scoped
+    GROUP BY GROUPING SETS ((stage), (stage, status), (stage, priority))
+),
+ranked AS (
+    SELECT scoped.*, row_number() OVER (
+        PARTITION BY stage ORDER BY created_at DESC, id DESC
+    ) AS position
+    FROM scoped
+)
+SELECT json_build_object(
+    'counts', (
+        SELECT COALESCE(json_agg(json_build_object(
+            'stage', stage, 'status', status, 'priority', priority,
+            'total', total, 'no_status', no_status, 'no_priority', no_priority
+        )), '[]'::json)
+        FROM counts
+    ),
+    'cards', (
+        SELECT COALESCE(json_agg(json_build_object(
+            'id', r.id,
+            'workshop_number', r.workshop_number,
+            'stage', r.stage,
+            'status', r.status,
+            'priority', r.priority,
+            'description', r.description,
+            'car_entered', r.car_entered,
+            'created_at', r.created_at,
+            'damage_thumbnails', r.damage_thumbnails,
+            'vehicle', json_build_object(
+                'id', v.id, 'license_plate', v.license_plate,
+                'brand', v.brand, 'model', v.model
+            )
+        ) ORDER BY r.stage, r.position), '[]'::json)
+        FROM ranked r
+        JOIN {vehicles} v ON v.id = r.customer_vehicle_id
+        WHERE r.position <= %(cards)s
+    )
+)
+"""
+
+
+def get_workorder_board(
+    workshop_id: UUID,
+    cards: int = BOARD_DEFAULT_CARDS,
+    statuses: list[str] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Kanban columns of a workshop, one per `WorkOrder.Stage` in workflow order,
+    with totals by status and priority and the newest `cards` workorders.
+    """
+    quote = connection.ops.quote_name
+    sql = BOARD_SQL.format(
+        workorders=quote(WorkOrder._meta.db_table),
+        vehicles=quote(CustomerVehicle._meta.db_table),
+        status_filter="AND status = ANY(%(statuses)s)" if statuses else "",
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {"workshop_id": workshop_id, "cards": cards, "statuses": statuses or []},
+        )
+        data = cursor.fetchone()[0]
+    # psycopg2 already decodes json columns; other drivers may return text
+    if isinstance(data, str):
+        data = json.loads(data)
+
+    columns = {
+        stage: {
+            "stage": stage,
+            "label": label,
+            "total": 0,
+            "by_status": {},
+            "by_priority": {},
+            "cards": [],
+        }
+        for stage, label in WorkOrder.Stage.choices
+    }
+    for row in data["counts"]:
+        column = columns.get(row["stage"])
+        if column is None:
+            continue
+        if row["no_status"] and row["no_priority"]:
+            column["total"] = row["total"]
+        elif not row["no_status"]:
+            column["by_status"][row["status"]] = row["total"]
+        else:
+            column["by_priority"][row["priority"]] = row["total"]
+
+    for card in data["cards"]:
+        if column := columns.get(card["stage"]):
+            card["damage_thumbnails"] = thumbnail_urls(card["damage_thumbnails"])
+            column["cards"].append(card)
+
+    return list(columns.values())
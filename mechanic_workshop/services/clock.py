@@ -0,0 +1,102 @@
+from typing import Any
+from uuid import UUID
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderAssignment
+from mechanic_workshop.services.live import LIVE_STATUSES, invalidate_live_dashboard
+from users.models import WorkspaceMember
+
+# Attempts of a clock-in racing another one of the same technician
+CLOCK_IN_ATTEMPTS = 3
+
+
+class ClockError(Exception):
+    """Raised when a clock-in/out cannot be applied. Carries the API error payload."""
+
+    def __init__(self, errors: Any, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(errors)
+        self.errors = errors
+        self.status_code = status_code
+
+
+def open_segment(
+    member: WorkspaceMember, lock: bool = True
+) -> WorkOrderAssignment | None:
+    """
+    The segment the technician is clocked in (at most one, see
+    `uniq_open_assignment`), row-locked until the end of the transaction.
+    Planned segments (started_at NULL) are not open: clocking never closes them.
+    """
+    segments = WorkOrderAssignment.objects.filter(
+        assignee=member, ended_at__isnull=True, started_at__isnull=False
+    )
+    if lock:
+        segments = segments.select_for_update(of=("self",))
+    return segments.select_related("work_order").first()
+
+
+def clock_in(
+    member: WorkspaceMember, workshop_id: UUID, workorder_id: Any, notes: str = ""
+) -> tuple[WorkOrderAssignment, WorkOrderAssignment | None]:
+    """
+    Start working on a workorder: close the open segment of the technician,
+    if any, and open a new one, in one transaction. Returns (opened, closed).
+
+    The partial unique constraint on open segments guarantees a single open
+    segment: if a concurrent clock-in of the same technician wins the
+    insert, the loser retries and closes the winner's segment.
+    """
+    workorder = WorkOrder.objects.filter(
+        pk=workorder_id, workshop_id=workshop_id
+    ).first()
+    if workorder is None:
+        raise ClockError("Workorder not found", status.HTTP_404_NOT_FOUND)
+    if workorder.status not in LIVE_STATUSES:
+        raise ClockError(
+            f"Cannot clock in a {workorder.status.lower()} workorder",
+            status.HTTP_409_CONFLICT,
+        )
+
+    for attempt in range(1, CLOCK_IN_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                current = open_segment(member)
+                if current is not None and current.work_order_id == workorder.pk:
+                    # Already working on it
+                    return current, None
+                if current is not None:
+                    current.ended_at = now
+                    current.save(update_fields=["ended_at", "updated_at"])
+                opened = WorkOrderAssignment.objects.create(
+                    work_order=workorder,
+                    assignee=member,
+                    started_at=now,
+                    notes=notes or None,
+                )
+        except IntegrityError:
+            if attempt < CLOCK_IN_ATTEMPTS:
+                continue
+            raise ClockError(
+                "Another clock-in is in progress, try again",
+                status.HTTP_409_CONFLICT,
+            )
+        transaction.on_commit(lambda: invalidate_live_dashboard(workshop_id))
+        return opened, current
+
+
+def clock_out(
+    member: WorkspaceMember, workshop_id: UUID, work_done: str = ""
+) -> WorkOrderAssignment:
+    """Stop working: close the open segment of the technician."""
+    with transaction.atomic():
+        current = open_segment(member)
+        if current is None:
+            raise ClockError("You are not clocked in", status.HTTP_409_CONFLICT)
+        current.ended_at = timezone.now()
+        if work_done:
+            current.work_done = work_done
+        current.save(update_fields=["ended_at", "work_done", "updated_at"])
+    transaction.on_commit(lambda: invalidate_live_dashboard(workshop_id))
+    return current
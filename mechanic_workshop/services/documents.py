@@ -0,0 +1,294 @@
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import timedelta
+from typing import Any
+import requests
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from mechanic_workshop.models.workorders import (
+    ReplacementPart,
+    WorkOrder,
+    WorkOrderAssignment,
+    WorkOrderDocument,
+)
+from mechanic_workshop.services.snapshots import (
+    combine_hashes,
+    hash_canonical,
+    section_hashes,
+)
+from users.models import WorkspaceMember
+
+# Bump when the templates change so existing documents are rendered again
+DOCUMENT_TEMPLATE_VERSION = 1
+DOCUMENT_DIR = "workorder-documents"
+DOCUMENT_TEMPLATES = {
+    WorkOrderDocument.Kind.RECEPTION_RECEIPT: "reception_receipt.html",
+    WorkOrderDocument.Kind.REPAIR_ORDER: "repair_order.html",
+}
+DOCUMENT_TEMPLATE_DIR = "mechanic_workshop/documents"
+# Pending/rendering documents older than this are enqueued again
+DOCUMENT_STALE_AFTER = timedelta(minutes=10)
+# Attempts of the render task before the document is marked as failed
+DOCUMENT_MAX_ATTEMPTS = 5
+
+DEFAULT_RENDERER_URL = "http://pdf-renderer:9000"
+RENDERER_TIMEOUT = (3, 60)  # connect, read
+RENDERER_POOL_SIZE = 10
+
+
+class RendererError(Exception):
+    """The pdf-renderer could not render a document."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def get_renderer_url() -> str:
+    return getattr(settings, "PDF_RENDERER_URL", DEFAULT_RENDERER_URL).rstrip("/")
+
+
+def get_renderer_key() -> bytes:
+    key = getattr(settings, "PDF_RENDERER_HMAC_KEY", None) or os.environ.get(
+        "RENDERER_HMAC_KEY", ""
+    )
+    return key.encode()
+
+
+_session: requests.Session | None = None
+
+
+def renderer_session() -> requests.Session:
+    """
+    HTTP session shared by the renderer calls of a worker process: keep-alive
+    connections, and 502/503/504 (queue full) retried honouring Retry-After.
+    """
+    global _session
+    if _session is None:
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=None,  # rendering is idempotent, POST can be retried
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=RENDERER_POOL_SIZE, max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _session = session
+    return _session
+
+
+def render_pdf(html: str) -> bytes:
+    """Render an HTML document with the pdf-renderer service (HMAC-signed job)."""
+    body = json.dumps({"html": html}).encode("utf-8")
+    timestamp = str(int(time.time()))
+    signature = hmac.new(
+        get_renderer_key(), timestamp.encode() + b"." + body, hashlib.sha256
+    ).hexdigest()
+    try:
+        response = renderer_session().post(
+            f"{get_renderer_url()}/render",
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-Timestamp": timestamp,
+                "X-Signature": signature,
+            },
+            timeout=RENDERER_TIMEOUT,
+        )
+    except requests.RequestException as exc:
+        raise RendererError(f"Renderer unavailable: {exc}")
+
+    if response.status_code != 200:
+        # Bad jobs (4xx except 429) will not get better by retrying
+        retryable = response.status_code >= 500 or response.status_code == 429
+        raise RendererError(
+            f"Renderer answered {response.status_code}: {response.text[:200]}",
+            retryable=retryable,
+        )
+    pdf = response.content
+    expected = response.headers.get("X-Content-SHA256")
+    if expected and hashlib.sha256(pdf).hexdigest() != expected:
+        raise RendererError("Truncated PDF received from the renderer")
+    return pdf
+
+
+def snapshot_checksum(workorder: WorkOrder) -> str:
+    """
+    Checksum of the current workorder snapshot. Equal to `WorkOrder.checksum`
+    while the workorder has not changed since it was signed.
+    """
+    return combine_hashes(section_hashes(workorder.pk))
+
+
+PART_DOCUMENT_FIELDS = (
+    "pk",
+    "title",
+    "brand",
+    "quantity",
+    "list_price",
+    "discount_percent",
+    "line_total",
+)
+DISCOUNT_DOCUMENT_FIELDS = ("pk", "reason", "value", "discount_type", "valid_from")
+
+
+def _printed_markers(workorder: WorkOrder, kind: str) -> list[str]:
+    """
+    Change markers of what a document prints outside of the snapshot: the
+    workshop header and, on repair orders, the labor lines (assignments and
+    their technicians). Parts and discounts have no updated_at, so their
+    printed columns are hashed.
+    """
+    annotations = {"workshop_updated_at": F("workshop__updated_at")}
+    if kind == WorkOrderDocument.Kind.REPAIR_ORDER:
+        done = Q(
+            assignments__started_at__isnull=False,
+            assignments__ended_at__isnull=False,
+        )
+        annotations.update(
+            assignments_count=Count("assignments", filter=done, distinct=True),
+            assignments_updated_at=Max("assignments__updated_at", filter=done),
+            assignees_updated_at=Max("assignments__assignee__updated_at", filter=done),
+        )
+    row = (
+        WorkOrder.objects.filter(pk=workorder.pk)
+        .annotate(**annotations)
+        .values(*annotations)
+        .first()
+        or {}
+    )
+    markers = [str(row.get(name)) for name in annotations]
+
+    if kind == WorkOrderDocument.Kind.REPAIR_ORDER:
+        parts = ReplacementPart.objects.filter(
+            workorder__work_order=workorder
+        ).order_by("pk")
+        discounts = workorder.discounts.filter(applies_to_total=True).order_by("pk")
+        markers += [
+            hash_canonical(list(parts.values_list(*PART_DOCUMENT_FIELDS))),
+            hash_canonical(list(discounts.values_list(*DISCOUNT_DOCUMENT_FIELDS))),
+        ]
+    return markers
+
+
+def content_key(workorder: WorkOrder, kind: str, checksum: str) -> str:
+    """
+    Content address of a document: the snapshot plus what the document shows
+    on top of it (the workshop; repair orders also print labor, parts,
+    discounts and the materialized totals).
+    """
+    parts = [str(DOCUMENT_TEMPLATE_VERSION), kind, checksum]
+    parts += _printed_markers(workorder, kind)
+    if kind == WorkOrderDocument.Kind.REPAIR_ORDER:
+        parts += [
+            str(workorder.labor_total),
+            str(workorder.parts_total),
+            str(workorder.discount_total),
+            str(workorder.total),
+            str(workorder.totals_updated_at),
+        ]
+    return hashlib.sha256(":".join(parts).encode("utf-8")).hexdigest()
+
+
+def document_name(document: WorkOrderDocument) -> str:
+    key = document.content_key
+    return f"{DOCUMENT_DIR}/{key[:2]}/{key}.pdf"
+
+
+def request_document(
+    workorder: WorkOrder, kind: str, requested_by: WorkspaceMember | None = None
+) -> WorkOrderDocument:
+    """
+    Document of the current state of a workorder. Returns the ready one if it
+    was already rendered, otherwise the pending one, enqueued after commit.
+    """
+    checksum = snapshot_checksum(workorder)
+    key = content_key(workorder, kind, checksum)
+    defaults = {
+        "workshop_id": workorder.workshop_id,
+        "checksum": checksum,
+        "requested_by": requested_by,
+    }
+    # get_or_create handles concurrent requests (unique content key)
+    document, created = WorkOrderDocument.objects.get_or_create(
+        work_order=workorder, kind=kind, content_key=key, defaults=defaults
+    )
+
+    stale = document.updated_at < timezone.now() - DOCUMENT_STALE_AFTER
+    if document.status == WorkOrderDocument.Status.READY:
+        return document
+    if document.status == WorkOrderDocument.Status.FAILED or (not created and stale):
+        document.status = WorkOrderDocument.Status.PENDING
+        document.attempts = 0
+        document.error = ""
+        document.save(update_fields=["status", "attempts", "error", "updated_at"])
+    elif not created:
+        return document
+
+    # Imported here: the task module imports this one
+    from mechanic_workshop.tasks.document_tasks import render_workorder_document
+
+    transaction.on_commit(lambda: render_workorder_document.delay(document.pk))
+    return document
+
+
+def document_context(workorder: WorkOrder, kind: str) -> dict[str, Any]:
+    context = {
+        "workorder": workorder,
+        "workshop": workorder.workshop,
+        "vehicle": workorder.customer_vehicle,
+        "presenter": workorder.vehicle_presenter,
+        "generated_at": timezone.now(),
+    }
+    if kind == WorkOrderDocument.Kind.REPAIR_ORDER:
+        context["assignments"] = list(
+            WorkOrderAssignment.objects.filter(
+                work_order=workorder, started_at__isnull=False, ended_at__isnull=False
+            )
+            .select_related("assignee")
+            .order_by("started_at")
+        )
+        context["parts"] = list(
+            ReplacementPart.objects.filter(workorder__work_order=workorder).order_by(
+                "pk"
+            )
+        )
+        context["discounts"] = list(
+            workorder.discounts.filter(applies_to_total=True).order_by("valid_from")
+        )
+    return context
+
+
+def render_document(document: WorkOrderDocument) -> str:
+    """
+    Render a document and store it. Skips the renderer if a file with the
+    same content key is already stored. Returns the storage name.
+    """
+    name = document_name(document)
+    if not default_storage.exists(name):
+        workorder = WorkOrder.objects.select_related(
+            "workshop", "customer_vehicle", "vehicle_presenter"
+        ).get(pk=document.work_order_id)
+        context = document_context(workorder, document.kind)
+        context["checksum"] = document.checksum
+        html = render_to_string(
+            f"{DOCUMENT_TEMPLATE_DIR}/{DOCUMENT_TEMPLATES[document.kind]}", context
+        )
+        name = default_storage.save(name, ContentFile(render_pdf(html)))
+    return name
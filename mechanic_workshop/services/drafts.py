@@ -0,0 +1,149 @@
+import json
+from typing import Any
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from core.utils.base import generate_nanoid, json_merge_patch
+from core.utils.locks import cache_lock
+from users.models import WorkspaceMember
+
+# Drafts expire after this many seconds without changes
+ENTRANCE_DRAFT_TTL = 3 * 24 * 60 * 60
+# Max serialized size of a draft (sketches included)
+ENTRANCE_DRAFT_MAX_SIZE = 512 * 1024
+# Max open drafts per member
+ENTRANCE_DRAFT_MAX_PER_MEMBER = 20
+
+
+class DraftError(Exception):
+    """Raised when a draft operation cannot be applied. Carries the API error payload."""
+
+    def __init__(self, errors: Any, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(errors)
+        self.errors = errors
+        self.status_code = status_code
+
+
+class EntranceDraftStore:
+    """
+    Server-side check-in drafts kept in the shared cache (Redis), one key per
+    (member, draft id). Clients autosave by sending JSON Merge Patch deltas
+    instead of the whole entrance payload.
+
+    Stored document:
+        {"id": str, "version": int, "created_at": iso, "updated_at": iso, "data": {...}}
+    """
+
+    def __init__(self, member: WorkspaceMember):
+        self.member = member
+        self.index_key = f"entrance-drafts:{member.pk}"
+
+    def _key(self, draft_id: str) -> str:
+        return f"entrance-draft:{self.member.pk}:{draft_id}"
+
+    def lock(self, draft_id: str, blocking_timeout: float = 2):
+        return cache_lock(
+            f"{self._key(draft_id)}:lock", timeout=10, blocking_timeout=blocking_timeout
+        )
+
+    def index_lock(self):
+        return cache_lock(f"{self.index_key}:lock", timeout=10, blocking_timeout=2)
+
+    @staticmethod
+    def _check_size(data: dict[str, Any]) -> None:
+        size = len(json.dumps(data, separators=(",", ":")))
+        if size > ENTRANCE_DRAFT_MAX_SIZE:
+            raise DraftError(
+                "The draft is too large.", status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+    def _save(self, draft: dict[str, Any]) -> dict[str, Any]:
+        cache.set(self._key(draft["id"]), draft, ENTRANCE_DRAFT_TTL)
+        return draft
+
+    def list_ids(self) -> list[str]:
+        ids = cache.get(self.index_key) or []
+        # Drop the drafts that already expired
+        alive = list(cache.get_many([self._key(i) for i in ids]))
+        return [i for i in ids if self._key(i) in alive]
+
+    def list(self) -> list[dict[str, Any]]:
+        """Metadata (without data) of the open drafts, oldest first."""
+        drafts = cache.get_many([self._key(i) for i in self.list_ids()])
+        return [
+            {k: v for k, v in draft.items() if k != "data"} for draft in drafts.values()
+        ]
+
+    def _set_index(self, ids: list[str]) -> None:
+        cache.set(self.index_key, ids, ENTRANCE_DRAFT_TTL)
+
+    def get(self, draft_id: str) -> dict[str, Any]:
+        if not (draft := cache.get(self._key(draft_id))):
+            raise DraftError("Draft not found", status.HTTP_404_NOT_FOUND)
+        return draft
+
+    def create(self, data: dict[str, Any] | None = None) -> dict[str, Any]:
+        data = data or {}
+        if not isinstance(data, dict):
+            raise DraftError("A draft must be a JSON object")
+        self._check_size(data)
+
+        with self.index_lock() as acquired:
+            if not acquired:
+                raise DraftError("Drafts are busy, retry", status.HTTP_409_CONFLICT)
+
+            ids = self.list_ids()
+            if len(ids) >= ENTRANCE_DRAFT_MAX_PER_MEMBER:
+                raise DraftError("Too many open drafts", status.HTTP_409_CONFLICT)
+
+            now = timezone.now().isoformat()
+            draft = self._save(
+                {
+                    "id": generate_nanoid(),
+                    "version": 1,
+                    "created_at": now,
+                    "updated_at": now,
+                    "data": data,
+                }
+            )
+            self._set_index([*ids, draft["id"]])
+        return draft
+
+    def patch(
+        self, draft_id: str, delta: Any, expected_version: int | None = None
+    ) -> dict[str, Any]:
+        """Apply a JSON Merge Patch delta. Optionally guard with the expected version."""
+        if not isinstance(delta, dict):
+            raise DraftError("The patch must be a JSON object")
+
+        with self.lock(draft_id) as acquired:
+            if not acquired:
+                raise DraftError(
+                    "The draft is being modified", status.HTTP_409_CONFLICT
+                )
+
+            draft = self.get(draft_id)
+            if expected_version is not None and draft["version"] != expected_version:
+                raise DraftError(
+                    {"error": "Version mismatch", "version": draft["version"]},
+                    status.HTTP_412_PRECONDITION_FAILED,
+                )
+
+            data = json_merge_patch(draft["data"], delta)
+            self._check_size(data)
+            draft.update(
+                data=data,
+                version=draft["version"] + 1,
+                updated_at=timezone.now().isoformat(),
+            )
+            return self._save(draft)
+
+    def delete(self, draft_id: str) -> None:
+        cache.delete(self._key(draft_id))
+        # The draft is gone even if the index cannot be locked: list_ids()
+        # skips ids whose draft no longer exists
+        with self.index_lock() as acquired:
+            if not acquired:
+                raise DraftError("Drafts are busy, retry", status.HTTP_409_CONFLICT)
+
+            self._set_index([i for i in self.list_ids() if i != draft_id])
@@ -0,0 +1,262 @@
+from dataclasses import dataclass
+from typing import Any
+import hashlib
+import json
+from django.db import DatabaseError, IntegrityError, transaction
+from rest_framework import status
+from customers.customer_mapper import map_front_to_customer
+from customers.serializers import WorkshopCustomerCreateSerializer
+from mechanic_workshop.mappers.workorder import map_frontend_to_workorder
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder
+from mechanic_workshop.serializers.vehicles import CustomerVehicleIntakeSerializer
+from mechanic_workshop.serializers.workorders import WorkorderIntakeSerializer
+from mechanic_workshop.utils.vehicles import upsert_customer_vehicle
+from users.models import Account, WorkspaceMember
+from workspace_modules.models.base import Workspace
+from workspace_modules.utils.memberships import get_workspace_membership
+from core.utils.idempotency import IdempotencyStore
+from core.utils.locks import cache_lock
+
+# Max entrances accepted by a single bulk upload
+MAX_BULK_ENTRANCES = 100
+
+# Statements issued to register one entrance (for_caller + run, savepoints
+# excluded): membership, account upsert, member upsert, vehicle upsert,
+# authorized people link, workorder number (counter UPDATE ... RETURNING;
+# seeding a new counter costs 2 more, once per workshop), workorder insert.
+INTAKE_QUERY_BUDGET = 7
+
+
+class IntakeError(Exception):
+    """Raised when an entrance cannot be registered. Carries the API error payload."""
+
+    def __init__(self, errors: Any, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(errors)
+        self.errors = errors
+        self.status_code = status_code
+
+
+@dataclass
+class ValidatedEntrance:
+    customer_serializer: WorkshopCustomerCreateSerializer
+    is_vehicle_owner: bool
+    vehicle: dict[str, Any]
+    workorder: dict[str, Any]
+
+
+@dataclass
+class IntakeResult:
+    customer: WorkspaceMember
+    vehicle: CustomerVehicle
+    workorder: WorkOrder
+
+    def as_response_data(self) -> dict[str, Any]:
+        return {
+            "customer": str(self.customer.pk),
+            "vehicle": self.vehicle.pk,
+            "workorder": {
+                "id": self.workorder.pk,
+                "workshop_number": self.workorder.workshop_number,
+            },
+        }
+
+
+class EntranceIntakeService:
+    """
+    Registers a vehicle entrance (customer + vehicle + workorder) for a workshop.
+
+    Everything that can be checked without the database is validated first,
+    then the three entities are resolved with the minimal set of upserts,
+    always by id, inside a single transaction.
+    """
+
+    def __init__(self, caller_member: WorkspaceMember):
+        """`caller_member` must come with its workspace (select_related)."""
+        self.caller_member = caller_member
+        self.workspace: Workspace = caller_member.workspace
+        # Workshop pk, taken from the workspace GFK without fetching the workshop
+        self.workshop_id = self.workspace.main_business_id
+        if self.workshop_id is None:
+            raise IntakeError("This workspace has no workshop")
+
+    @classmethod
+    def for_caller(cls, account: Account, workspace_id: str | None):
+        """Resolve the caller membership (and workspace) with a single query."""
+        if not workspace_id:
+            raise IntakeError("Missing wsId query parameter")
+
+        if not (
+            membership := get_workspace_membership(
+                account=account, workspace_id=workspace_id
+            )
+        ):
+            # Only on the error path: tell apart unknown workspaces from non-members
+            if not Workspace.objects.filter(pk=workspace_id).exists():
+                raise IntakeError("Workspace not found", status.HTTP_404_NOT_FOUND)
+            raise IntakeError(
+                "You are not a member of this workspace", status.HTTP_403_FORBIDDEN
+            )
+        return cls(caller_member=membership)
+
+    # ========================================================================
+    # Validation (no queries)
+    # ========================================================================
+    def validate(self, payload: dict[str, Any]) -> ValidatedEntrance:
+        if not (customer := payload.get("customer")):
+            raise IntakeError("Missing customer data")
+        if not (vehicle_data := payload.get("vehicle", None)):
+            raise IntakeError("Missing vehicle data")
+        if not (workorder_data := payload.get("workorder", None)):
+            raise IntakeError("Missing workorder data")
+
+        customer_data = map_front_to_customer(customer)
+        customer_serializer = WorkshopCustomerCreateSerializer(
+            data=customer_data, context={"workspace": self.workspace}
+        )
+        if not customer_serializer.is_valid():
+            raise IntakeError(customer_serializer.errors)
+
+        vehicle_serializer = CustomerVehicleIntakeSerializer(data=vehicle_data)
+        if not vehicle_serializer.is_valid():
+            raise IntakeError(vehicle_serializer.errors)
+
+        # The damage sketches are encoded (and their size checked) by the serializer
+        workorder_serializer = WorkorderIntakeSerializer(
+            data=map_frontend_to_workorder(front=workorder_data)
+        )
+        if not workorder_serializer.is_valid():
+            raise IntakeError(workorder_serializer.errors)
+
+        return ValidatedEntrance(
+            customer_serializer=customer_serializer,
+            is_vehicle_owner=bool(customer_data.get("is_vehicle_owner", False)),
+            vehicle=vehicle_serializer.validated_data,
+            workorder=workorder_serializer.validated_data,
+        )
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+    def run(self, payload: dict[str, Any]) -> IntakeResult:
+        entrance = self.validate(payload)
+
+        with transaction.atomic():
+            # 1) Customer: account + workspace member upserts
+            customer = entrance.customer_serializer.save()
+
+            # 2) Vehicle: upsert + authorized people link (2 statements)
+            vehicle_data = dict(entrance.vehicle)
+            try:
+                vehicle = upsert_customer_vehicle(
+                    main_workshop_id=self.workshop_id,
+                    vin_number=vehicle_data.pop("vin_number", None),
+                    license_plate=vehicle_data.pop("license_plate", None),
+                    attributes=vehicle_data,
+                    owner_id=customer.pk if entrance.is_vehicle_owner else None,
+                    authorized_people_ids=[customer.pk],
+                )
+            except IntegrityError:
+                # Leaving the atomic block rolls the whole entrance back
+                raise IntakeError(
+                    "The plate and the VIN belong to different vehicles",
+                    status.HTTP_409_CONFLICT,
+                )
+
+            # 3) Workorder
+            workorder = WorkOrder(
+                **entrance.workorder,
+                workshop_id=self.workshop_id,
+                customer_vehicle_id=vehicle.pk,
+                vehicle_presenter_id=customer.pk,
+                attended_by_id=self.caller_member.pk,
+                customer_telephone=customer.phone or "",
+            )
+            workorder.save()
+
+        return IntakeResult(
+            customer=customer,
+            vehicle=vehicle,
+            workorder=workorder,
+        )
+
+    def run_batch(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Register queued entrances (offline check-ins) one transaction per item,
+        sharing the caller/workspace resolution. A failing item never affects
+        the others.
+
+        Items may carry a `client_ref` (echoed back) and an `idempotency_key`:
+        an item already registered with the same key is not registered again,
+        its first result is returned instead.
+        """
+        results = []
+        for index, item in enumerate(items):
+            result = {"index": index}
+            if not isinstance(item, dict):
+                results.append(
+                    {
+                        **result,
+                        "status": status.HTTP_400_BAD_REQUEST,
+                        "error": "Invalid entrance",
+                    }
+                )
+                continue
+
+            result["client_ref"] = item.get("client_ref")
+            if key := item.get("idempotency_key"):
+                results.append({**result, **self._run_idempotent_item(str(key), item)})
+            else:
+                results.append({**result, **self._run_item(item)})
+        return results
+
+    def _run_item(self, item: dict[str, Any]) -> dict[str, Any]:
+        try:
+            # run() is atomic (a savepoint inside a request transaction): a
+            # database error only rolls back this item, the batch goes on
+            entrance = self.run(item)
+        except IntakeError as exc:
+            return {"status": exc.status_code, "error": exc.errors}
+        except IntegrityError:
+            return {
+                "status": status.HTTP_409_CONFLICT,
+                "error": "This entrance conflicts with existing data",
+            }
+        except DatabaseError:
+            return {
+                "status": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "error": "This entrance could not be saved, retry it later",
+            }
+        return {"status": status.HTTP_201_CREATED, "data": entrance.as_response_data()}
+
+    def _run_idempotent_item(self, key: str, item: dict[str, Any]) -> dict[str, Any]:
+        store = IdempotencyStore(
+            scope="entrances-bulk", owner=self.caller_member.account_id, key=key
+        )
+        payload = {k: v for k, v in item.items() if k != "client_ref"}
+        fingerprint = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+        with cache_lock(store.lock_key, timeout=30, blocking_timeout=5) as acquired:
+            if not acquired:
+                return {
+                    "status": status.HTTP_409_CONFLICT,
+                    "error": "This entrance is already being processed",
+                }
+            if stored := store.get():
+                if stored["fingerprint"] != fingerprint:
+                    return {
+                        "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                        "error": "This idempotency_key was already used with another payload",
+                    }
+                return {
+                    "status": stored["status"],
+                    "data": stored["data"],
+                    "replayed": True,
+                }
+
+            result = self._run_item(item)
+            if status.is_success(result["status"]):
+                store.save(fingerprint, result["status"], result["data"])
+            return result
@@ -0,0 +1,95 @@
+from typing import Any
+from uuid import UUID
+from django.core.cache import cache
+from django.utils import timezone
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderAssignment
+from users.serializers import WorkspaceMemberMinimalSerializer
+
+# Workorders shown on the live dashboard
+LIVE_STATUSES = (WorkOrder.Status.OPEN, WorkOrder.Status.ON_HOLD)
+# Seconds the dashboard is served from cache (clock-in/out drops it earlier)
+LIVE_DASHBOARD_TTL = 10
+
+
+def live_dashboard_key(workshop_id: UUID) -> str:
+    return f"live-dashboard:{workshop_id}"
+
+
+def invalidate_live_dashboard(workshop_id: UUID | None) -> None:
+    if workshop_id is not None:
+        cache.delete(live_dashboard_key(workshop_id))
+
+
+def build_live_dashboard(workshop_id: UUID) -> dict[str, Any]:
+    """
+    Who is working on what right now: every open segment (started, not ended) of
+    the open workorders of a workshop, read in one query through the
+    `assignment_open_idx` partial index and grouped by technician and workorder.
+    """
+    now = timezone.now()
+    segments = (
+        WorkOrderAssignment.objects.filter(
+            work_order__workshop_id=workshop_id,
+            work_order__status__in=LIVE_STATUSES,
+            ended_at__isnull=True,
+            started_at__lte=now,
+            assignee__isnull=False,
+        )
+        .select_related("assignee", "work_order", "work_order__customer_vehicle")
+        .order_by("started_at", "pk")
+    )
+
+    technicians: dict[UUID, dict[str, Any]] = {}
+    workorders: dict[int, dict[str, Any]] = {}
+    for segment in segments:
+        workorder = segment.work_order
+        vehicle = workorder.customer_vehicle
+        entry = {
+            "assignment": segment.pk,
+            "started_at": segment.started_at,
+            "elapsed_seconds": int((now - segment.started_at).total_seconds()),
+        }
+
+        technician = technicians.get(segment.assignee_id)
+        if technician is None:
+            technician = technicians[segment.assignee_id] = {
+                "assignee": dict(
+                    WorkspaceMemberMinimalSerializer(segment.assignee).data
+                ),
+                "workorders": [],
+            }
+        technician["workorders"].append({**entry, "workorder": workorder.pk})
+
+        card = workorders.get(workorder.pk)
+        if card is None:
+            card = workorders[workorder.pk] = {
+                "id": workorder.pk,
+                "workshop_number": workorder.workshop_number,
+                "stage": workorder.stage,
+                "status": workorder.status,
+                "priority": workorder.priority,
+                "vehicle": {
+                    "id": vehicle.pk,
+                    "license_plate": vehicle.license_plate,
+                    "brand": vehicle.brand,
+                    "model": vehicle.model,
+                },
+                "assignees": [],
+            }
+        card["assignees"].append({**entry, "assignee": str(segment.assignee_id)})
+
+    return {
+        "generated_at": now,
+        "technicians": list(technicians.values()),
+        "workorders": list(workorders.values()),
+    }
+
+
+def get_live_dashboard(workshop_id: UUID) -> dict[str, Any]:
+    """`build_live_dashboard`, cached for a few seconds per workshop."""
+    key = live_dashboard_key(workshop_id)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_live_dashboard(workshop_id)
+        cache.set(key, dashboard, LIVE_DASHBOARD_TTL)
+    return dashboard
@@ -0,0 +1,201 @@
+import hashlib
+import io
+import json
+import math
+import os
+from functools import lru_cache
+from typing import Any
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageColor, ImageDraw
+from mechanic_workshop.utils.strokes import decode_strokes
+
+# Bump when the drawing changes so existing thumbnails are rendered again
+SKETCH_RENDER_VERSION = 2
+SKETCH_THUMBNAIL_DIR = "sketch-thumbnails"
+# Max (width, height) of the thumbnails
+DEFAULT_THUMBNAIL_SIZE = (480, 320)
+# Canvas used when there is no background and the strokes are tiny
+MIN_CANVAS_SIZE = (320, 240)
+# Blank border around the strokes drawn without background
+CANVAS_PADDING = 8
+DEFAULT_STROKE_COLOR = "#E53935"
+DEFAULT_STROKE_WIDTH = 4
+MAX_STROKE_WIDTH = 32
+
+
+def get_thumbnail_size() -> tuple[int, int]:
+    return tuple(getattr(settings, "SKETCH_THUMBNAIL_SIZE", DEFAULT_THUMBNAIL_SIZE))
+
+
+@lru_cache(maxsize=64)
+def _load_background(model: str, view: str) -> Image.Image | None:
+    """
+    Background of a car view, read from `SKETCH_BACKGROUND_DIR/<model>/<view>.png`.
+    Cached per process; callers must copy it before drawing.
+    """
+    directory = getattr(settings, "SKETCH_BACKGROUND_DIR", None)
+    if not directory or not model:
+        return None
+    path = os.path.join(directory, os.path.basename(model), f"{view.lower()}.png")
+    if not os.path.isfile(path):
+        return None
+    with Image.open(path) as image:
+        return image.convert("RGBA")
+
+
+def view_hash(
+    strokes: Any, background: str | None, view: str, color: str | None = None
+) -> str:
+    """Content address of a rendered view: strokes + background + renderer."""
+    payload = json.dumps(
+        [SKETCH_RENDER_VERSION, get_thumbnail_size(), background, view, color, strokes],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def strokes_hash(
+    views: dict[str, Any], background: str | None, color: str | None = None
+) -> str:
+    """Hash of all the views of a sketch, used to skip unchanged sketches."""
+    digest = hashlib.sha256()
+    for view in sorted(views):
+        if views[view]:
+            digest.update(
+                view_hash(views[view], background, view, color).encode("ascii")
+            )
+    return digest.hexdigest()
+
+
+def _stroke_lines(strokes: Any) -> list[tuple[list[tuple[float, float]], dict]]:
+    """Normalize decoded strokes into (xy points, metadata) pairs."""
+    lines = []
+    for stroke in decode_strokes(strokes) or []:
+        meta, points = {}, stroke
+        if isinstance(stroke, dict):
+            meta, points = stroke, stroke.get("points") or []
+        if not isinstance(points, list) or not points:
+            continue
+        if isinstance(points[0], dict):
+            xy = [(p.get("x", 0), p.get("y", 0)) for p in points]
+        elif isinstance(points[0], list):
+            xy = [(p[0], p[1]) for p in points if len(p) >= 2]
+        else:
+            xy = list(zip(points[::2], points[1::2]))
+        xy = [point for point in map(_coordinates, xy) if point is not None]
+        if xy:
+            lines.append((xy, meta))
+    return lines
+
+
+def _coordinates(point: tuple[Any, Any]) -> tuple[float, float] | None:
+    try:
+        x, y = float(point[0]), float(point[1])
+    except (TypeError, ValueError):
+        return None
+    return (x, y) if math.isfinite(x) and math.isfinite(y) else None
+
+
+def _fit_strokes(
+    lines: list[tuple[list[tuple[float, float]], dict]],
+    base: Image.Image | None,
+) -> tuple[Image.Image, float, float, float]:
+    """
+    Canvas for the strokes and the (scale, dx, dy) that maps them onto it.
+    Nothing is ever larger than the thumbnail size: a background keeps its
+    coordinates and is scaled down, otherwise the canvas is cut to the strokes'
+    bounding box (points are client input, they can be far off or negative).
+    """
+    max_width, max_height = get_thumbnail_size()
+    if base is not None:
+        scale = min(1.0, max_width / base.width, max_height / base.height)
+        size = (max(1, round(base.width * scale)), max(1, round(base.height * scale)))
+        return base.resize(size), scale, 0.0, 0.0
+
+    xs = [x for xy, _ in lines for x, _ in xy]
+    ys = [y for xy, _ in lines for _, y in xy]
+    span_x, span_y = max(xs) - min(xs), max(ys) - min(ys)
+    inner_width = max_width - 2 * CANVAS_PADDING
+    inner_height = max_height - 2 * CANVAS_PADDING
+    scale = min(
+        1.0,
+        inner_width / span_x if span_x else 1.0,
+        inner_height / span_y if span_y else 1.0,
+    )
+    width = min(max_width, max(MIN_CANVAS_SIZE[0], span_x * scale + 2 * CANVAS_PADDING))
+    height = min(
+        max_height, max(MIN_CANVAS_SIZE[1], span_y * scale + 2 * CANVAS_PADDING)
+    )
+    # Center the bounding box on the canvas
+    dx = (width - span_x * scale) / 2 - min(xs) * scale
+    dy = (height - span_y * scale) / 2 - min(ys) * scale
+    image = Image.new("RGBA", (round(width), round(height)), "white")
+    return image, scale, dx, dy
+
+
+def render_view(
+    strokes: Any, background: str | None, view: str, color: str | None = None
+) -> bytes | None:
+    """Draw one view over its background and return it as a WebP thumbnail."""
+    lines = _stroke_lines(strokes)
+    if not lines:
+        return None
+
+    base = _load_background(background, view) if background else None
+    image, scale, dx, dy = _fit_strokes(lines, base)
+
+    draw = ImageDraw.Draw(image)
+    for xy, meta in lines:
+        xy = [(x * scale + dx, y * scale + dy) for x, y in xy]
+        try:
+            fill = ImageColor.getrgb(
+                str(meta.get("color") or color or DEFAULT_STROKE_COLOR)
+            )
+        except ValueError:
+            fill = ImageColor.getrgb(DEFAULT_STROKE_COLOR)
+        try:
+            width = int(meta.get("width") or meta.get("size") or DEFAULT_STROKE_WIDTH)
+        except (OverflowError, TypeError, ValueError):
+            width = DEFAULT_STROKE_WIDTH
+        width = max(1, min(round(width * scale), MAX_STROKE_WIDTH))
+        if len(xy) == 1:
+            (x, y), r = xy[0], width / 2
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=fill)
+        else:
+            draw.line(xy, fill=fill, width=width, joint="curve")
+
+    output = io.BytesIO()
+    image.save(output, format="WEBP", quality=80, method=4)
+    return output.getvalue()
+
+
+def render_thumbnails(
+    views: dict[str, Any], background: str | None, color: str | None = None
+) -> dict[str, str]:
+    """
+    Render every non-empty view and return {view: storage name}. Files are
+    named after `view_hash`, so identical views are rendered only once.
+    """
+    thumbnails = {}
+    for view, strokes in views.items():
+        if not strokes:
+            continue
+        digest = view_hash(strokes, background, view, color)
+        name = f"{SKETCH_THUMBNAIL_DIR}/{digest}.webp"
+        if not default_storage.exists(name):
+            content = render_view(strokes, background, view, color)
+            if content is None:
+                continue
+            name = default_storage.save(name, ContentFile(content))
+        thumbnails[view] = name
+    return thumbnails
+
+
+def thumbnail_urls(thumbnails: dict[str, str] | None) -> dict[str, str]:
+    return {
+        view: default_storage.url(name) for view, name in (thumbnails or {}).items()
+    }
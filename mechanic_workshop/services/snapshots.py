@@ -0,0 +1,290 @@
+"""
+Canonical snapshot of a workorder as signed by the customer, hashed with
+streaming SHA-256: the JSON is fed to the hash chunk by chunk
+(`JSONEncoder.iterencode`), never built as one string.
+
+checksum = sha256("<version>\\n" + "<section>:<section sha256>\\n" for each
+section in name order), so a verification only re-hashes the sections whose
+rows changed; the others come from the cache, keyed by the rows' updated_at.
+
+Limits of the cached verification: the change markers are updated_at
+columns, and QuerySet.update(), bulk_update() without updated_at or raw SQL
+writes do not touch them. Such a change is only detected once the cached
+section hash expires (SECTION_HASH_TTL). It is a cheap "did the staff edit
+it" check, not tamper-proofing against database access. Signing never reads
+the cache: the signed checksum is always computed from the rows.
+"""
+
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable
+from uuid import UUID
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderDamageSketch
+from users.models import WorkspaceMember
+
+SNAPSHOT_VERSION = "wo-snapshot-v1"
+# Section hashes are recomputed after this many seconds even if unchanged
+SECTION_HASH_TTL = 7 * 24 * 60 * 60
+
+WORKORDER_FIELDS = (
+    "id",
+    "workshop_id",
+    "workshop_number",
+    "customer_telephone",
+    "description",
+    "observations",
+    "start_mileage",
+    "start_fuel_level",
+    "car_entered",
+    "insurance_company_info",
+)
+VEHICLE_FIELDS = (
+    "id",
+    "owner_id",
+    "brand",
+    "model",
+    "license_plate",
+    "vin_number",
+    "color",
+    "manufactured_at",
+    "motor_number",
+    "fuel_type",
+)
+PRESENTER_FIELDS = (
+    "uuid",
+    "name",
+    "surname",
+    "email",
+    "phone",
+    "tax_id",
+    "document_type",
+)
+SKETCH_FIELDS = (
+    "id",
+    "bg_car_id",
+    "stroke_color",
+    "front_strokes",
+    "rear_strokes",
+    "left_strokes",
+    "right_strokes",
+)
+
+
+def _canonical_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not part of a snapshot")
+
+
+_encoder = json.JSONEncoder(
+    sort_keys=True,
+    separators=(",", ":"),
+    ensure_ascii=False,
+    allow_nan=False,
+    default=_canonical_default,
+)
+
+
+def hash_canonical(data: Any) -> str:
+    """SHA-256 of the canonical JSON of `data`, streamed to the hash."""
+    digest = hashlib.sha256()
+    for chunk in _encoder.iterencode(data):
+        digest.update(chunk.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def combine_hashes(sections: dict[str, str]) -> str:
+    digest = hashlib.sha256(f"{SNAPSHOT_VERSION}\n".encode("ascii"))
+    for name in sorted(sections):
+        digest.update(f"{name}:{sections[name]}\n".encode("ascii"))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class Section:
+    """A part of the snapshot: how to tell it changed and how to read it."""
+
+    name: str
+    # Cheap change marker, read for all sections in one query
+    marker: Callable[[dict[str, Any]], Any]
+    # Loads the section data (only when its hash is not cached)
+    load: Callable[[int], Any]
+
+
+def _load_workorder(workorder_id: int) -> Any:
+    return WorkOrder.objects.filter(pk=workorder_id).values(*WORKORDER_FIELDS).first()
+
+
+def _load_vehicle(workorder_id: int) -> Any:
+    return (
+        CustomerVehicle.objects.filter(work_orders__pk=workorder_id)
+        .values(*VEHICLE_FIELDS)
+        .first()
+    )
+
+
+def _load_presenter(workorder_id: int) -> Any:
+    return (
+        WorkspaceMember.objects.filter(vehicles_presented_to_workshops__pk=workorder_id)
+        .values(*PRESENTER_FIELDS)
+        .first()
+    )
+
+
+def _load_damage(workorder_id: int) -> Any:
+    return (
+        WorkOrder.objects.filter(pk=workorder_id)
+        .values("vehicle_sketch_model", "damage")
+        .first()
+    )
+
+
+def _load_lights(workorder_id: int) -> Any:
+    return WorkOrder.objects.filter(pk=workorder_id).values("lights").first()
+
+
+def _load_legal(workorder_id: int) -> Any:
+    return (
+        WorkOrder.objects.filter(pk=workorder_id)
+        .values("allow_repair_vehicle", "client_wants_replacements_back")
+        .first()
+    )
+
+
+def _load_sketches(workorder_id: int) -> Any:
+    return list(
+        WorkOrderDamageSketch.objects.filter(work_order_id=workorder_id)
+        .order_by("pk")
+        .values(*SKETCH_FIELDS)
+    )
+
+
+SECTIONS = (
+    Section("workorder", lambda m: m["updated_at"], _load_workorder),
+    Section("vehicle", lambda m: m["vehicle_updated_at"], _load_vehicle),
+    Section("presenter", lambda m: m["presenter_updated_at"], _load_presenter),
+    Section("damage", lambda m: m["updated_at"], _load_damage),
+    Section("lights", lambda m: m["updated_at"], _load_lights),
+    Section("legal", lambda m: m["updated_at"], _load_legal),
+    Section(
+        "sketches",
+        lambda m: (m["sketches_count"], m["sketches_updated_at"]),
+        _load_sketches,
+    ),
+)
+
+
+def _markers(workorder_id: int) -> dict[str, Any] | None:
+    return (
+        WorkOrder.objects.filter(pk=workorder_id)
+        .annotate(
+            sketches_count=Count("damage_sketches"),
+            sketches_updated_at=Max("damage_sketches__updated_at"),
+            vehicle_updated_at=F("customer_vehicle__updated_at"),
+            presenter_updated_at=F("vehicle_presenter__updated_at"),
+        )
+        .values(
+            "updated_at",
+            "sketches_count",
+            "sketches_updated_at",
+            "vehicle_updated_at",
+            "presenter_updated_at",
+        )
+        .first()
+    )
+
+
+def _marker_key(marker: Any) -> str:
+    if isinstance(marker, tuple):
+        return "/".join(_marker_key(part) for part in marker)
+    if isinstance(marker, datetime):
+        return marker.isoformat()
+    return "-" if marker is None else str(marker)
+
+
+def _cache_key(workorder_id: int, section: Section, marker: Any) -> str:
+    return (
+        f"wo-snapshot:{SNAPSHOT_VERSION}:{workorder_id}:{section.name}:"
+        f"{_marker_key(marker)}"
+    )
+
+
+def section_hashes(workorder_id: int, use_cache: bool = True) -> dict[str, str] | None:
+    """
+    Hash of every snapshot section of a workorder (None if it does not
+    exist). One query for the change markers plus one per section whose
+    rows changed since it was last hashed, or per section without cache.
+    """
+    markers = _markers(workorder_id)
+    if markers is None:
+        return None
+
+    keys = {
+        section.name: _cache_key(workorder_id, section, section.marker(markers))
+        for section in SECTIONS
+    }
+    cached = cache.get_many(keys.values()) if use_cache else {}
+    hashes, fresh = {}, {}
+    for section in SECTIONS:
+        key = keys[section.name]
+        if key in cached:
+            hashes[section.name] = cached[key]
+        else:
+            hashes[section.name] = fresh[key] = hash_canonical(
+                section.load(workorder_id)
+            )
+    if fresh:
+        cache.set_many(fresh, SECTION_HASH_TTL)
+    return hashes
+
+
+def sign_workorder(workorder: WorkOrder) -> str | None:
+    """
+    Compute, from the rows and not the cache, and store the checksum of the
+    workorder as signed now. A workorder is signed once: returns None, and
+    stores nothing, if it already was (even by a concurrent request).
+    """
+    hashes = section_hashes(workorder.pk, use_cache=False)
+    checksum, signed_at = combine_hashes(hashes), timezone.now()
+    signed = (
+        WorkOrder.objects.filter(pk=workorder.pk, signed_at__isnull=True)
+        .filter(Q(checksum__isnull=True) | Q(checksum=""))
+        .update(checksum=checksum, checksum_sections=hashes, signed_at=signed_at)
+    )
+    if not signed:
+        return None
+    workorder.checksum = checksum
+    workorder.checksum_sections = hashes
+    workorder.signed_at = signed_at
+    return checksum
+
+
+@dataclass(frozen=True)
+class Verification:
+    valid: bool
+    checksum: str
+    # Sections that differ from the signed snapshot
+    changed: list[str]
+
+
+def verify_workorder(workorder: WorkOrder) -> Verification:
+    """Recompute the snapshot checksum and compare it with the signed one."""
+    hashes = section_hashes(workorder.pk)
+    checksum = combine_hashes(hashes)
+    signed = workorder.checksum_sections or {}
+    return Verification(
+        valid=bool(workorder.checksum)
+        and hmac.compare_digest(checksum, workorder.checksum),
+        checksum=checksum,
+        changed=sorted(name for name in hashes if signed.get(name) != hashes[name]),
+    )
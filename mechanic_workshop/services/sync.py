@@ -0,0 +1,288 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+from django.conf import settings
+from django.core import signing
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from mechanic_workshop.models.appointments import Appointment
+from mechanic_workshop.models.sync import SyncTombstone
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderDocument
+from users.models import WorkspaceMember
+from workspace_modules.models.base import Workspace
+
+SYNC_TOKEN_SALT = "mechanic_workshop.sync"
+SYNC_TOKEN_VERSION = 1
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 2000
+# Tombstones older than this are pruned, older watermarks need a full resync
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+# Rows are served once their updated_at is at least this old, see changes()
+DEFAULT_SYNC_COMMIT_LAG = 15  # seconds
+
+
+def get_sync_commit_lag() -> timedelta:
+    return timedelta(
+        seconds=getattr(settings, "SYNC_COMMIT_LAG_SECONDS", DEFAULT_SYNC_COMMIT_LAG)
+    )
+
+
+@dataclass(frozen=True)
+class SyncSource:
+    model: type[models.Model]
+    # Column holding the workspace (wid) or the workshop (uuid) of the row
+    scope_field: str
+    scoped_by_workshop: bool
+    fields: tuple[str, ...]
+
+
+SYNC_SOURCES: dict[str, SyncSource] = {
+    "members": SyncSource(
+        model=WorkspaceMember,
+        scope_field="workspace_id",
+        scoped_by_workshop=False,
+        fields=(
+            "uuid",
+            "role",
+            "is_active",
+            "customer_type",
+            "name",
+            "surname",
+            "alias",
+            "email",
+            "phone",
+            "tax_id",
+            "document_type",
+            "country",
+            "city",
+            "postal_code",
+            "address",
+            "updated_at",
+        ),
+    ),
+    "vehicles": SyncSource(
+        model=CustomerVehicle,
+        scope_field="main_workshop_id",
+        scoped_by_workshop=True,
+        fields=(
+            "id",
+            "owner_id",
+            "brand",
+            "model",
+            "license_plate",
+            "vin_number",
+            "color",
+            "manufactured_at",
+            "fuel_type",
+            "updated_at",
+        ),
+    ),
+    "workorders": SyncSource(
+        model=WorkOrder,
+        scope_field="workshop_id",
+        scoped_by_workshop=True,
+        fields=(
+            "id",
+            "workshop_number",
+            "customer_vehicle_id",
+            "vehicle_presenter_id",
+            "attended_by_id",
+            "stage",
+            "status",
+            "priority",
+            "description",
+            "car_entered",
+            "car_left",
+            "updated_at",
+        ),
+    ),
+    # Notifies clients when a requested PDF is ready
+    "documents": SyncSource(
+        model=WorkOrderDocument,
+        scope_field="workshop_id",
+        scoped_by_workshop=True,
+        fields=(
+            "id",
+            "work_order_id",
+            "kind",
+            "status",
+            "checksum",
+            "file",
+            "error",
+            "rendered_at",
+            "updated_at",
+        ),
+    ),
+    "appointments": SyncSource(
+        model=Appointment,
+        scope_field="workshop_id",
+        scoped_by_workshop=True,
+        fields=(
+            "id",
+            "workshop_customer_id",
+            "customer_vehicle_id",
+            "workshop_team_member_id",
+            "appointment_start",
+            "appointment_end",
+            "appointment_type",
+            "status",
+            "title",
+            "updated_at",
+        ),
+    ),
+}
+
+
+class SyncTokenError(Exception):
+    """The `since` watermark is invalid or belongs to another workspace."""
+
+
+def _after(ts_field: str, cursor: list[str] | None) -> Q:
+    """Keyset condition: rows strictly after the (timestamp, pk) cursor."""
+    if not cursor:
+        return Q()
+    ts, pk = parse_datetime(cursor[0]), cursor[1]
+    return Q(**{f"{ts_field}__gt": ts}) | Q(**{ts_field: ts, "pk__gt": pk})
+
+
+class WorkspaceSync:
+    """
+    Delta sync for tablet clients: rows changed since an opaque watermark plus
+    tombstones for deletions. Every source is read with a keyset on
+    (scope, updated_at, pk), so the cost depends on the changes, not on the
+    size of the dataset.
+    """
+
+    def __init__(self, workspace: Workspace):
+        self.workspace = workspace
+        self.workshop_id = workspace.main_business_id
+
+    def _encode(self, cursors: dict[str, list[str]]) -> str:
+        return signing.dumps(
+            {
+                "v": SYNC_TOKEN_VERSION,
+                "ws": self.workspace.pk,
+                "iat": timezone.now().isoformat(),
+                "c": cursors,
+            },
+            salt=SYNC_TOKEN_SALT,
+            compress=True,
+        )
+
+    def _decode(self, token: str) -> dict[str, Any]:
+        try:
+            payload = signing.loads(token, salt=SYNC_TOKEN_SALT)
+        except signing.BadSignature:
+            raise SyncTokenError("Invalid sync token")
+        if (
+            payload.get("v") != SYNC_TOKEN_VERSION
+            or payload.get("ws") != self.workspace.pk
+        ):
+            raise SyncTokenError("Invalid sync token")
+        return payload
+
+    def _tombstone_scope(self) -> Q:
+        scope = Q(workspace_id=self.workspace.pk)
+        if self.workshop_id is not None:
+            scope |= Q(workshop_id=self.workshop_id)
+        return scope
+
+    def _scope_value(self, source: SyncSource) -> Any:
+        return self.workshop_id if source.scoped_by_workshop else self.workspace.pk
+
+    @staticmethod
+    def _cursor(ts: datetime, pk: Any) -> list[str]:
+        return [ts.isoformat(), str(pk)]
+
+    def changes(self, since: str | None = None, limit: int = SYNC_DEFAULT_LIMIT):
+        """
+        Only rows older than the commit lag are served. updated_at (and
+        deleted_at) is set when the row is saved, before its transaction
+        commits: a row saved before, but committed after, the last row a
+        client read would be behind its watermark for good. The lag must stay
+        above the longest write transaction (plus clock skew between hosts).
+        """
+        horizon = timezone.now() - get_sync_commit_lag()
+        cursors: dict[str, list[str]] = {}
+        reset = since is None
+        if since:
+            payload = self._decode(since)
+            issued_at = parse_datetime(payload["iat"])
+            # Tombstones may have been pruned: the client must start over
+            if issued_at < timezone.now() - SYNC_TOMBSTONE_RETENTION:
+                reset = True
+            else:
+                cursors = payload["c"]
+
+        has_more = False
+        changes: dict[str, list[dict[str, Any]]] = {}
+        for name, source in SYNC_SOURCES.items():
+            if source.scoped_by_workshop and self.workshop_id is None:
+                changes[name] = []
+                continue
+
+            rows = list(
+                source.model.objects.filter(
+                    Q(**{source.scope_field: self._scope_value(source)})
+                    & _after("updated_at", cursors.get(name)),
+                    updated_at__lt=horizon,
+                )
+                .order_by("updated_at", "pk")
+                .values("pk", *source.fields)[: limit + 1]
+            )
+            if len(rows) > limit:
+                has_more, rows = True, rows[:limit]
+            if rows:
+                cursors[name] = self._cursor(rows[-1]["updated_at"], rows[-1]["pk"])
+            for row in rows:
+                row.pop("pk")
+            changes[name] = rows
+
+        # Deletions (a full resync does not need them)
+        deleted: list[dict[str, Any]] = []
+        if not reset:
+            tombstones = list(
+                SyncTombstone.objects.filter(
+                    self._tombstone_scope()
+                    & _after("deleted_at", cursors.get("tombstones")),
+                    deleted_at__lt=horizon,
+                )
+                .order_by("deleted_at", "id")
+                .values("id", "model", "object_id", "deleted_at")[: limit + 1]
+            )
+            if len(tombstones) > limit:
+                has_more, tombstones = True, tombstones[:limit]
+            if tombstones:
+                last = tombstones[-1]
+                cursors["tombstones"] = self._cursor(last["deleted_at"], last["id"])
+            deleted = [
+                {
+                    "model": t["model"],
+                    "id": t["object_id"],
+                    "deleted_at": t["deleted_at"],
+                }
+                for t in tombstones
+            ]
+        elif "tombstones" not in cursors:
+            # Start reading deletions from now on
+            latest = (
+                SyncTombstone.objects.filter(
+                    self._tombstone_scope(), deleted_at__lt=horizon
+                )
+                .order_by("-deleted_at", "-id")
+                .values("id", "deleted_at")
+                .first()
+            )
+            if latest:
+                cursors["tombstones"] = self._cursor(latest["deleted_at"], latest["id"])
+
+        return {
+            "reset": reset,
+            "has_more": has_more,
+            "changes": changes,
+            "deleted": deleted,
+            "next": self._encode(cursors),
+        }
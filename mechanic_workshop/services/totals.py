@@ -0,0 +1,116 @@
+from typing import Iterable
+from django.db import connection, transaction
+from mechanic_workshop.models.workorders import (
+    Discount,
+    ReplacementPart,
+    WorkOrder,
+    WorkOrderAssignment,
+)
+
+# Workorders refreshed per statement by the bulk recompute
+TOTALS_BATCH_SIZE = 500
+
+# Totals of a batch of workorders, computed and stored in one statement:
+# - labor: closed assignment segments, hours x (assignment or workorder) rate
+# - parts: line_total, or list price x quantity minus its discount
+# - discounts: order-level ones valid on the day the car entered; percentages
+#   apply to labor + parts, fixed amounts are subtracted after them
+TOTALS_SQL = """
+WITH ids AS (
+    SELECT DISTINCT unnest(%(ids)s::bigint[]) AS id
+),
+labor AS (
+    SELECT a.work_order_id AS id,
+           SUM(
+               EXTRACT(EPOCH FROM a.ended_at - a.started_at) / 3600
+               * COALESCE(a.price_per_hour, wo.price_per_hour, 0)
+           ) AS amount
+    FROM {assignments} a
+    JOIN {workorders} wo ON wo.id = a.work_order_id
+    WHERE a.work_order_id = ANY(%(ids)s)
+      AND a.started_at IS NOT NULL AND a.ended_at > a.started_at
+    GROUP BY a.work_order_id
+),
+parts AS (
+    SELECT a.work_order_id AS id,
+           SUM(COALESCE(
+               p.line_total,
+               p.list_price * p.quantity * (1 - COALESCE(p.discount_percent, 0) / 100),
+               0
+           )) AS amount
+    FROM {parts} p
+    JOIN {assignments} a ON a.id = p.workorder_id
+    WHERE a.work_order_id = ANY(%(ids)s)
+    GROUP BY a.work_order_id
+),
+discounts AS (
+    SELECT d.work_order_id AS id,
+           SUM(d.value) FILTER (WHERE d.discount_type = %(percentage)s) AS percent,
+           SUM(d.value) FILTER (WHERE d.discount_type = %(fixed)s) AS fixed
+    FROM {discounts} d
+    JOIN {workorders} wo ON wo.id = d.work_order_id
+    WHERE d.work_order_id = ANY(%(ids)s)
+      AND d.applies_to_total
+      AND d.valid_from <= wo.car_entered
+      AND (d.valid_until IS NULL OR d.valid_until >= wo.car_entered)
+    GROUP BY d.work_order_id
+),
+subtotals AS (
+    SELECT ids.id,
+           ROUND(COALESCE(labor.amount, 0), 2) AS labor,
+           ROUND(COALESCE(parts.amount, 0), 2) AS parts,
+           LEAST(COALESCE(discounts.percent, 0), 100) AS percent,
+           COALESCE(discounts.fixed, 0) AS fixed
+    FROM ids
+    LEFT JOIN labor ON labor.id = ids.id
+    LEFT JOIN parts ON parts.id = ids.id
+    LEFT JOIN discounts ON discounts.id = ids.id
+),
+computed AS (
+    SELECT id, labor, parts,
+           LEAST(
+               labor + parts,
+               ROUND((labor + parts) * percent / 100, 2) + fixed
+           ) AS discount
+    FROM subtotals
+)
+UPDATE {workorders} wo
+SET labor_total = c.labor,
+    parts_total = c.parts,
+    discount_total = c.discount,
+    total = c.labor + c.parts - c.discount,
+    totals_updated_at = NOW()
+FROM computed c
+WHERE wo.id = c.id
+"""
+
+
+def refresh_workorder_totals(workorder_ids: Iterable[int]) -> int:
+    """Recompute and store the totals of the given workorders (one statement)."""
+    ids = sorted(set(workorder_ids))
+    if not ids:
+        return 0
+
+    quote = connection.ops.quote_name
+    sql = TOTALS_SQL.format(
+        workorders=quote(WorkOrder._meta.db_table),
+        assignments=quote(WorkOrderAssignment._meta.db_table),
+        parts=quote(ReplacementPart._meta.db_table),
+        discounts=quote(Discount._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            {
+                "ids": ids,
+                "percentage": Discount.DiscountType.PERCENTAGE,
+                "fixed": Discount.DiscountType.FIXED_AMOUNT,
+            },
+        )
+        return cursor.rowcount
+
+
+def schedule_totals_refresh(workorder_id: int | None) -> None:
+    """Refresh the totals of a workorder once the current transaction commits."""
+    if workorder_id is not None:
+        transaction.on_commit(lambda: refresh_workorder_totals([workorder_id]))
@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from rest_framework import status
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderTransition
+
+Stage = WorkOrder.Stage
+Status = WorkOrder.Status
+
+# Moves allowed on the board (staying in the same stage/status is a no-op)
+STAGE_TRANSITIONS: dict[str, set[str]] = {
+    Stage.CHECKIN: {Stage.DIAGNOSIS, Stage.REPAIR},
+    Stage.DIAGNOSIS: {Stage.CHECKIN, Stage.REPAIR},
+    Stage.REPAIR: {Stage.DIAGNOSIS, Stage.QA, Stage.READY},
+    Stage.QA: {Stage.REPAIR, Stage.READY},
+    Stage.READY: {Stage.REPAIR, Stage.DELIVERED},
+    Stage.DELIVERED: set(),
+}
+STATUS_TRANSITIONS: dict[str, set[str]] = {
+    Status.OPEN: {Status.ON_HOLD, Status.BILLED, Status.CANCELLED, Status.CLOSED},
+    Status.ON_HOLD: {Status.OPEN, Status.CANCELLED},
+    Status.BILLED: {Status.OPEN, Status.CLOSED},
+    Status.CANCELLED: {Status.OPEN},
+    Status.CLOSED: set(),
+}
+
+# Max workorders moved by a single request
+MAX_BULK_TRANSITIONS = 200
+
+
+class TransitionError(Exception):
+    """Raised when a batch cannot be applied. Carries the API error payload."""
+
+    def __init__(self, errors: Any, status_code: int = status.HTTP_400_BAD_REQUEST):
+        super().__init__(errors)
+        self.errors = errors
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class Transition:
+    workorder_id: int
+    from_stage: str
+    to_stage: str
+    from_status: str
+    to_status: str
+
+
+def _check(current: str, target: str, allowed: dict[str, set[str]]) -> bool:
+    return target == current or target in allowed.get(current, set())
+
+
+def _parse(items: Any) -> dict[int, dict[str, str]]:
+    """Validate the shape of the batch ({id, stage?, status?} items)."""
+    if not isinstance(items, list) or not items:
+        raise TransitionError("Missing transitions list")
+    if len(items) > MAX_BULK_TRANSITIONS:
+        raise TransitionError(
+            f"Too many transitions (max {MAX_BULK_TRANSITIONS} per request)"
+        )
+
+    targets, errors = {}, {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+            errors[index] = "Each transition needs an integer id"
+            continue
+        stage, status_ = item.get("stage"), item.get("status")
+        if stage is None and status_ is None:
+            errors[index] = "Nothing to change (send stage and/or status)"
+        elif stage is not None and stage not in Stage.values:
+            errors[index] = f"Unknown stage: {stage}"
+        elif status_ is not None and status_ not in Status.values:
+            errors[index] = f"Unknown status: {status_}"
+        elif item["id"] in targets:
+            errors[index] = "Duplicated workorder"
+        else:
+            targets[item["id"]] = {"stage": stage, "status": status_}
+    if errors:
+        raise TransitionError(errors)
+    return targets
+
+
+def apply_bulk_transitions(
+    workshop_id: UUID, items: Any, changed_by_id: UUID | None = None
+) -> list[Transition]:
+    """
+    Move many workorders of a workshop at once, all or nothing, in three
+    statements whatever the batch size: lock + read the current state,
+    one set-based UPDATE with CASE per column, one bulk insert of the log.
+    """
+    targets = _parse(items)
+
+    with transaction.atomic():
+        current = {
+            row["id"]: row
+            for row in WorkOrder.objects.select_for_update()
+            .filter(workshop_id=workshop_id, pk__in=targets)
+            .values("id", "stage", "status")
+        }
+
+        errors, transitions = {}, []
+        for workorder_id, target in targets.items():
+            row = current.get(workorder_id)
+            if row is None:
+                errors[workorder_id] = "Workorder not found"
+                continue
+            to_stage = target["stage"] or row["stage"]
+            to_status = target["status"] or row["status"]
+            if not _check(row["stage"], to_stage, STAGE_TRANSITIONS):
+                errors[workorder_id] = f"Cannot move from {row['stage']} to {to_stage}"
+            elif not _check(row["status"], to_status, STATUS_TRANSITIONS):
+                errors[workorder_id] = (
+                    f"Cannot change status from {row['status']} to {to_status}"
+                )
+            elif (to_stage, to_status) != (row["stage"], row["status"]):
+                transitions.append(
+                    Transition(
+                        workorder_id=workorder_id,
+                        from_stage=row["stage"],
+                        to_stage=to_stage,
+                        from_status=row["status"],
+                        to_status=to_status,
+                    )
+                )
+        if errors:
+            raise TransitionError(
+                {str(k): v for k, v in errors.items()},
+                status_code=status.HTTP_409_CONFLICT,
+            )
+        if not transitions:
+            return []
+
+        now = timezone.now()
+        WorkOrder.objects.filter(pk__in=[t.workorder_id for t in transitions]).update(
+            stage=Case(
+                *[When(pk=t.workorder_id, then=Value(t.to_stage)) for t in transitions],
+                default=F("stage"),
+            ),
+            status=Case(
+                *[
+                    When(pk=t.workorder_id, then=Value(t.to_status))
+                    for t in transitions
+                ],
+                default=F("status"),
+            ),
+            # update() skips auto_now; delta sync relies on updated_at
+            updated_at=now,
+        )
+        WorkOrderTransition.objects.bulk_create(
+            [
+                WorkOrderTransition(
+                    work_order_id=t.workorder_id,
+                    workshop_id=workshop_id,
+                    from_stage=t.from_stage,
+                    to_stage=t.to_stage,
+                    from_status=t.from_status,
+                    to_status=t.to_status,
+                    changed_by_id=changed_by_id,
+                    created_at=now,
+                )
+                for t in transitions
+            ]
+        )
+    return transitions
@@ -0,0 +1,264 @@
+from django.db import connections, transaction
+from django.db.models import Max
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_migrate,
+)
+from django.dispatch import receiver
+from mechanic_workshop.models.appointments import Appointment
+from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.models.counters import (
+    NUMBERING_SEQUENCE,
+    WorkshopCounter,
+    get_numbering_mode,
+)
+from mechanic_workshop.models.sync import SyncTombstone
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import (
+    WORKORDER_COUNTER,
+    Discount,
+    ReplacementPart,
+    WorkOrder,
+    WorkOrderAssignment,
+    WorkOrderDamageSketch,
+)
+from mechanic_workshop.services.sketches import strokes_hash
+from mechanic_workshop.services.totals import schedule_totals_refresh
+from mechanic_workshop.tasks.sketch_tasks import (
+    render_sketch_thumbnails,
+    render_workorder_damage_thumbnails,
+)
+from mechanic_workshop.utils.vehicles import (
+    backfill_vehicle_keys,
+    vehicles_missing_keys,
+)
+from users.models import WorkspaceMember
+
+
+@receiver(pre_migrate)
+def create_postgres_extensions(sender, using, **kwargs):
+    """pg_trgm backs the fuzzy plate/VIN indexes of CustomerVehicle."""
+    if sender.name != "mechanic_workshop":
+        return
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+def _table_columns(connection, table: str) -> set[str]:
+    """Columns of a table, empty if it does not exist yet (first migrate)."""
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return set()
+        return {
+            column.name
+            for column in connection.introspection.get_table_description(cursor, table)
+        }
+
+
+@receiver(pre_migrate)
+def release_duplicate_vehicle_keys(sender, using, **kwargs):
+    """
+    Plate and VIN keys are unique per workshop (uq_vehicle_workshop_plate,
+    uq_vehicle_workshop_vin). Vehicles saved before may share them: the most
+    recently updated one keeps the key, so adding the constraints does not
+    fail. fill_vehicle_keys recomputes the keys afterwards.
+    """
+    if sender.name != "mechanic_workshop":
+        return
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    meta = CustomerVehicle._meta
+    columns = _table_columns(connection, meta.db_table)
+    quote = connection.ops.quote_name
+    table, pk = quote(meta.db_table), quote(meta.pk.column)
+    with connection.cursor() as cursor:
+        for column in {"plate_key", "vin_key"} & columns:
+            cursor.execute(
+                f"UPDATE {table} SET {quote(column)} = '' WHERE {pk} IN ("
+                f"SELECT {pk} FROM (SELECT {pk}, ROW_NUMBER() OVER ("
+                f"PARTITION BY main_workshop_id, {quote(column)} "
+                f"ORDER BY updated_at DESC, {pk} DESC) AS position "
+                f"FROM {table} WHERE {quote(column)} <> '') AS ranked "
+                f"WHERE position > 1)"
+            )
+
+
+@receiver(pre_migrate)
+def close_duplicate_open_segments(sender, using, **kwargs):
+    """
+    A technician has a single open segment (uniq_open_assignment). Segments
+    opened before may overlap: all but the latest are closed when the latest
+    started, so adding the constraint does not fail.
+    """
+    if sender.name != "mechanic_workshop":
+        return
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    meta = WorkOrderAssignment._meta
+    if not {"assignee_id", "started_at", "ended_at", "updated_at"} <= _table_columns(
+        connection, meta.db_table
+    ):
+        return
+    quote = connection.ops.quote_name
+    table, pk = quote(meta.db_table), quote(meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET ended_at = ranked.latest, updated_at = NOW() "
+            f"FROM (SELECT {pk}, "
+            f"ROW_NUMBER() OVER (PARTITION BY assignee_id "
+            f"ORDER BY started_at DESC, {pk} DESC) AS position, "
+            f"MAX(started_at) OVER (PARTITION BY assignee_id) AS latest "
+            f"FROM {table} WHERE ended_at IS NULL AND started_at IS NOT NULL "
+            f"AND assignee_id IS NOT NULL) AS ranked "
+            f"WHERE {table}.{pk} = ranked.{pk} AND ranked.position > 1"
+        )
+
+
+@receiver(post_migrate)
+def fill_vehicle_keys(sender, using, verbosity=1, **kwargs):
+    """
+    Vehicles saved before the keys existed get them on the first migrate,
+    so the upsert matches returning cars instead of duplicating them. The
+    vehicles sharing a plate/VIN keep their text but not the key (see
+    backfill_vehicle_keys) and are listed to be merged by hand.
+    """
+    if sender.name != "mechanic_workshop" or not vehicles_missing_keys(using):
+        return
+    updated, duplicates = backfill_vehicle_keys(using)
+    if verbosity >= 1:
+        print(f"  Filled the plate/VIN keys of {updated} vehicles.")
+        if duplicates:
+            print(
+                f"  {len(duplicates)} vehicles share a plate or VIN with another "
+                f"one and were left without it (merge them by hand): "
+                f"{sorted(duplicates)[:50]}"
+            )
+
+
+# Numbering sequences (WORKSHOP_NUMBERING_MODE = "sequence") are created
+# with the workshop, or on migrate for workshops numbered before
+@receiver(post_save, sender=MechanicWorkshop)
+def create_workshop_sequences(sender, instance, created, **kwargs):
+    if created and get_numbering_mode() == NUMBERING_SEQUENCE:
+        WorkshopCounter.create_sequence(instance.pk, WORKORDER_COUNTER)
+
+
+@receiver(post_migrate)
+def create_missing_workshop_sequences(sender, using, **kwargs):
+    if sender.name != "mechanic_workshop" or get_numbering_mode() != NUMBERING_SEQUENCE:
+        return
+    if connections[using].vendor != "postgresql":
+        return
+    last_numbers = dict(
+        WorkOrder.objects.using(using)
+        .filter(workshop__isnull=False)
+        .values("workshop")
+        .annotate(last=Max("workshop_number"))
+        .values_list("workshop", "last")
+    )
+    for workshop_id in MechanicWorkshop.objects.using(using).values_list(
+        "pk", flat=True
+    ):
+        WorkshopCounter.create_sequence(
+            workshop_id,
+            WORKORDER_COUNTER,
+            start=(last_numbers.get(workshop_id) or 0) + 1,
+        )
+
+
+# Tombstones for the delta sync endpoint
+@receiver(post_delete, sender=WorkspaceMember)
+def record_member_tombstone(sender, instance, **kwargs):
+    SyncTombstone.objects.create(
+        workspace_id=instance.workspace_id, model="members", object_id=str(instance.pk)
+    )
+
+
+@receiver(post_delete, sender=CustomerVehicle)
+def record_vehicle_tombstone(sender, instance, **kwargs):
+    SyncTombstone.objects.create(
+        workshop_id=instance.main_workshop_id,
+        model="vehicles",
+        object_id=str(instance.pk),
+    )
+
+
+@receiver(post_delete, sender=WorkOrder)
+def record_workorder_tombstone(sender, instance, **kwargs):
+    if instance.workshop_id:
+        SyncTombstone.objects.create(
+            workshop_id=instance.workshop_id,
+            model="workorders",
+            object_id=str(instance.pk),
+        )
+
+
+@receiver(post_delete, sender=Appointment)
+def record_appointment_tombstone(sender, instance, **kwargs):
+    if instance.workshop_id:
+        SyncTombstone.objects.create(
+            workshop_id=instance.workshop_id,
+            model="appointments",
+            object_id=str(instance.pk),
+        )
+
+
+# Thumbnails are rendered after commit, only when the strokes changed
+@receiver(post_save, sender=WorkOrderDamageSketch)
+def enqueue_sketch_thumbnails(sender, instance, **kwargs):
+    if (
+        strokes_hash(instance.views, instance.bg_car_id, instance.stroke_color)
+        != instance.strokes_hash
+    ):
+        transaction.on_commit(lambda: render_sketch_thumbnails.delay(instance.pk))
+
+
+@receiver(post_save, sender=WorkOrder)
+def enqueue_workorder_damage_thumbnails(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {"damage", "vehicle_sketch_model"} & set(update_fields):
+        return
+    if not instance.damage and not instance.damage_hash:
+        return
+    digest = strokes_hash(instance.damage or {}, instance.vehicle_sketch_model)
+    if digest != instance.damage_hash:
+        transaction.on_commit(
+            lambda: render_workorder_damage_thumbnails.delay(instance.pk)
+        )
+
+
+# Materialized workorder totals (labor + parts - discounts)
+@receiver(post_save, sender=WorkOrderAssignment)
+@receiver(post_delete, sender=WorkOrderAssignment)
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+def refresh_totals_on_change(sender, instance, **kwargs):
+    schedule_totals_refresh(instance.work_order_id)
+
+
+@receiver(post_save, sender=ReplacementPart)
+@receiver(post_delete, sender=ReplacementPart)
+def refresh_totals_on_part_change(sender, instance, **kwargs):
+    assignment = instance._state.fields_cache.get("workorder")
+    if assignment is not None:
+        workorder_id = assignment.work_order_id
+    else:
+        workorder_id = (
+            WorkOrderAssignment.objects.filter(pk=instance.workorder_id)
+            .values_list("work_order_id", flat=True)
+            .first()
+        )
+    schedule_totals_refresh(workorder_id)
+
+
+@receiver(post_save, sender=WorkOrder)
+def refresh_totals_on_pricing_change(sender, instance, created, **kwargs):
+    if not created and instance.pricing_changed:
+        schedule_totals_refresh(instance.pk)
+        instance._loaded_pricing = (instance.price_per_hour, instance.car_entered)
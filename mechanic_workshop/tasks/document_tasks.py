@@ -0,0 +1,71 @@
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils import timezone
+from core.workers import worker
+from mechanic_workshop.models.workorders import WorkOrderDocument
+from mechanic_workshop.services.documents import (
+    DOCUMENT_MAX_ATTEMPTS,
+    RendererError,
+    render_document,
+)
+
+Status = WorkOrderDocument.Status
+
+
+@worker(queue="default")
+def render_workorder_document(document_id: int) -> bool:
+    """
+    Render a requested workorder document with the pdf-renderer service.
+    Retried with exponential backoff while the renderer is busy or down.
+    """
+    # Claim the document: a duplicated message finds it already rendering
+    claimed = WorkOrderDocument.objects.filter(
+        pk=document_id, status=Status.PENDING
+    ).update(
+        status=Status.RENDERING,
+        attempts=F("attempts") + 1,
+        # update() skips auto_now; stale documents are detected with updated_at
+        updated_at=timezone.now(),
+    )
+    document = WorkOrderDocument.objects.filter(pk=document_id).first()
+    if not claimed or document is None:
+        return False
+
+    try:
+        name = render_document(document)
+    except RendererError as exc:
+        failed = not exc.retryable or document.attempts >= DOCUMENT_MAX_ATTEMPTS
+        WorkOrderDocument.objects.filter(pk=document_id).update(
+            status=Status.FAILED if failed else Status.PENDING,
+            error=str(exc)[:512],
+            updated_at=timezone.now(),
+        )
+        if not failed:
+            render_workorder_document.apply_async(
+                (document_id,), countdown=2**document.attempts * 5
+            )
+        return False
+    except Exception as exc:
+        # Template or storage errors: retrying will not help
+        WorkOrderDocument.objects.filter(pk=document_id).update(
+            status=Status.FAILED, error=str(exc)[:512], updated_at=timezone.now()
+        )
+        raise
+
+    WorkOrderDocument.objects.filter(pk=document_id).update(
+        status=Status.READY,
+        file=name,
+        size=document_size(name),
+        error="",
+        rendered_at=timezone.now(),
+        # Delta sync relies on updated_at
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def document_size(name: str) -> int:
+    try:
+        return default_storage.size(name)
+    except (NotImplementedError, OSError):
+        return 0
@@ -0,0 +1,46 @@
+from core.workers import worker
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderDamageSketch
+from mechanic_workshop.services.sketches import render_thumbnails, strokes_hash
+
+
+@worker(queue="default")
+def render_sketch_thumbnails(sketch_id: int) -> bool:
+    """Render the views of a damage sketch. Returns False if nothing changed."""
+    sketch = WorkOrderDamageSketch.objects.filter(pk=sketch_id).first()
+    if sketch is None:
+        return False
+
+    views = sketch.views
+    digest = strokes_hash(views, sketch.bg_car_id, sketch.stroke_color)
+    if digest == sketch.strokes_hash:
+        return False
+
+    thumbnails = render_thumbnails(views, sketch.bg_car_id, sketch.stroke_color)
+    # update() so the sketch is not saved again (and the task not re-enqueued)
+    WorkOrderDamageSketch.objects.filter(pk=sketch_id).update(
+        strokes_hash=digest, thumbnails=thumbnails
+    )
+    return True
+
+
+@worker(queue="default")
+def render_workorder_damage_thumbnails(workorder_id: int) -> bool:
+    """Render the damage views sent with an entrance. Returns False if nothing changed."""
+    workorder = (
+        WorkOrder.objects.filter(pk=workorder_id)
+        .only("damage", "damage_hash", "vehicle_sketch_model")
+        .first()
+    )
+    if workorder is None:
+        return False
+
+    views = workorder.damage or {}
+    digest = strokes_hash(views, workorder.vehicle_sketch_model)
+    if digest == workorder.damage_hash:
+        return False
+
+    thumbnails = render_thumbnails(views, workorder.vehicle_sketch_model)
+    WorkOrder.objects.filter(pk=workorder_id).update(
+        damage_hash=digest, damage_thumbnails=thumbnails
+    )
+    return True
@@ -0,0 +1,13 @@
+from django.utils import timezone
+from core.workers import worker
+from mechanic_workshop.models.sync import SyncTombstone
+from mechanic_workshop.services.sync import SYNC_TOMBSTONE_RETENTION
+
+
+@worker(queue="default")
+def prune_sync_tombstones() -> int:
+    """Delete tombstones no sync token can still ask for (run daily)."""
+    deleted, _ = SyncTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - SYNC_TOMBSTONE_RETENTION
+    ).delete()
+    return deleted
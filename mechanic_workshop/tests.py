@@ -1,3 +1,540 @@
-from django.test import TestCase
+import threading
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, force_authenticate
+from mechanic_workshop.models.base import MechanicWorkshop
+from mechanic_workshop.models.counters import (
+    NUMBERING_GAPLESS,
+    NUMBERING_SEQUENCE,
+    WorkshopCounter,
+)
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import (
+    WORKORDER_COUNTER,
+    WorkOrder,
+    WorkOrderAssignment,
+)
+from mechanic_workshop.services.clock import ClockError, clock_in
+from mechanic_workshop.services.intake import (
+    INTAKE_QUERY_BUDGET,
+    EntranceIntakeService,
+)
+from mechanic_workshop.services.snapshots import sign_workorder
+from mechanic_workshop.signals import fill_vehicle_keys
+from mechanic_workshop.serializers.workorders import (
+    DamageStrokesField,
+    StrokesField,
+)
+from mechanic_workshop.utils.strokes import (
+    PointBudget,
+    SketchTooLarge,
+    encode_strokes,
+    simplify_points,
+)
+from mechanic_workshop.utils.vehicles import lookup_vehicles, upsert_customer_vehicle
+from mechanic_workshop.utils.vin import vin_prefill
+from mechanic_workshop.views import WorkshopEntrancesViewSet
+from users.models import Account, WorkspaceMember
+from workspace_modules.models.base import Workspace
 
-# Create your tests here.
+# SAVEPOINT + RELEASE SAVEPOINT of an atomic block nested in the test transaction
+SAVEPOINT_QUERIES = 2
+# Membership, vehicles page (owner joined) and authorized people prefetch
+WORKSHOP_VEHICLES_QUERIES = 3
+
+
+def create_workshop(tax_id: str) -> tuple[Workspace, MechanicWorkshop]:
+    workshop = MechanicWorkshop.objects.create(
+        business_name=f"Talleres {tax_id}", tax_id=tax_id, email="t@example.com"
+    )
+    workspace = Workspace.objects.create(
+        short_name=workshop.business_name,
+        main_business_ct=ContentType.objects.get_for_model(MechanicWorkshop),
+        main_business_id=workshop.pk,
+    )
+    workshop.workspace = workspace
+    workshop.save(update_fields=["workspace"])
+    return workspace, workshop
+
+
+def create_member(
+    workspace: Workspace,
+    email: str,
+    role: str = WorkspaceMember.WorkspaceRole.OWNER,
+) -> WorkspaceMember:
+    return WorkspaceMember.objects.create(
+        workspace=workspace,
+        account=Account.objects.create_user(email=email),
+        role=role,
+        name=email.split("@")[0],
+        tax_id=email,
+    )
+
+
+def entrance_payload(email: str, plate: str, **customer) -> dict:
+    return {
+        "customer": {
+            "name": "Ana",
+            "surname": "Test",
+            "email": email,
+            "phone": "+34600000000",
+            "tax_id": {"value": "00000000T", "document_type": "DNI"},
+            "is_vehicle_owner": True,
+            **customer,
+        },
+        "vehicle": {"brand": "Seat", "model": "Ibiza", "license_plate": plate},
+        "workorder": {"description": "Noise when braking", "mileage": 120000},
+    }
+
+
+class EntranceIntakeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.workspace, cls.workshop = create_workshop("B00000028")
+        cls.caller = create_member(cls.workspace, "front.desk@example.com")
+
+    def setUp(self):
+        self.intake = EntranceIntakeService.for_caller(
+            account=self.caller.account, workspace_id=self.workspace.pk
+        )
+        # The first workorder of a workshop also seeds its counter
+        self.intake.run(entrance_payload("first@example.com", "0000AAA"))
+
+    def run_entrance(self, payload: dict):
+        with self.assertNumQueries(INTAKE_QUERY_BUDGET + SAVEPOINT_QUERIES):
+            intake = EntranceIntakeService.for_caller(
+                account=self.caller.account, workspace_id=self.workspace.pk
+            )
+            return intake.run(payload)
+
+    def test_new_customer_within_query_budget(self):
+        result = self.run_entrance(entrance_payload("new@example.com", "1234BCD"))
+
+        customer = WorkspaceMember.objects.get(pk=result.customer.pk)
+        self.assertEqual(customer.account.email, "new@example.com")
+        self.assertEqual(result.vehicle.owner_id, customer.pk)
+        self.assertEqual(result.workorder.vehicle_presenter_id, customer.pk)
+
+    def test_returning_customer_reuses_account_and_member(self):
+        first = self.intake.run(entrance_payload("back@example.com", "1234BCD"))
+        second = self.run_entrance(
+            entrance_payload("back@example.com", "5678FGH", phone="+34611111111")
+        )
+
+        self.assertEqual(Account.objects.filter(email="back@example.com").count(), 1)
+        self.assertEqual(second.customer.account_id, first.customer.account_id)
+        self.assertEqual(second.customer.pk, first.customer.pk)
+        self.assertEqual(
+            WorkspaceMember.objects.get(pk=first.customer.pk).phone, "+34611111111"
+        )
+
+        vehicle = CustomerVehicle.objects.get(pk=second.vehicle.pk)
+        self.assertEqual(vehicle.owner_id, first.customer.pk)
+        self.assertQuerySetEqual(
+            vehicle.authorized_people.values_list("pk", flat=True),
+            [first.customer.pk],
+        )
+        self.assertEqual(
+            WorkOrder.objects.get(pk=second.workorder.pk).vehicle_presenter_id,
+            first.customer.pk,
+        )
+
+    def test_returning_account_is_not_demoted(self):
+        staff = Account.objects.create_user(email="staff@example.com")
+        staff.is_staff = True
+        staff.save()
+
+        result = self.run_entrance(entrance_payload("staff@example.com", "1234BCD"))
+
+        staff.refresh_from_db()
+        self.assertEqual(result.customer.account_id, staff.pk)
+        self.assertTrue(staff.is_active)
+        self.assertTrue(staff.is_staff)
+
+
+class WorkshopVehiclesQueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.workspace, cls.workshop = create_workshop("B00000037")
+        cls.caller = create_member(cls.workspace, "owner@example.com")
+        cls.next_plate = 0
+
+    def add_vehicles(self, count: int) -> None:
+        for _ in range(count):
+            self.next_plate += 1
+            owner = create_member(
+                self.workspace,
+                f"customer{self.next_plate}@example.com",
+                role=WorkspaceMember.WorkspaceRole.CUSTOMER,
+            )
+            vehicle = CustomerVehicle.objects.create(
+                main_workshop=self.workshop,
+                owner=owner,
+                license_plate=f"{self.next_plate:04d}VEH",
+            )
+            vehicle.authorized_people.add(owner, self.caller)
+
+    def list_vehicles(self, **params) -> dict:
+        request = APIRequestFactory().get(
+            "/api/v1/mechanic-workshop/entrances/workshop-vehicles/",
+            {"wsId": self.workspace.pk, **params},
+        )
+        force_authenticate(request, user=self.caller.account)
+        view = WorkshopEntrancesViewSet.as_view({"get": "get_workshop_vehicles"})
+        with self.assertNumQueries(WORKSHOP_VEHICLES_QUERIES):
+            response = view(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_does_not_grow_with_vehicles(self):
+        self.add_vehicles(1)
+        self.assertEqual(len(self.list_vehicles()["vehicles"]), 1)
+
+        self.add_vehicles(9)
+        vehicles = self.list_vehicles()["vehicles"]
+        self.assertEqual(len(vehicles), 10)
+        self.assertTrue(all(len(v["authorized_people"]) == 2 for v in vehicles))
+
+    def test_plate_filter_matches_the_search_key_prefix(self):
+        self.add_vehicles(12)
+        vehicles = self.list_vehicles(plate="oo1 ")["vehicles"]
+        self.assertEqual(
+            sorted(v["license_plate"] for v in vehicles),
+            ["0010VEH", "0011VEH", "0012VEH"],
+        )
+
+
+def run_concurrently(target, threads: int) -> list:
+    """
+    Call `target` from `threads` threads released at once and return what
+    they returned. Each thread uses (and closes) its own connection.
+    """
+    barrier = threading.Barrier(threads)
+    results, errors = [], []
+
+    def run():
+        try:
+            barrier.wait()
+            results.append(target())
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class WorkshopCounterConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+
+    def setUp(self):
+        # Created in gapless mode: the workshop has no sequence yet
+        self.workspace, self.workshop = create_workshop("B00000036")
+
+    def tearDown(self):
+        sequence = WorkshopCounter.sequence_name(self.workshop.pk, WORKORDER_COUNTER)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DROP SEQUENCE IF EXISTS {connection.ops.quote_name(sequence)}"
+            )
+
+    def take_numbers(self) -> list[int]:
+        def take_number():
+            with transaction.atomic():
+                return WorkshopCounter.next_value(self.workshop.pk, WORKORDER_COUNTER)
+
+        return sorted(run_concurrently(take_number, self.THREADS))
+
+    @override_settings(WORKSHOP_NUMBERING_MODE=NUMBERING_GAPLESS)
+    def test_gapless_numbers_are_unique_and_consecutive(self):
+        self.assertEqual(self.take_numbers(), list(range(1, self.THREADS + 1)))
+
+    @override_settings(WORKSHOP_NUMBERING_MODE=NUMBERING_GAPLESS)
+    def test_failed_insert_gives_its_number_back(self):
+        vehicle = CustomerVehicle.objects.create(
+            main_workshop=self.workshop, license_plate="3600GPL"
+        )
+        # The foreign key is only checked when the insert commits
+        broken = WorkOrder(
+            workshop=self.workshop, customer_vehicle=vehicle, attended_by_id=0
+        )
+        with self.assertRaises(IntegrityError):
+            broken.save()
+        self.assertIsNone(broken.workshop_number)
+
+        workorder = WorkOrder.objects.create(
+            workshop=self.workshop, customer_vehicle=vehicle
+        )
+        self.assertEqual(workorder.workshop_number, 1)
+
+    @override_settings(WORKSHOP_NUMBERING_MODE=NUMBERING_SEQUENCE)
+    def test_missing_sequence_is_created_once(self):
+        self.assertEqual(self.take_numbers(), list(range(1, self.THREADS + 1)))
+
+    @override_settings(WORKSHOP_NUMBERING_MODE=NUMBERING_SEQUENCE)
+    def test_sequence_is_created_with_the_workshop(self):
+        _, workshop = create_workshop("B00000136")
+        sequence = WorkshopCounter.sequence_name(workshop.pk, WORKORDER_COUNTER)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [sequence])
+            self.assertIsNotNone(cursor.fetchone()[0])
+            cursor.execute(f"DROP SEQUENCE {connection.ops.quote_name(sequence)}")
+
+
+class ClockInConcurrencyTests(TransactionTestCase):
+    THREADS = 4
+
+    def setUp(self):
+        self.workspace, self.workshop = create_workshop("B00000047")
+        self.technician = create_member(
+            self.workspace,
+            "tech@example.com",
+            role=WorkspaceMember.WorkspaceRole.TECHNICHIAN,
+        )
+        vehicle = CustomerVehicle.objects.create(
+            main_workshop=self.workshop, license_plate="4700CLK"
+        )
+        self.workorders = [
+            WorkOrder.objects.create(workshop=self.workshop, customer_vehicle=vehicle)
+            for _ in range(self.THREADS)
+        ]
+
+    def open_segments(self):
+        return WorkOrderAssignment.objects.filter(
+            assignee=self.technician, ended_at__isnull=True, started_at__isnull=False
+        )
+
+    def test_concurrent_clock_ins_leave_one_open_segment(self):
+        workorder_ids = iter([workorder.pk for workorder in self.workorders])
+        lock = threading.Lock()
+
+        def clock_in_next():
+            with lock:
+                workorder_id = next(workorder_ids)
+            try:
+                opened, _ = clock_in(self.technician, self.workshop.pk, workorder_id)
+            except ClockError as exc:
+                # Retries exhausted by the other clock-ins: rejected, not duplicated
+                self.assertEqual(exc.status_code, 409)
+                return None
+            return opened.pk
+
+        opened = [pk for pk in run_concurrently(clock_in_next, self.THREADS) if pk]
+
+        self.assertTrue(opened)
+        self.assertEqual(self.open_segments().count(), 1)
+        self.assertIn(self.open_segments().get().pk, opened)
+
+    def test_planned_segments_are_not_closed(self):
+        planned = WorkOrderAssignment.objects.create(
+            work_order=self.workorders[0], assignee=self.technician
+        )
+        clock_in(self.technician, self.workshop.pk, self.workorders[1].pk)
+        clock_in(self.technician, self.workshop.pk, self.workorders[2].pk)
+
+        planned.refresh_from_db()
+        self.assertIsNone(planned.started_at)
+        self.assertIsNone(planned.ended_at)
+        self.assertEqual(
+            self.open_segments().get().work_order_id, self.workorders[2].pk
+        )
+
+
+class SimplifyPointsTests(SimpleTestCase):
+    def test_collinear_points_are_dropped(self):
+        points = [(0, 0), (1, 0.01), (2, 0), (3, -0.01), (4, 0)]
+        self.assertEqual(simplify_points(points, tolerance=0.5), [(0, 0), (4, 0)])
+
+    def test_stroke_doubling_back_keeps_its_turn(self):
+        # (10, 0) is on the line through the endpoints but far off the segment
+        points = [(0, 0), (10, 0), (5, 0)]
+        self.assertEqual(simplify_points(points, tolerance=0.5), points)
+
+
+class StrokesBudgetTests(SimpleTestCase):
+    def nested(self, depth):
+        value = [0, 0]
+        for _ in range(depth):
+            value = {"a": value}
+        return value
+
+    def test_unknown_value_is_charged_once(self):
+        budget = PointBudget(10)
+        strokes = [[[0, 0]] * 8, "x"]
+        self.assertEqual(encode_strokes(strokes, budget), strokes)
+        self.assertEqual(budget.used, 8)
+
+    def test_unknown_value_over_budget(self):
+        with self.assertRaises(SketchTooLarge):
+            encode_strokes([[[0, 0]] * 11, "x"], PointBudget(10))
+
+    def test_deep_nesting_is_a_validation_error(self):
+        with self.assertRaises(ValidationError):
+            DamageStrokesField().to_internal_value({"front": self.nested(12)})
+        with self.assertRaises(ValidationError):
+            StrokesField().to_internal_value([self.nested(12)])
+
+
+class VehicleUpsertTests(TestCase):
+    VIN = "1HGCM82633A004352"
+    OTHER_VIN = "VF1RFB00X56789012"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.workspace, cls.workshop = create_workshop("B00000040")
+        cls.caller = create_member(cls.workspace, "front.desk@example.com")
+
+    def upsert(self, plate: str | None = None, vin: str | None = None, **attributes):
+        with self.assertNumQueries(1):
+            return upsert_customer_vehicle(
+                main_workshop_id=self.workshop.pk,
+                vin_number=vin,
+                license_plate=plate,
+                attributes=attributes,
+            )
+
+    def test_plates_differing_by_confusables_are_different_vehicles(self):
+        first = self.upsert(plate="AB-12 O")
+        second = self.upsert(plate="AB120")
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(self.upsert(plate="ab12o").pk, first.pk)
+
+        match, vehicles = lookup_vehicles(self.workshop.pk, "AB 12 0")
+        self.assertEqual(match, "exact")
+        self.assertEqual({v.pk for v in vehicles}, {first.pk, second.pk})
+
+    def test_vin_only_vehicle_keeps_its_row_when_it_gets_a_plate(self):
+        vehicle = self.upsert(vin=self.VIN)
+        again = self.upsert(plate="1234BCD", vin=self.VIN, model="Accord")
+
+        self.assertEqual(again.pk, vehicle.pk)
+        vehicle = CustomerVehicle.objects.get(pk=vehicle.pk)
+        self.assertEqual((vehicle.plate_key, vehicle.model), ("1234BCD", "Accord"))
+        self.assertEqual(CustomerVehicle.objects.count(), 1)
+
+    def test_returning_plate_without_vin_keeps_the_stored_vin(self):
+        vehicle = self.upsert(plate="1234BCD", vin=self.VIN)
+        self.assertEqual(self.upsert(plate="1234 bcd").pk, vehicle.pk)
+        self.assertEqual(CustomerVehicle.objects.get(pk=vehicle.pk).vin_key, self.VIN)
+
+    def test_plate_and_vin_of_two_vehicles_conflict(self):
+        self.upsert(plate="1234BCD")
+        self.upsert(vin=self.OTHER_VIN)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.upsert(plate="1234BCD", vin=self.OTHER_VIN)
+
+        payload = entrance_payload("ana@example.com", "1234 BCD")
+        payload["vehicle"]["vin_number"] = self.OTHER_VIN
+        request = APIRequestFactory().post(
+            f"/api/v1/mechanic-workshop/entrances/?wsId={self.workspace.pk}",
+            payload,
+            format="json",
+        )
+        force_authenticate(request, user=self.caller.account)
+        response = WorkshopEntrancesViewSet.as_view({"post": "create"})(request)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.data["error"],
+            "The plate and the VIN belong to different vehicles",
+        )
+        self.assertFalse(WorkOrder.objects.filter(workshop=self.workshop).exists())
+
+    def test_migrate_fills_the_keys_of_existing_vehicles(self):
+        older = self.upsert(plate="1234BCD")
+        newer = self.upsert(plate="5678BCD")
+        # Rows saved before the keys existed, two of them sharing a plate
+        CustomerVehicle.objects.filter(pk=older.pk).update(
+            plate_key="", plate_search_key="", updated_at=timezone.now()
+        )
+        CustomerVehicle.objects.filter(pk=newer.pk).update(
+            license_plate="1234 bcd",
+            plate_key="",
+            plate_search_key="",
+            updated_at=timezone.now(),
+        )
+
+        fill_vehicle_keys(
+            sender=apps.get_app_config("mechanic_workshop"),
+            using="default",
+            verbosity=0,
+        )
+        self.assertEqual(self.upsert(plate="1234BCD").pk, newer.pk)
+        older = CustomerVehicle.objects.get(pk=older.pk)
+        self.assertEqual((older.plate_key, older.plate_search_key), ("", "1234BCD"))
+
+
+class VinPrefillTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.workshop = create_workshop("B00000039")
+
+    def upsert(self, vin: str, **attributes) -> CustomerVehicle:
+        vehicle = upsert_customer_vehicle(
+            main_workshop_id=self.workshop.pk,
+            vin_number=vin,
+            license_plate=None,
+            attributes=attributes,
+        )
+        return CustomerVehicle.objects.get(pk=vehicle.pk)
+
+    def test_model_year_needs_a_valid_check_digit(self):
+        self.assertEqual(
+            vin_prefill("1HGCM82633A004352"),
+            {"brand": "Honda", "manufactured_at": 2003},
+        )
+        # European VIN: position 10 is not necessarily the model year
+        self.assertEqual(vin_prefill("VF1RFB00X56789012"), {"brand": "Renault"})
+
+    def test_prefill_is_only_written_on_insert(self):
+        vehicle = self.upsert("1HGCM82633A004352", manufactured_at=None)
+        self.assertEqual((vehicle.brand, vehicle.manufactured_at), ("Honda", 2003))
+
+        vehicle.manufactured_at = 2004
+        vehicle.save()
+        vehicle = self.upsert("1HGCM82633A004352", manufactured_at=None, model="Accord")
+        self.assertEqual(vehicle.manufactured_at, 2004)
+        self.assertEqual(vehicle.model, "Accord")
+
+
+class SignWorkorderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _, workshop = create_workshop("B00000048")
+        vehicle = CustomerVehicle.objects.create(
+            main_workshop=workshop, license_plate="4800SGN"
+        )
+        cls.workorder = WorkOrder.objects.create(
+            workshop=workshop, customer_vehicle=vehicle
+        )
+
+    def test_workorder_is_signed_once(self):
+        checksum = sign_workorder(self.workorder)
+        self.assertTrue(checksum)
+        signed_at = WorkOrder.objects.get(pk=self.workorder.pk).signed_at
+
+        # Even from a stale instance that did not see the first signature
+        stale = WorkOrder.objects.get(pk=self.workorder.pk)
+        stale.checksum = stale.signed_at = None
+        self.assertIsNone(sign_workorder(stale))
+
+        workorder = WorkOrder.objects.get(pk=self.workorder.pk)
+        self.assertEqual(
+            (workorder.checksum, workorder.signed_at), (checksum, signed_at)
+        )
@@ -1,6 +1,16 @@
-from mechanic_workshop.views import WorkshopEntrancesViewSet
+from mechanic_workshop.views import (
+    WorkshopEntrancesViewSet,
+    EntranceDraftsViewSet,
+    WorkshopSyncViewSet,
+    WorkOrdersViewSet,
+    ClockViewSet,
+)
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
 router.register(r"entrances", WorkshopEntrancesViewSet, basename="entrances")
+router.register(r"entrance-drafts", EntranceDraftsViewSet, basename="entrance-drafts")
+router.register(r"sync", WorkshopSyncViewSet, basename="sync")
+router.register(r"workorders", WorkOrdersViewSet, basename="workorders")
+router.register(r"clock", ClockViewSet, basename="clock")
 urlpatterns = router.urls
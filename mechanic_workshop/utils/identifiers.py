@@ -0,0 +1,34 @@
+import re
+import unicodedata
+
+# Characters typed interchangeably at the counter (O/0, Q/0, I/1)
+CONFUSABLES = str.maketrans({"O": "0", "Q": "0", "I": "1"})
+NON_ALNUM_RE = re.compile(r"[^A-Z0-9]")
+
+
+def _normalize(value: str | None) -> str:
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode()
+    return NON_ALNUM_RE.sub("", value.upper())
+
+
+def canonical_plate(value: str | None) -> str:
+    """
+    Exact key of a license plate: uppercase, no spaces/dashes/accents, so
+    "ab-12 o" and "AB12O" match. "AB120" is another plate.
+    """
+    return _normalize(value)
+
+
+def canonical_vin(value: str | None) -> str:
+    """Exact key of a VIN. Valid VINs never contain I, O or Q, so folding is lossless."""
+    return _normalize(value).translate(CONFUSABLES)
+
+
+def search_key(value: str | None) -> str:
+    """
+    Fuzzy lookup key of a plate or VIN typed at the counter: confusable
+    characters folded, so "AB12O" finds "AB120". Never used as an identity.
+    """
+    return _normalize(value).translate(CONFUSABLES)
@@ -0,0 +1,353 @@
+"""
+Compact codec for damage sketch strokes.
+
+A sketch view is a list of strokes. A stroke is either a bare list of points
+or an object with a "points" key (plus metadata such as color or width), and
+points are flat numbers `[x0, y0, x1, y1, ...]`, pairs `[[x, y], ...]` or
+objects `[{"x": .., "y": ..}, ...]`.
+
+Encoding quantizes coordinates to 1/STROKE_SCALE px, delta-encodes them per
+dimension and packs the deltas as zigzag varints in base64:
+
+    [[[10.5, 20], [11, 20.5], ...]]
+    -> {"codec": "qd1", "scale": 10, "strokes": [{"k": "pairs", "w": 2, "d": "..."}]}
+
+Before encoding, each stroke is simplified with Ramer-Douglas-Peucker so
+the nearly collinear points of finger-drawn strokes are dropped. Encoded
+strokes keep their original point count in "o" when it differs from "n".
+
+Decoding gives back the same structure (coordinates rounded to the scale).
+Values that are not recognised as strokes are stored unchanged. Input that
+is already in the encoded format is rejected: its counts and data could not
+be trusted.
+"""
+
+import base64
+import binascii
+import math
+from typing import Any
+from django.conf import settings
+
+STROKE_CODEC = "qd1"
+# Coordinates are stored with 0.1 px precision
+STROKE_SCALE = 10
+# Max points accepted for all the views of a sketch
+MAX_SKETCH_POINTS = 50_000
+# Max distance (px) a dropped point may be from the simplified stroke
+DEFAULT_SIMPLIFY_TOLERANCE = 0.5
+# Max nesting walked when measuring values that are not strokes
+MAX_UNKNOWN_DEPTH = 8
+
+
+class StrokeFormatError(ValueError):
+    """The value does not look like a list of strokes."""
+
+
+class SketchTooLarge(ValueError):
+    """The sketch exceeds the point budget."""
+
+
+class EncodedStrokesError(ValueError):
+    """Strokes were sent in the storage format instead of as points."""
+
+
+class PointBudget:
+    """
+    Counts points while the strokes are walked and aborts as soon as the
+    limit is exceeded, without serializing the whole sketch first.
+    """
+
+    def __init__(self, limit: int = MAX_SKETCH_POINTS):
+        self.limit = limit
+        self.used = 0
+
+    def consume(self, points: int = 1) -> None:
+        self.used += points
+        if self.used > self.limit:
+            raise SketchTooLarge(f"Sketch exceeds {self.limit} points")
+
+
+# ============================================================================
+# Varints
+# ============================================================================
+def _write_varint(out: bytearray, value: int) -> None:
+    # Zigzag: 0, -1, 1, -2, 2... -> 0, 1, 2, 3, 4...
+    value = value * 2 if value >= 0 else -value * 2 - 1
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes) -> list[int]:
+    values, value, shift = [], 0, 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value >> 1 if not value & 1 else -((value + 1) >> 1))
+        value, shift = 0, 0
+    if shift:
+        raise StrokeFormatError("Truncated stroke data")
+    return values
+
+
+# ============================================================================
+# Points
+# ============================================================================
+def _is_number(value: Any) -> bool:
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+def _read_points(points: Any) -> tuple[str, int, list[tuple[float, ...]]]:
+    """Return (layout, dimensions, points) for any supported point layout."""
+    if not isinstance(points, list):
+        raise StrokeFormatError("Points must be a list")
+    if not points:
+        return "flat", 2, []
+
+    first = points[0]
+    if _is_number(first):
+        if len(points) % 2 or not all(_is_number(v) for v in points):
+            raise StrokeFormatError("Flat points must be x, y numbers")
+        return "flat", 2, list(zip(points[::2], points[1::2]))
+
+    if isinstance(first, list):
+        dims = len(first)
+        if not 2 <= dims <= 4 or not all(
+            isinstance(p, list) and len(p) == dims and all(_is_number(v) for v in p)
+            for p in points
+        ):
+            raise StrokeFormatError("Point lists must share 2 to 4 numbers")
+        return "pairs", dims, [tuple(p) for p in points]
+
+    if isinstance(first, dict):
+        if not all(
+            isinstance(p, dict)
+            and p.keys() == {"x", "y"}
+            and _is_number(p["x"])
+            and _is_number(p["y"])
+            for p in points
+        ):
+            raise StrokeFormatError("Point objects must only have x and y")
+        return "xy", 2, [(p["x"], p["y"]) for p in points]
+
+    raise StrokeFormatError("Unknown point layout")
+
+
+def _write_points(layout: str, points: list[tuple[float, ...]]) -> Any:
+    if layout == "flat":
+        return [v for p in points for v in p]
+    if layout == "xy":
+        return [{"x": p[0], "y": p[1]} for p in points]
+    return [list(p) for p in points]
+
+
+def _dequantize(value: int, scale: int) -> int | float:
+    return value // scale if value % scale == 0 else value / scale
+
+
+def encode_points(
+    points: list[tuple[float, ...]], dims: int, scale: int = STROKE_SCALE
+) -> str:
+    out = bytearray()
+    previous = [0] * dims
+    for point in points:
+        for i, v in enumerate(point):
+            q = round(v * scale)
+            _write_varint(out, q - previous[i])
+            previous[i] = q
+    return base64.b64encode(bytes(out)).decode("ascii")
+
+
+def decode_points(
+    data: str, dims: int, scale: int = STROKE_SCALE
+) -> list[tuple[float, ...]]:
+    try:
+        deltas = _read_varints(base64.b64decode(data, validate=True))
+    except (binascii.Error, TypeError):
+        raise StrokeFormatError("Corrupted stroke data")
+    if len(deltas) % dims:
+        raise StrokeFormatError("Corrupted stroke data")
+
+    points, current = [], [0] * dims
+    for start in range(0, len(deltas), dims):
+        for i in range(dims):
+            current[i] += deltas[start + i]
+        points.append(tuple(_dequantize(v, scale) for v in current))
+    return points
+
+
+# ============================================================================
+# Simplification
+# ============================================================================
+def get_simplify_tolerance() -> float:
+    return getattr(settings, "SKETCH_SIMPLIFY_TOLERANCE", DEFAULT_SIMPLIFY_TOLERANCE)
+
+
+def simplify_points(
+    points: list[tuple[float, ...]], tolerance: float
+) -> list[tuple[float, ...]]:
+    """
+    Ramer-Douglas-Peucker on (x, y). Iterative, so long strokes do not hit
+    the recursion limit. Extra dimensions (e.g. pressure) are kept as they are.
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return points
+
+    tolerance_sq = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[first][0], points[first][1]
+        dx, dy = points[last][0] - ax, points[last][1] - ay
+        length_sq = dx * dx + dy * dy
+
+        farthest, max_dist_sq = 0, tolerance_sq
+        for i in range(first + 1, last):
+            px, py = points[i][0] - ax, points[i][1] - ay
+            if length_sq:
+                # Squared distance from the point to the segment (not its
+                # line): strokes double back, the projection is clamped
+                t = max(0.0, min(1.0, (px * dx + py * dy) / length_sq))
+                px, py = px - t * dx, py - t * dy
+            dist_sq = px * px + py * py
+            if dist_sq > max_dist_sq:
+                farthest, max_dist_sq = i, dist_sq
+
+        if farthest:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+# ============================================================================
+# Strokes
+# ============================================================================
+def is_encoded(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("codec") == STROKE_CODEC
+
+
+def _measure_unknown(value: Any, budget: PointBudget, depth: int = 0) -> None:
+    """Charge unknown values to the budget (one point per pair of leaves)."""
+    if depth > MAX_UNKNOWN_DEPTH:
+        raise StrokeFormatError("Sketch is nested too deeply")
+    if isinstance(value, dict):
+        for v in value.values():
+            _measure_unknown(v, budget, depth + 1)
+    elif isinstance(value, list):
+        budget.consume(sum(not isinstance(v, (dict, list)) for v in value) // 2)
+        for v in value:
+            if isinstance(v, (dict, list)):
+                _measure_unknown(v, budget, depth + 1)
+
+
+def count_points(value: Any) -> tuple[int, int]:
+    """Return (original, stored) point counts of an encoded value."""
+    if not is_encoded(value):
+        return 0, 0
+    strokes = value.get("strokes", [])
+    stored = sum(s.get("n", 0) for s in strokes)
+    return sum(s.get("o", s.get("n", 0)) for s in strokes), stored
+
+
+def encode_strokes(
+    strokes: Any,
+    budget: PointBudget | None = None,
+    scale: int = STROKE_SCALE,
+    tolerance: float | None = None,
+) -> Any:
+    """
+    Simplify and encode a list of strokes. Values that are not strokes are
+    returned unchanged (but still measured), already encoded values raise
+    EncodedStrokesError. The budget is charged with the original point count.
+    """
+    budget = budget or PointBudget()
+    if tolerance is None:
+        tolerance = get_simplify_tolerance()
+
+    if is_encoded(strokes):
+        raise EncodedStrokesError("Strokes must be sent as points")
+
+    charged = budget.used
+    try:
+        if not isinstance(strokes, list):
+            raise StrokeFormatError("Strokes must be a list")
+
+        encoded = []
+        for stroke in strokes:
+            if isinstance(stroke, dict):
+                if "points" not in stroke:
+                    raise StrokeFormatError("Stroke objects need points")
+                meta = {k: v for k, v in stroke.items() if k != "points"}
+                layout, dims, points = _read_points(stroke["points"])
+            else:
+                meta = None
+                layout, dims, points = _read_points(stroke)
+
+            original = len(points)
+            budget.consume(original)
+            points = simplify_points(points, tolerance)
+            item = {
+                "k": layout,
+                "n": len(points),
+                "d": encode_points(points, dims, scale),
+            }
+            if original != len(points):
+                item["o"] = original
+            if layout == "pairs":
+                item["w"] = dims
+            if meta is not None:
+                item["m"] = meta
+            encoded.append(item)
+    except StrokeFormatError:
+        # The strokes parsed before the failure are measured again as unknown
+        budget.used = charged
+        _measure_unknown(strokes, budget)
+        return strokes
+
+    return {"codec": STROKE_CODEC, "scale": scale, "strokes": encoded}
+
+
+def decode_strokes(value: Any) -> Any:
+    """
+    Inverse of `encode_strokes`. Values that are not encoded are returned as
+    is; malformed encoded values raise StrokeFormatError.
+    """
+    if not is_encoded(value):
+        return value
+
+    try:
+        scale = value.get("scale", STROKE_SCALE)
+        strokes = []
+        for item in value.get("strokes", []):
+            dims = item.get("w", 2)
+            points = _write_points(item["k"], decode_points(item["d"], dims, scale))
+            strokes.append({**item["m"], "points": points} if "m" in item else points)
+    except (AttributeError, IndexError, KeyError, TypeError, ZeroDivisionError):
+        raise StrokeFormatError("Corrupted stroke data")
+    return strokes
+
+
+def encode_damage(
+    damage: dict[str, Any], budget: PointBudget | None = None
+) -> dict[str, Any]:
+    """Encode every view of a damage sketch ({view: strokes}) under one budget."""
+    budget = budget or PointBudget()
+    return {view: encode_strokes(strokes, budget) for view, strokes in damage.items()}
+
+
+def decode_damage(damage: Any) -> Any:
+    if not isinstance(damage, dict):
+        return damage
+    return {view: decode_strokes(strokes) for view, strokes in damage.items()}
@@ -0,0 +1,273 @@
+from typing import Any, Iterable
+from uuid import UUID
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.utils.identifiers import (
+    canonical_plate,
+    canonical_vin,
+    search_key,
+)
+from mechanic_workshop.utils.vin import vin_prefill
+
+# Shorter queries only try the exact match (trigrams need 3 characters)
+MIN_FUZZY_LOOKUP_LENGTH = 3
+# Runs of the vehicle upsert statement racing concurrent inserts/deletes
+VEHICLE_UPSERT_ATTEMPTS = 3
+# Canonical keys of CustomerVehicle, the first two unique per workshop
+VEHICLE_KEY_FIELDS = ["plate_key", "plate_search_key", "vin_key"]
+VEHICLE_UNIQUE_KEY_FIELDS = ["plate_key", "vin_key"]
+
+
+def link_authorized_people(vehicle_id: int, member_ids: Iterable[UUID]) -> None:
+    """Attach members to a vehicle with a single INSERT ... ON CONFLICT DO NOTHING."""
+    through = CustomerVehicle.authorized_people.through
+    links = [
+        through(customervehicle_id=vehicle_id, workspacemember_id=member_id)
+        for member_id in set(member_ids)
+    ]
+    if links:
+        through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def upsert_customer_vehicle(
+    *,
+    main_workshop_id: UUID,
+    vin_number: str | None,
+    license_plate: str | None,
+    attributes: dict[str, Any],
+    owner_id: UUID | None = None,
+    authorized_people_ids: Iterable[UUID] = (),
+) -> CustomerVehicle:
+    """
+    Create or update the workshop vehicle matching the plate or the VIN
+    (exact canonical keys, each unique per workshop) and link the authorized
+    people, in two statements: the vehicle upsert (see `_write_vehicle`) and
+    INSERT ... ON CONFLICT DO NOTHING.
+
+    Only the given `attributes` (and the identifiers that were sent) are
+    written on update, so concurrent check-ins of the same car converge on
+    a single row. Attributes left empty are prefilled from the VIN on insert
+    only: a decoded guess never overwrites what the workshop stored.
+    """
+    values = dict(attributes)
+    # Only change the owner if the presenter is the owner of the vehicle
+    if owner_id:
+        values["owner_id"] = owner_id
+
+    update_fields = list(values)
+    for field, value in vin_prefill(vin_number).items():
+        if not values.get(field):
+            values[field] = value
+            if field in update_fields:
+                update_fields.remove(field)
+
+    vehicle = CustomerVehicle(
+        main_workshop_id=main_workshop_id,
+        vin_number=vin_number,
+        license_plate=license_plate,
+        plate_key=canonical_plate(license_plate),
+        plate_search_key=search_key(license_plate),
+        vin_key=canonical_vin(vin_number),
+        **values,
+    )
+    if vehicle.plate_key:
+        update_fields += ["license_plate", "plate_key", "plate_search_key"]
+    if vehicle.vin_key:
+        update_fields += ["vin_number", "vin_key"]
+
+    if vehicle.plate_key or vehicle.vin_key:
+        _write_vehicle(vehicle, [*update_fields, "updated_at"])
+    else:
+        # Nothing identifies the vehicle, it can only be a new one
+        CustomerVehicle.objects.bulk_create([vehicle])
+
+    link_authorized_people(vehicle.pk, authorized_people_ids)
+    return vehicle
+
+
+def _write_vehicle(vehicle: CustomerVehicle, update_fields: list[str]) -> None:
+    """
+    Update the vehicle of the workshop whose plate or VIN key matches (the
+    plate wins if they point to two vehicles), or insert it, in one
+    statement. A VIN-only vehicle that comes back with its plate is thus
+    the same vehicle.
+
+    The match is locked, so concurrent check-ins of that vehicle queue up.
+    When a concurrent check-in inserts the same car between the match and
+    the insert, ON CONFLICT DO NOTHING skips the insert and the statement is
+    run again, now matching the new row. A plate and a VIN that belong to
+    two different vehicles raise IntegrityError: they have to be merged.
+    """
+    meta = CustomerVehicle._meta
+    quote = connection.ops.quote_name
+    table, pk = quote(meta.db_table), quote(meta.pk.column)
+    fields = [
+        field
+        for field in meta.concrete_fields
+        if not field.generated and field is not meta.pk
+    ]
+    values = {
+        field.attname: field.get_db_prep_save(field.pre_save(vehicle, True), connection)
+        for field in fields
+    }
+
+    keys = [
+        (quote(meta.get_field(name).column), getattr(vehicle, name))
+        for name in ("plate_key", "vin_key")
+        if getattr(vehicle, name)
+    ]
+    match = " OR ".join(f"{column} = %s" for column, _ in keys)
+    match_params = [key for _, key in keys]
+    order, order_params = "", []
+    if len(keys) == 2:
+        order, order_params = f"ORDER BY {keys[0][0]} = %s DESC", [keys[0][1]]
+    columns = [meta.get_field(name).column for name in update_fields]
+
+    sql = (
+        f"WITH matched AS ("
+        f"SELECT {pk} FROM {table} "
+        f"WHERE {quote(meta.get_field('main_workshop').column)} = %s AND ({match}) "
+        f"{order} LIMIT 1 FOR UPDATE"
+        f"), updated AS ("
+        f"UPDATE {table} SET "
+        f"{', '.join(f'{quote(column)} = %s' for column in columns)} "
+        f"FROM matched WHERE {table}.{pk} = matched.{pk} RETURNING {table}.{pk}"
+        f"), inserted AS ("
+        f"INSERT INTO {table} ({', '.join(quote(field.column) for field in fields)}) "
+        f"SELECT {', '.join(['%s'] * len(fields))} "
+        f"WHERE NOT EXISTS (SELECT 1 FROM matched) "
+        f"ON CONFLICT DO NOTHING RETURNING {pk}"
+        f") SELECT {pk} FROM updated UNION ALL SELECT {pk} FROM inserted"
+    )
+    params = [
+        values["main_workshop_id"],
+        *match_params,
+        *order_params,
+        *(values[meta.get_field(name).attname] for name in update_fields),
+        *values.values(),
+    ]
+
+    with connection.cursor() as cursor:
+        for _ in range(VEHICLE_UPSERT_ATTEMPTS):
+            cursor.execute(sql, params)
+            if row := cursor.fetchone():
+                vehicle.pk = row[0]
+                vehicle._state.adding = False
+                vehicle._state.db = connection.alias
+                return
+    raise IntegrityError("The vehicle kept changing while it was being saved")
+
+
+def lookup_vehicles(
+    main_workshop_id: UUID, query: str, limit: int = 10
+) -> tuple[str, list[CustomerVehicle]]:
+    """
+    Find workshop vehicles by a typed plate or VIN. Returns the match kind
+    ("exact", "similar" or "none") and the vehicles:
+    1. plate or VIN key, O/0 and I/1 confusions folded (btree per workshop)
+    2. similar plate or partial VIN (pg_trgm GIN), most similar first
+    """
+    key = search_key(query)
+    vehicles = CustomerVehicle.objects.filter(main_workshop_id=main_workshop_id)
+    if not key:
+        return "none", []
+
+    exact = list(vehicles.filter(Q(plate_search_key=key) | Q(vin_key=key))[:limit])
+    if exact:
+        return "exact", exact
+    if len(key) < MIN_FUZZY_LOOKUP_LENGTH:
+        return "none", []
+
+    similar = list(
+        vehicles.filter(
+            Q(plate_search_key__trigram_similar=key) | Q(vin_key__contains=key)
+        )
+        .annotate(
+            similarity=Greatest(
+                TrigramSimilarity("plate_search_key", key),
+                TrigramSimilarity("vin_key", key),
+            )
+        )
+        .order_by("-similarity", "-updated_at")[:limit]
+    )
+    return ("similar" if similar else "none"), similar
+
+
+def vehicles_missing_keys(using: str = "default") -> bool:
+    """True if some vehicle with a plate or VIN has no key to be found by."""
+    return (
+        CustomerVehicle.objects.using(using)
+        .filter(
+            Q(plate_search_key="", license_plate__gt="")
+            | Q(plate_search_key="", vin_key="", vin_number__gt="")
+        )
+        .exists()
+    )
+
+
+def backfill_vehicle_keys(
+    using: str = "default", batch_size: int = 2000
+) -> tuple[int, set[int]]:
+    """
+    Recompute the plate/VIN keys of every vehicle. Returns the number of
+    vehicles updated and the ids of the duplicates.
+
+    The most recently updated vehicle keeps a plate/VIN shared with others.
+    Duplicates keep their license_plate/vin_number text and plate_search_key,
+    so lookup_vehicles still lists them, but are left without the unique key:
+    upserts only ever match the vehicle that kept it. Nothing merges them,
+    their workorders stay where they are until someone merges them by hand.
+    """
+    vehicles = (
+        CustomerVehicle.objects.using(using)
+        .only("main_workshop_id", "license_plate", "vin_number", *VEHICLE_KEY_FIELDS)
+        .order_by("-updated_at", "-pk")
+        .iterator(chunk_size=batch_size)
+    )
+
+    taken, changed, duplicates = set(), [], set()
+    for vehicle in vehicles:
+        keys = {
+            "plate_key": canonical_plate(vehicle.license_plate),
+            "plate_search_key": search_key(vehicle.license_plate),
+            "vin_key": canonical_vin(vehicle.vin_number),
+        }
+        for field in VEHICLE_UNIQUE_KEY_FIELDS:
+            if not keys[field]:
+                continue
+            if (vehicle.main_workshop_id, field, keys[field]) in taken:
+                duplicates.add(vehicle.pk)
+                keys[field] = ""
+            else:
+                taken.add((vehicle.main_workshop_id, field, keys[field]))
+
+        if all(getattr(vehicle, field) == keys[field] for field in VEHICLE_KEY_FIELDS):
+            continue
+        changed.append((vehicle, keys))
+
+    vehicles = CustomerVehicle.objects.using(using)
+    with transaction.atomic(using=using):
+        # Release the keys that change first: a key can move from a vehicle
+        # to another one updated in a later batch
+        for vehicle, keys in changed:
+            for field in VEHICLE_UNIQUE_KEY_FIELDS:
+                if getattr(vehicle, field) != keys[field]:
+                    setattr(vehicle, field, "")
+        vehicles.bulk_update(
+            [vehicle for vehicle, _ in changed],
+            VEHICLE_UNIQUE_KEY_FIELDS,
+            batch_size=batch_size,
+        )
+
+        for vehicle, keys in changed:
+            for field, value in keys.items():
+                setattr(vehicle, field, value)
+        updated = vehicles.bulk_update(
+            [vehicle for vehicle, _ in changed],
+            VEHICLE_KEY_FIELDS,
+            batch_size=batch_size,
+        )
+    return updated, duplicates
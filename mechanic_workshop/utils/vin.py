@@ -0,0 +1,132 @@
+"""
+Offline VIN decoding (ISO 3779): manufacturer from the WMI table shipped in
+vin_wmi.json, model year from position 10 and check digit (position 9).
+The table is loaded once per process, decodes are memoized.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from django.utils import timezone
+from mechanic_workshop.utils.identifiers import canonical_vin
+
+VIN_LENGTH = 17
+WMI_TABLE_PATH = os.path.join(os.path.dirname(__file__), "vin_wmi.json")
+
+# Model year codes; the cycle repeats every 30 years (A = 1980 / 2010)
+MODEL_YEAR_CODES = "ABCDEFGHJKLMNPRSTVWXY123456789"
+MODEL_YEAR_BASE = 1980
+
+TRANSLITERATION = {
+    **{str(d): d for d in range(10)},
+    **dict(zip("ABCDEFGH", range(1, 9))),
+    **dict(zip("JKLMN", range(1, 6))),
+    "P": 7,
+    "R": 9,
+    **dict(zip("STUVWXYZ", range(2, 10))),
+}
+CHECK_DIGIT_WEIGHTS = (8, 7, 6, 5, 4, 3, 2, 10, 0, 9, 8, 7, 6, 5, 4, 3, 2)
+
+REGIONS = (
+    ("ABCDEFGH", "Africa"),
+    ("JKLMNPR", "Asia"),
+    ("STUVWXYZ", "Europe"),
+    ("12345", "North America"),
+    ("67", "Oceania"),
+    ("89", "South America"),
+)
+
+
+@dataclass(frozen=True)
+class VinInfo:
+    vin: str
+    is_valid: bool
+    wmi: str | None = None
+    manufacturer: str | None = None
+    country: str | None = None
+    region: str | None = None
+    model_year: int | None = None
+    check_digit_valid: bool | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@lru_cache(maxsize=1)
+def _wmi_table() -> dict[str, list[str]]:
+    with open(WMI_TABLE_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _region(vin: str) -> str | None:
+    return next((name for chars, name in REGIONS if vin[0] in chars), None)
+
+
+def compute_check_digit(vin: str) -> str:
+    total = sum(
+        TRANSLITERATION[char] * weight for char, weight in zip(vin, CHECK_DIGIT_WEIGHTS)
+    )
+    remainder = total % 11
+    return "X" if remainder == 10 else str(remainder)
+
+
+def _model_year(vin: str, current_year: int, north_american: bool) -> int | None:
+    index = MODEL_YEAR_CODES.find(vin[9])
+    if index < 0:
+        return None
+    older, newer = MODEL_YEAR_BASE + index, MODEL_YEAR_BASE + 30 + index
+    if newer > current_year + 1:
+        return older
+    # North American VINs tell the cycle apart: a letter in position 7
+    # means 2010 onwards. Elsewhere the most recent plausible year wins.
+    if north_american:
+        return newer if vin[6].isalpha() else older
+    return newer
+
+
+@lru_cache(maxsize=8192)
+def _decode(vin: str, current_year: int) -> VinInfo:
+    if len(vin) != VIN_LENGTH or any(char not in TRANSLITERATION for char in vin):
+        return VinInfo(vin=vin, is_valid=False)
+
+    wmi = vin[:3]
+    manufacturer, country = _wmi_table().get(wmi) or (None, None)
+    check_digit_valid = compute_check_digit(vin) == vin[8]
+    # Vehicles built for North America carry a valid check digit wherever made
+    north_american = vin[0] in "12345" or check_digit_valid
+    return VinInfo(
+        vin=vin,
+        is_valid=True,
+        wmi=wmi,
+        manufacturer=manufacturer,
+        country=country,
+        region=_region(vin),
+        model_year=_model_year(vin, current_year, north_american),
+        check_digit_valid=check_digit_valid,
+    )
+
+
+def decode_vin(value: str | None) -> VinInfo:
+    """
+    Decode a VIN without external calls. The check digit is only mandatory
+    for North American vehicles, so `check_digit_valid=False` is a hint, not
+    an error, for the rest.
+    """
+    return _decode(canonical_vin(value), timezone.now().year)
+
+
+def vin_prefill(value: str | None) -> dict:
+    """
+    CustomerVehicle fields that can be filled from the VIN. The manufacturer
+    comes from the WMI, which is assigned worldwide. The model year is only
+    trusted when the North American check digit is valid: other makers do
+    not have to encode it in position 10 (VF1RFB00X56789012 is not a 2005).
+    """
+    info = decode_vin(value)
+    prefill = {}
+    if info.manufacturer:
+        prefill["brand"] = info.manufacturer
+    if info.model_year and info.check_digit_valid:
+        prefill["manufactured_at"] = info.model_year
+    return prefill
@@ -1,3 +1,6 @@
+import uuid
+from django.db.models import Prefetch
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
@@ -8,177 +11,871 @@ from django.utils.decorators import method_decorator
 from django_ratelimit.decorators import ratelimit
 from users.models import UserToken
 from rest_framework.permissions import IsAuthenticated
-from users.utils.accounts import create_customer_account
-from customers.serializers import WorkshopCustomerCreateSerializer
-from customers.customer_mapper import map_front_to_customer
-from django.shortcuts import get_object_or_404
-from workspace_modules.models.base import Workspace
-from workspace_modules.utils.memberships import is_workspace_member
-from users.mappers import map_workshop_customer_to_account
 from mechanic_workshop.models.vehicles import CustomerVehicle
+from mechanic_workshop.models.workorders import WorkOrder, WorkOrderDocument
+from mechanic_workshop.serializers.workorders import (
+    WorkOrderDamageSketchSerializer,
+    WorkOrderDocumentSerializer,
+)
 from mechanic_workshop.serializers.vehicles import (
+    CustomerVehicleSummarySerializer,
     CustomerVehicleWorkshopListSerializer,
-    CustomerVehicleCreateSerializer,
 )
-from mechanic_workshop.serializers.workorders import WorkorderCreateSerializer
+from mechanic_workshop.utils.identifiers import search_key
+from mechanic_workshop.utils.vehicles import lookup_vehicles
+from mechanic_workshop.utils.vin import decode_vin
 from users.models import WorkspaceMember
-from mechanic_workshop.models.base import MechanicWorkshop
-from mechanic_workshop.mappers.workorder import map_frontend_to_workorder
-import json
+from mechanic_workshop.services.intake import (
+    MAX_BULK_ENTRANCES,
+    EntranceIntakeService,
+    IntakeError,
+)
+from core.utils.idempotency import idempotent
+from core.parsers import MergePatchJSONParser
+from rest_framework.parsers import JSONParser
+from mechanic_workshop.services.drafts import DraftError, EntranceDraftStore
+from core.utils.exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    streaming_export_response,
+)
+from workspace_modules.utils.memberships import (
+    WORKSPACE_MANAGER_ROLES,
+    WORKSPACE_TEAM_ROLES,
+    get_workspace_membership,
+)
+from mechanic_workshop.services.board import (
+    BOARD_DEFAULT_CARDS,
+    BOARD_MAX_CARDS,
+    get_workorder_board,
+)
+from mechanic_workshop.services.clock import (
+    ClockError,
+    clock_in,
+    clock_out,
+    open_segment,
+)
+from mechanic_workshop.services.documents import request_document
+from mechanic_workshop.services.live import get_live_dashboard
+from mechanic_workshop.services.snapshots import sign_workorder, verify_workorder
+from mechanic_workshop.services.transitions import (
+    TransitionError,
+    apply_bulk_transitions,
+)
+from mechanic_workshop.services.sync import (
+    SYNC_DEFAULT_LIMIT,
+    SYNC_MAX_LIMIT,
+    SyncTokenError,
+    WorkspaceSync,
+)
+
+VEHICLE_LOOKUP_LIMIT = 10
+VEHICLE_LOOKUP_MAX_LIMIT = 25
+# Documents listed per workorder (newest first)
+DOCUMENTS_LIST_LIMIT = 20
+# Damage sketches listed per workorder (newest first)
+SKETCHES_LIST_LIMIT = 20
+
+VEHICLE_EXPORT_FIELDS = [
+    "id",
+    "created_at",
+    "updated_at",
+    "brand",
+    "model",
+    "license_plate",
+    "vin_number",
+    "color",
+    "manufactured_at",
+    "fuel_type",
+    "motor_number",
+    "motor_brand",
+    "motor_type",
+    "cylinders",
+    "cylinder_size",
+    "engine_power",
+    "owner__uuid",
+    "owner__name",
+    "owner__surname",
+    "owner__email",
+    "owner__phone",
+]
+
+
+class WorkshopVehiclesPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-created_at"
 
 
 class WorkshopEntrancesViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
+    @idempotent(scope="entrances")
     def create(self, request):
-        caller = request.user
-        ws_id = request.query_params.get("wsId")
-        print("wsId: ", ws_id)
+        try:
+            intake = EntranceIntakeService.for_caller(
+                account=request.user, workspace_id=request.query_params.get("wsId")
+            )
+            result = intake.run(request.data)
+        except IntakeError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+
+        return Response(
+            {"detail": "OK", **result.as_response_data()},
+            status=status.HTTP_201_CREATED,
+        )
 
-        if not ws_id:
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @idempotent(scope="entrances-bulk-request")
+    def bulk_create(self, request):
+        """
+        Register a burst of queued (offline) check-ins in a single request.
+        Body: {"entrances": [<entrance payload>, ...]} where every payload may
+        add a `client_ref` and an `idempotency_key`. Returns one result per item.
+        """
+        entrances = (
+            request.data.get("entrances") if isinstance(request.data, dict) else None
+        )
+        if not isinstance(entrances, list) or not entrances:
             return Response(
-                {"error": "Missing wsId query parameter"},
+                {"error": "Missing entrances list"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-
-        print("Creating entrance: ", request.data)
-        if not (customer := request.data.get("customer")):
+        if len(entrances) > MAX_BULK_ENTRANCES:
             return Response(
-                {"error": "Missing customer data"},
+                {"error": f"At most {MAX_BULK_ENTRANCES} entrances per request"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if not (vehicle_data := request.data.get("vehicle", None)):
+        try:
+            intake = EntranceIntakeService.for_caller(
+                account=request.user, workspace_id=request.query_params.get("wsId")
+            )
+        except IntakeError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+
+        results = intake.run_batch(entrances)
+        created = sum(1 for r in results if status.is_success(r["status"]))
+        return Response(
+            {
+                "detail": "OK",
+                "created": created,
+                "failed": len(results) - created,
+                "results": results,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"], url_path="workshop-vehicles")
+    def get_workshop_vehicles(self, request):
+        """
+        Cursor-paginated vehicles of the workshop, optionally filtered by
+        `plate` (prefix, O/0 and I/1 folded), `brand` and `owner` (member uuid). Always 3 queries:
+        membership, page (owner joined) and authorized people.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_MANAGER_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not allowed to see this workspace vehicles"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        vehicles = CustomerVehicle.objects.filter(
+            main_workshop_id=membership.workspace.main_business_id
+        )
+        if plate := search_key(request.query_params.get("plate")):
+            vehicles = vehicles.filter(plate_search_key__startswith=plate)
+        if brand := request.query_params.get("brand", "").strip():
+            vehicles = vehicles.filter(brand__iexact=brand)
+        if owner := request.query_params.get("owner", "").strip():
+            try:
+                vehicles = vehicles.filter(owner_id=uuid.UUID(owner))
+            except ValueError:
+                return Response(
+                    {"error": "Invalid owner"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        vehicles = vehicles.select_related("owner").prefetch_related(
+            Prefetch(
+                "authorized_people",
+                queryset=WorkspaceMember.objects.order_by("name"),
+                to_attr="authorized_people_cached",
+            )
+        )
+        paginator = WorkshopVehiclesPagination()
+        page = paginator.paginate_queryset(vehicles, request, view=self)
+        serializer = CustomerVehicleWorkshopListSerializer(page, many=True)
+        return Response(
+            {
+                "detail": "OK",
+                "vehicles": serializer.data,
+                "next": paginator.get_next_link(),
+                "previous": paginator.get_previous_link(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"], url_path="vin-decode")
+    def vin_decode(self, request):
+        """Decode a VIN offline (manufacturer, model year, check digit)."""
+        vin = request.query_params.get("vin", "")
+        if not vin.strip():
+            return Response(
+                {"error": "Missing vin"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {"detail": "OK", "vin": decode_vin(vin).as_dict()},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"], url_path="workshop-vehicles/lookup")
+    def lookup_workshop_vehicles(self, request):
+        """
+        Find vehicles by a plate or VIN typed at the counter (`q`), tolerant
+        to spaces, dashes and O/0, I/1 confusions.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not allowed to see this workspace vehicles"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            limit = int(request.query_params.get("limit", VEHICLE_LOOKUP_LIMIT))
+        except ValueError:
+            limit = VEHICLE_LOOKUP_LIMIT
+        limit = min(max(limit, 1), VEHICLE_LOOKUP_MAX_LIMIT)
+
+        match, vehicles = lookup_vehicles(
+            membership.workspace.main_business_id,
+            request.query_params.get("q", ""),
+            limit=limit,
+        )
+        return Response(
+            {
+                "detail": "OK",
+                "match": match,
+                "vehicles": CustomerVehicleSummarySerializer(vehicles, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get"], url_path="workshop-vehicles/export")
+    def export_workshop_vehicles(self, request):
+        """
+        Stream every vehicle of the workshop as CSV or NDJSON through a
+        server-side cursor, so memory stays flat regardless of the row count.
+        """
+        export_format = (request.query_params.get("fmt") or "csv").lower()
+        if export_format not in EXPORT_FORMATS:
             return Response(
-                {"error": "Missing vehicle data"},
+                {"error": f"Unsupported export format: {export_format}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if not (workorder_data := request.data.get("workorder", None)):
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_MANAGER_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
             return Response(
-                {"error": "Missing workorder data"},
+                {"error": "You are not allowed to export this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        rows = (
+            CustomerVehicle.objects.filter(
+                main_workshop_id=membership.workspace.main_business_id
+            )
+            .order_by("created_at", "pk")
+            .values(*VEHICLE_EXPORT_FIELDS)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return streaming_export_response(
+            request,
+            rows=rows,
+            fields=VEHICLE_EXPORT_FIELDS,
+            export_format=export_format,
+            filename=f"vehicles-{membership.workspace_id}",
+        )
+
+
+class EntranceDraftsViewSet(viewsets.ViewSet):
+    """
+    Server-side check-in drafts, scoped to the caller membership (?wsId=).
+    The form autosaves with small JSON Merge Patch deltas (PATCH) and the
+    draft is committed into the intake pipeline server-side.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MergePatchJSONParser]
+
+    def _get_membership(self, request) -> WorkspaceMember | None:
+        return get_workspace_membership(
+            account=request.user, workspace_id=request.query_params.get("wsId")
+        )
+
+    @staticmethod
+    def _forbidden() -> Response:
+        return Response(
+            {"error": "You are not a member of this workspace"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    def list(self, request):
+        if not (membership := self._get_membership(request)):
+            return self._forbidden()
+        drafts = EntranceDraftStore(membership).list()
+        return Response({"drafts": drafts}, status=status.HTTP_200_OK)
+
+    def create(self, request):
+        if not (membership := self._get_membership(request)):
+            return self._forbidden()
+        try:
+            draft = EntranceDraftStore(membership).create(request.data)
+        except DraftError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+        return Response(draft, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        if not (membership := self._get_membership(request)):
+            return self._forbidden()
+        try:
+            draft = EntranceDraftStore(membership).get(pk)
+        except DraftError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+        return Response(draft, status=status.HTTP_200_OK)
+
+    def partial_update(self, request, pk=None):
+        """Apply a JSON Merge Patch delta. `If-Match: <version>` guards lost updates."""
+        if not (membership := self._get_membership(request)):
+            return self._forbidden()
+
+        expected_version = None
+        if if_match := request.headers.get("If-Match"):
+            try:
+                expected_version = int(if_match.removeprefix("W/").strip('"'))
+            except ValueError:
+                return Response(
+                    {"error": "If-Match must be the draft version"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            draft = EntranceDraftStore(membership).patch(
+                pk, request.data, expected_version=expected_version
+            )
+        except DraftError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+
+        # Keep autosave responses tiny: the client already has the data
+        return Response(
+            {
+                "id": draft["id"],
+                "version": draft["version"],
+                "updated_at": draft["updated_at"],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def destroy(self, request, pk=None):
+        if not (membership := self._get_membership(request)):
+            return self._forbidden()
+        try:
+            EntranceDraftStore(membership).delete(pk)
+        except DraftError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["post"], url_path="commit")
+    @idempotent(scope="entrance-drafts-commit")
+    def commit(self, request, pk=None):
+        """Register the entrance stored in the draft, then discard the draft."""
+        if not (membership := self._get_membership(request)):
+            return self._forbidden()
+
+        store = EntranceDraftStore(membership)
+        try:
+            with store.lock(pk, blocking_timeout=5) as acquired:
+                if not acquired:
+                    raise DraftError(
+                        "The draft is being modified", status.HTTP_409_CONFLICT
+                    )
+                draft = store.get(pk)
+                result = EntranceIntakeService(caller_member=membership).run(
+                    draft["data"]
+                )
+                try:
+                    store.delete(pk)
+                except DraftError:
+                    # The entrance is registered and the draft removed, only
+                    # the index is stale (list_ids() skips the missing draft)
+                    pass
+        except (DraftError, IntakeError) as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+
+        return Response(
+            {"detail": "OK", **result.as_response_data()},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class WorkshopSyncViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=["get"], url_path="changes")
+    def changes(self, request):
+        """
+        Rows changed since the `since` watermark (omit it for a full sync),
+        plus tombstones for deleted rows. Keep calling with `next` while
+        `has_more` is true; `reset` means the client must drop its local copy.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+        if membership is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            limit = int(request.query_params.get("limit", SYNC_DEFAULT_LIMIT))
+        except ValueError:
+            limit = SYNC_DEFAULT_LIMIT
+        limit = max(1, min(limit, SYNC_MAX_LIMIT))
+
+        try:
+            data = WorkspaceSync(membership.workspace).changes(
+                since=request.query_params.get("since") or None, limit=limit
+            )
+        except SyncTokenError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class WorkOrdersViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=["get"], url_path="board")
+    def board(self, request):
+        """
+        Kanban board: one column per stage with counts by status/priority and
+        the newest `cards` workorders, optionally filtered by `status`
+        (comma separated). A single query whatever the board size.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            cards = int(request.query_params.get("cards", BOARD_DEFAULT_CARDS))
+        except ValueError:
+            cards = BOARD_DEFAULT_CARDS
+        cards = max(1, min(cards, BOARD_MAX_CARDS))
+
+        statuses = [
+            value.strip().upper()
+            for value in request.query_params.get("status", "").split(",")
+            if value.strip()
+        ]
+        if invalid := set(statuses) - set(WorkOrder.Status.values):
+            return Response(
+                {"error": f"Unknown status: {', '.join(sorted(invalid))}"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # ========================================================================
-        # 1) Create the customer account or connect to the existing one
-        # ========================================================================
-        customer_data = map_front_to_customer(customer)
-        is_vehicle_owner = customer_data.get("is_vehicle_owner", False)
-        print("customer_data: ", customer_data)
-        # Obtain the workspace from the query parameter
-        workspace = get_object_or_404(Workspace, pk=ws_id)
-        caller_ws_member, caller_is_member = is_workspace_member(
-            account=caller, workspace=workspace
+        columns = get_workorder_board(
+            membership.workspace.main_business_id, cards=cards, statuses=statuses
+        )
+        return Response({"detail": "OK", "columns": columns}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="live")
+    def live(self, request):
+        """
+        Live dashboard: technicians currently clocked in and the open
+        workorders they work on, in one query (cached a few seconds).
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        dashboard = get_live_dashboard(membership.workspace.main_business_id)
+        return Response({"detail": "OK", **dashboard}, status=status.HTTP_200_OK)
+
+    def _workshop_workorder(self, request, pk):
+        """(membership, workorder of its workshop) or (membership, None)."""
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return None, None
+        try:
+            workorder = WorkOrder.objects.filter(
+                pk=int(pk), workshop_id=membership.workspace.main_business_id
+            ).first()
+        except ValueError:
+            workorder = None
+        return membership, workorder
+
+    @action(detail=True, methods=["post"], url_path="sign")
+    def sign(self, request, pk=None):
+        """
+        Record the customer signature: hash the workorder snapshot (vehicle,
+        presenter, damage, sketches, lights, legal flags) and store it.
+        A workorder is signed once.
+        """
+        membership, workorder = self._workshop_workorder(request, pk)
+        if membership is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if workorder is None:
+            return Response(
+                {"error": "Workorder not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        checksum = None
+        if not (workorder.checksum or workorder.signed_at):
+            checksum = sign_workorder(workorder)
+        if checksum is None:
+            return Response(
+                {"error": "The workorder has already been signed"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            {"detail": "OK", "checksum": checksum, "signed_at": workorder.signed_at},
+            status=status.HTTP_200_OK,
         )
-        if not caller_is_member:
+
+    @action(detail=True, methods=["get"], url_path="verify")
+    def verify(self, request, pk=None):
+        """
+        Check the workorder still matches what the customer signed, and which
+        snapshot sections changed since.
+        """
+        membership, workorder = self._workshop_workorder(request, pk)
+        if membership is None:
             return Response(
                 {"error": "You are not a member of this workspace"},
                 status=status.HTTP_403_FORBIDDEN,
             )
+        if workorder is None:
+            return Response(
+                {"error": "Workorder not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if not workorder.checksum:
+            return Response(
+                {"error": "The workorder has not been signed"},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-        mechanic_workshop = workspace.main_business
-        print("\n mechanic_workshop: ", mechanic_workshop)
-        customer_serializer = WorkshopCustomerCreateSerializer(
-            data=customer_data,
-            context={
-                "caller": caller,
-                "mechanic_workshop": mechanic_workshop,
-                "workspace": workspace,
+        verification = verify_workorder(workorder)
+        return Response(
+            {
+                "detail": "OK",
+                "valid": verification.valid,
+                "checksum": verification.checksum,
+                "signed_checksum": workorder.checksum,
+                "signed_at": workorder.signed_at,
+                "changed": verification.changed,
             },
+            status=status.HTTP_200_OK,
         )
-        if not customer_serializer.is_valid():
-            print("Invalid customer: ", customer_serializer.errors)
+
+    @action(detail=True, methods=["get", "post"], url_path="documents")
+    def documents(self, request, pk=None):
+        """
+        PDFs of a workorder. POST `{"kind"}` requests one: it is returned
+        right away if the workorder did not change since it was rendered,
+        otherwise it is rendered in the background (202) and clients poll
+        this endpoint (GET) or the delta sync until it is READY.
+        """
+        membership, workorder = self._workshop_workorder(request, pk)
+        if membership is None:
             return Response(
-                {"error": customer_serializer.errors},
-                status=status.HTTP_400_BAD_REQUEST,
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
             )
-        customer_model = customer_serializer.save()
-        # We also create a basic account for the user, so we can handle some basic information about it
-        account, account_created = map_workshop_customer_to_account(customer_model)
-        print("Created customer: ", customer_model)
-        print("Created account: ", account, "TRUE" if account_created else "FALSE")
-
-        # ========================================================================
-        # 2) Create the Vehicle information
-        # ========================================================================
-        vehicle_data["owner"] = customer_model.uuid if is_vehicle_owner else None
-        vehicle_data["authorized_people"] = [customer_model.uuid]
-        vehicle_data["main_workshop"] = mechanic_workshop.uuid
-        vehicle_serializer = CustomerVehicleCreateSerializer(data=vehicle_data)
-        print("main workshop", mechanic_workshop, type(mechanic_workshop))
-        if not vehicle_serializer.is_valid():
-            print("Invalid vehicle: ", vehicle_serializer.errors)
-            return Response(
-                {"error": vehicle_serializer.errors},
-                status=status.HTTP_400_BAD_REQUEST,
+        if workorder is None:
+            return Response(
+                {"error": "Workorder not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        vehicle_model = vehicle_serializer.save()
-        # ========================================================================
-        # 3) Create the new Workorder
-        # ========================================================================
-        # Prepare the damage data
-        damage = workorder_data.get("damage", {})
-        length = 0
-        for v in damage.values():
-            d = json.dumps(v)
-            length += len(d)
+        if request.method == "GET":
+            documents = workorder.documents.all()[:DOCUMENTS_LIST_LIMIT]
+            return Response(
+                {
+                    "detail": "OK",
+                    "documents": WorkOrderDocumentSerializer(documents, many=True).data,
+                },
+                status=status.HTTP_200_OK,
+            )
 
-        if length > 15000:
+        kind = request.data.get("kind") if isinstance(request.data, dict) else None
+        if kind not in WorkOrderDocument.Kind.values:
             return Response(
-                {"error": "The damage sketches are too large."},
+                {
+                    "error": "kind must be one of "
+                    + ", ".join(WorkOrderDocument.Kind.values)
+                },
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        mapped_damage = map_frontend_to_workorder(front=workorder_data)
-        mapped_damage["customer_vehicle"] = vehicle_model.pk
-        mapped_damage["workshop"] = mechanic_workshop.uuid
-        mapped_damage["attended_by"] = caller_ws_member.uuid
-        mapped_damage["vehicle_presenter"] = customer_model.uuid
-        mapped_damage["customer_telephone"] = customer_model.phone
+        document = request_document(workorder, kind, requested_by=membership)
+        ready = document.status == WorkOrderDocument.Status.READY
+        return Response(
+            {"detail": "OK", "document": WorkOrderDocumentSerializer(document).data},
+            status=status.HTTP_200_OK if ready else status.HTTP_202_ACCEPTED,
+        )
 
-        damage_serializer = WorkorderCreateSerializer(data=mapped_damage)
-        if not damage_serializer.is_valid():
+    @action(detail=True, methods=["get", "post"], url_path="damage-sketches")
+    def damage_sketches(self, request, pk=None):
+        """
+        Damage sketches of a workorder. POST stores a new one: strokes are
+        simplified and encoded on ingest, and the received and stored point
+        counts are recorded with it.
+        """
+        membership, workorder = self._workshop_workorder(request, pk)
+        if membership is None:
             return Response(
-                {"error": damage_serializer.errors},
-                status=status.HTTP_400_BAD_REQUEST,
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if workorder is None:
+            return Response(
+                {"error": "Workorder not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        damage_model = damage_serializer.save()
-        print("Damage model: ", damage_model)
-        print("\n DAMAGE LENGTH: ", length)
+        if request.method == "GET":
+            sketches = workorder.damage_sketches.all()[:SKETCHES_LIST_LIMIT]
+            return Response(
+                {
+                    "detail": "OK",
+                    "sketches": WorkOrderDamageSketchSerializer(
+                        sketches, many=True
+                    ).data,
+                },
+                status=status.HTTP_200_OK,
+            )
 
+        serializer = WorkOrderDamageSketchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+        sketch = serializer.save(work_order=workorder)
         return Response(
-            {"detail": "OK"},
+            {"detail": "OK", "sketch": WorkOrderDamageSketchSerializer(sketch).data},
             status=status.HTTP_201_CREATED,
         )
 
-    @action(detail=False, methods=["get"], url_path="workshop-vehicles")
-    def get_workshop_vehicles(self, request):
-        account = request.user
-        workshop_id = request.query_params.get("wsId")
-        print("account: ", account)
-        print("workshop_id: ", workshop_id)
-
-        workshop = MechanicWorkshop.objects.filter(
-            workspace__members__account=account,
-            workspace__members__is_active=True,
-            workspace__members__role__in=[
-                WorkspaceMember.WorkspaceRole.OWNER,
-                WorkspaceMember.WorkspaceRole.ADMIN,
-                # TODO: Add more roles here
-            ],
-            workspace__wid=workshop_id,
-        ).first()
-        print("workshop: ", workshop)
-
-        vehicles = CustomerVehicleWorkshopListSerializer(
-            workshop.customer_vehicles.all(), many=True
-        )
-        print("vehicles: ", vehicles)
-        return Response(
-            {"detail": "OK", "vehicles": vehicles.data},
+    @action(
+        detail=True,
+        methods=["patch"],
+        url_path=r"damage-sketches/(?P<sketch_id>\d+)",
+    )
+    def damage_sketch(self, request, pk=None, sketch_id=None):
+        """Update some views of a damage sketch; the others are kept."""
+        membership, workorder = self._workshop_workorder(request, pk)
+        if membership is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        sketch = (
+            workorder.damage_sketches.filter(pk=sketch_id).first()
+            if workorder is not None
+            else None
+        )
+        if sketch is None:
+            return Response(
+                {"error": "Damage sketch not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        serializer = WorkOrderDamageSketchSerializer(
+            sketch, data=request.data, partial=True
+        )
+        if not serializer.is_valid():
+            return Response(
+                {"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST
+            )
+        sketch = serializer.save()
+        return Response(
+            {"detail": "OK", "sketch": WorkOrderDamageSketchSerializer(sketch).data},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["post"], url_path="transitions")
+    @idempotent(scope="workorder-transitions")
+    def bulk_transitions(self, request):
+        """
+        Move many cards at once: `{"transitions": [{"id", "stage"?, "status"?}]}`.
+        Transitions are validated against the current state and applied all
+        or nothing, with a constant number of queries.
+        """
+        membership = get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            transitions = apply_bulk_transitions(
+                membership.workspace.main_business_id,
+                (
+                    request.data.get("transitions")
+                    if isinstance(request.data, dict)
+                    else None
+                ),
+                changed_by_id=membership.pk,
+            )
+        except TransitionError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+
+        return Response(
+            {
+                "detail": "OK",
+                "moved": [
+                    {"id": t.workorder_id, "stage": t.to_stage, "status": t.to_status}
+                    for t in transitions
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class ClockViewSet(viewsets.ViewSet):
+    """Shop floor clock-in/out of the requesting technician."""
+
+    permission_classes = [IsAuthenticated]
+
+    def _membership(self, request):
+        return get_workspace_membership(
+            account=request.user,
+            workspace_id=request.query_params.get("wsId"),
+            roles=WORKSPACE_TEAM_ROLES,
+        )
+
+    @staticmethod
+    def _segment(segment):
+        if segment is None:
+            return None
+        return {
+            "id": segment.pk,
+            "workorder": segment.work_order_id,
+            "started_at": segment.started_at,
+            "ended_at": segment.ended_at,
+        }
+
+    def list(self, request):
+        """The segment the technician is currently clocked in, if any."""
+        membership = self._membership(request)
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        current = open_segment(membership, lock=False)
+        return Response(
+            {"detail": "OK", "current": self._segment(current)},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["post"], url_path="in")
+    def clock_in(self, request):
+        """
+        Start working on `{"workorder": id}`. Closes the segment the technician
+        was clocked in, if any, in the same transaction.
+        """
+        membership = self._membership(request)
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        data = request.data if isinstance(request.data, dict) else {}
+        if not isinstance(data.get("workorder"), int):
+            return Response(
+                {"error": "Missing workorder id"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            opened, closed = clock_in(
+                membership,
+                membership.workspace.main_business_id,
+                data["workorder"],
+                notes=data.get("notes") or "",
+            )
+        except ClockError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+        return Response(
+            {
+                "detail": "OK",
+                "current": self._segment(opened),
+                "closed": self._segment(closed),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["post"], url_path="out")
+    def clock_out(self, request):
+        """Stop working, optionally recording `{"work_done": str}`."""
+        membership = self._membership(request)
+        if membership is None or membership.workspace.main_business_id is None:
+            return Response(
+                {"error": "You are not a member of this workspace"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        data = request.data if isinstance(request.data, dict) else {}
+
+        try:
+            closed = clock_out(
+                membership,
+                membership.workspace.main_business_id,
+                work_done=data.get("work_done") or "",
+            )
+        except ClockError as exc:
+            return Response({"error": exc.errors}, status=exc.status_code)
+        return Response(
+            {"detail": "OK", "closed": self._segment(closed)},
             status=status.HTTP_200_OK,
         )
@@ -0,0 +1,358 @@
+"""
+pdf-renderer: HTTP service turning HMAC-signed render jobs into PDFs.
+
+    POST /render   {"html": str} or {"template": str, "data": {...}}
+                   headers X-Timestamp (unix seconds) and
+                   X-Signature = hex HMAC-SHA256(RENDERER_HMAC_KEY, "<ts>.<body>")
+    GET  /healthz
+    GET  /metrics  Prometheus text format
+
+Jobs run on a pool of worker processes warmed up at start (see
+renderers.warm_up). At most RENDERER_WORKERS + RENDERER_QUEUE_SIZE jobs are
+accepted at once; the rest get 503 + Retry-After instead of piling up.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import (
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+    TimeoutError,
+)
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from app import renderers
+except ImportError:  # run as a script from the app directory
+    import renderers
+
+logger = logging.getLogger("pdf-renderer")
+
+HOST = os.environ.get("RENDERER_HOST", "0.0.0.0")
+PORT = int(os.environ.get("RENDERER_PORT", "9000"))
+WORKERS = int(os.environ.get("RENDERER_WORKERS", str(os.cpu_count() or 2)))
+QUEUE_SIZE = int(os.environ.get("RENDERER_QUEUE_SIZE", str(WORKERS * 4)))
+# Workers are replaced after this many jobs (renderer memory growth)
+MAX_TASKS_PER_WORKER = int(os.environ.get("RENDERER_MAX_TASKS_PER_WORKER", "200"))
+RENDER_TIMEOUT = float(os.environ.get("RENDERER_TIMEOUT", "30"))
+MAX_BODY_SIZE = int(os.environ.get("RENDERER_MAX_BODY_SIZE", str(5 * 1024 * 1024)))
+# Accepted clock skew of X-Timestamp (replay window)
+SIGNATURE_MAX_AGE = int(os.environ.get("RENDERER_SIGNATURE_MAX_AGE", "300"))
+RETRY_AFTER = "2"
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def sign(key: bytes, timestamp: str, body: bytes) -> str:
+    return hmac.new(key, timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+
+
+class Metrics:
+    """Counters and latency histograms, exported in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = {}  # status -> count
+        self.rejected = 0
+        self.in_flight = 0
+        self.histograms = {
+            name: [0] * len(LATENCY_BUCKETS) + [0, 0.0]  # buckets, count, sum
+            for name in ("request", "render")
+        }
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms[name]
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[index] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self.jobs[status] = self.jobs.get(status, 0) + 1
+
+    def change(self, field: str, delta: int) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def export(self) -> str:
+        with self._lock:
+            lines = [
+                "# TYPE pdf_renderer_jobs_total counter",
+                *(
+                    f'pdf_renderer_jobs_total{{status="{status}"}} {count}'
+                    for status, count in sorted(self.jobs.items())
+                ),
+                "# TYPE pdf_renderer_rejected_total counter",
+                f"pdf_renderer_rejected_total {self.rejected}",
+                "# TYPE pdf_renderer_in_flight gauge",
+                f"pdf_renderer_in_flight {self.in_flight}",
+                "# TYPE pdf_renderer_queue_depth gauge",
+                f"pdf_renderer_queue_depth {max(self.in_flight - WORKERS, 0)}",
+                "# TYPE pdf_renderer_queue_capacity gauge",
+                f"pdf_renderer_queue_capacity {QUEUE_SIZE}",
+                "# TYPE pdf_renderer_workers gauge",
+                f"pdf_renderer_workers {WORKERS}",
+            ]
+            for name, histogram in self.histograms.items():
+                metric = f"pdf_renderer_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for bound, count in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram[-2]}')
+                lines.append(f"{metric}_count {histogram[-2]}")
+                lines.append(f"{metric}_sum {histogram[-1]:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+class RendererPool:
+    """Pre-warmed worker processes behind a bounded admission gate."""
+
+    def __init__(self, workers: int, queue_size: int, metrics: Metrics):
+        self.workers = workers
+        self.metrics = metrics
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=renderers.warm_up,
+            max_tasks_per_child=MAX_TASKS_PER_WORKER,
+        )
+        # One no-op job per worker: spawns and warms every process now
+        for future in [executor.submit(int) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                logger.error("Renderer pool broken, restarting it")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start()
+
+    def try_acquire(self) -> bool:
+        if self._slots.acquire(blocking=False):
+            self.metrics.change("in_flight", 1)
+            return True
+        self.metrics.change("rejected", 1)
+        return False
+
+    def release(self) -> None:
+        self.metrics.change("in_flight", -1)
+        self._slots.release()
+
+    def submit(self, job: dict) -> Future:
+        """
+        Queue a job on the workers; the caller must hold a slot (`try_acquire`).
+        The slot is given back when the job ends, even if the caller stopped
+        waiting, so timed out jobs still count against the queue.
+
+        Raises BrokenProcessPool, or RuntimeError if the pool is being
+        replaced, when the job cannot be queued; its slot is given back.
+        """
+        executor = self._executor
+        try:
+            future = executor.submit(renderers.render_job, job)
+        except RuntimeError as exc:  # BrokenProcessPool, or shut down by a restart
+            self.release()
+            if isinstance(exc, BrokenProcessPool):
+                self._restart(executor)
+            raise
+        future.add_done_callback(lambda done: self._on_done(done, executor))
+        return future
+
+    def _on_done(self, future: Future, executor: ProcessPoolExecutor) -> None:
+        self.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            # Callbacks run on the executor's own thread: restart from another one
+            threading.Thread(
+                target=self._restart, args=(executor,), daemon=True
+            ).start()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = "pdf-renderer/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # Set by serve()
+    pool: RendererPool
+    metrics: Metrics
+    hmac_key: bytes
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, headers=None):
+        self.metrics.count(status)
+        body = json.dumps({"error": message}).encode()
+        self._send(status, body, "application/json", headers)
+
+    def _pool_unavailable(self):
+        logger.error("Renderer pool unavailable")
+        self._error(
+            HTTPStatus.SERVICE_UNAVAILABLE,
+            "Renderer is restarting",
+            {"Retry-After": RETRY_AFTER},
+        )
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send(HTTPStatus.OK, b'{"status":"ok"}', "application/json")
+        elif self.path == "/metrics":
+            body = self.metrics.export().encode()
+            self._send(HTTPStatus.OK, body, "text/plain; version=0.0.4")
+        else:
+            self._error(HTTPStatus.NOT_FOUND, "Not found")
+
+    def _read_signed_body(self) -> bytes | None:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0 or length > MAX_BODY_SIZE:
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Invalid body size")
+            return None
+        body = self.rfile.read(length)
+
+        timestamp = self.headers.get("X-Timestamp", "")
+        signature = self.headers.get("X-Signature", "")
+        try:
+            fresh = abs(time.time() - int(timestamp)) <= SIGNATURE_MAX_AGE
+        except ValueError:
+            fresh = False
+        if not fresh or not hmac.compare_digest(
+            sign(self.hmac_key, timestamp, body), signature
+        ):
+            self._error(HTTPStatus.UNAUTHORIZED, "Invalid or expired signature")
+            return None
+        return body
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._error(HTTPStatus.NOT_FOUND, "Not found")
+            return
+
+        started = time.perf_counter()
+        body = self._read_signed_body()
+        if body is None:
+            return
+        try:
+            job = json.loads(body)
+            valid = isinstance(job, dict) and (
+                isinstance(job.get("html"), str) or isinstance(job.get("template"), str)
+            )
+        except ValueError:
+            valid = False
+        if not valid:
+            self._error(HTTPStatus.BAD_REQUEST, "Send html, or template and data")
+            return
+
+        if not self.pool.try_acquire():
+            self._error(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "Render queue is full",
+                {"Retry-After": RETRY_AFTER},
+            )
+            return
+        try:
+            future = self.pool.submit(job)
+        except RuntimeError:  # BrokenProcessPool, or the pool being replaced
+            self._pool_unavailable()
+            return
+        try:
+            pdf, backend, render_seconds = future.result(timeout=RENDER_TIMEOUT)
+        except TimeoutError:
+            self._error(HTTPStatus.GATEWAY_TIMEOUT, "Render timed out")
+            return
+        except (BrokenProcessPool, CancelledError):
+            # A worker died (the pool is restarted) and took the job with it:
+            # not the job's fault, it can be sent again
+            self._pool_unavailable()
+            return
+        except Exception as exc:  # template and rendering errors
+            logger.exception("Render failed")
+            self._error(HTTPStatus.UNPROCESSABLE_ENTITY, f"Render failed: {exc}")
+            return
+
+        self.metrics.observe("render", render_seconds)
+        self.metrics.observe("request", time.perf_counter() - started)
+        self.metrics.count(HTTPStatus.OK)
+        self._send(
+            HTTPStatus.OK,
+            pdf,
+            "application/pdf",
+            {
+                "X-Renderer": backend,
+                "X-Render-Ms": str(int(render_seconds * 1000)),
+                "X-Content-SHA256": hashlib.sha256(pdf).hexdigest(),
+            },
+        )
+
+
+def serve() -> None:
+    logging.basicConfig(
+        level=os.environ.get("RENDERER_LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s %(message)s",
+    )
+    key = os.environ.get("RENDERER_HMAC_KEY", "")
+    if not key:
+        raise SystemExit("RENDERER_HMAC_KEY is required")
+
+    metrics = Metrics()
+    pool = RendererPool(WORKERS, QUEUE_SIZE, metrics)
+    handler = type(
+        "Handler",
+        (RenderHandler,),
+        {"pool": pool, "metrics": metrics, "hmac_key": key.encode()},
+    )
+    server = ThreadingHTTPServer((HOST, PORT), handler)
+    server.daemon_threads = True
+    # shutdown() blocks until serve_forever() returns: call it from a thread
+    signal.signal(
+        signal.SIGTERM,
+        lambda *_: threading.Thread(target=server.shutdown, daemon=True).start(),
+    )
+    logger.info(
+        "Listening on %s:%s (%s workers, queue %s, backend %s)",
+        HOST,
+        PORT,
+        WORKERS,
+        QUEUE_SIZE,
+        renderers.select_backend(),
+    )
+    try:
+        server.serve_forever()
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    serve()
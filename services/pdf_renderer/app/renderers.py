@@ -0,0 +1,191 @@
+"""
+HTML -> PDF renderers, run inside the pool worker processes.
+
+WeasyPrint is used when installed (see the Dockerfile for its system
+libraries). Otherwise, or with RENDERER_BACKEND=fallback, a pure-Python
+renderer writes the text content of the HTML as a plain Helvetica PDF: good
+enough for tests and for a degraded mode, not for customer documents.
+"""
+
+import os
+import re
+import textwrap
+import time
+from html import unescape
+from html.parser import HTMLParser
+from typing import Any
+
+BACKEND_WEASYPRINT = "weasyprint"
+BACKEND_FALLBACK = "fallback"
+
+try:
+    import weasyprint
+except ImportError:  # pragma: no cover - depends on the image
+    weasyprint = None
+
+try:
+    from jinja2.sandbox import SandboxedEnvironment
+except ImportError:  # pragma: no cover - depends on the image
+    SandboxedEnvironment = None
+
+WARMUP_HTML = "<html><body><h1>warm-up</h1><p>pdf-renderer</p></body></html>"
+
+_backend: str | None = None
+_jinja = None
+
+
+def select_backend() -> str:
+    requested = os.environ.get("RENDERER_BACKEND", "").lower()
+    if requested == BACKEND_FALLBACK or weasyprint is None:
+        return BACKEND_FALLBACK
+    return BACKEND_WEASYPRINT
+
+
+def warm_up() -> None:
+    """
+    Pool initializer: import and exercise the renderer once per worker, so
+    the first real job does not pay font discovery and module imports.
+    """
+    global _backend, _jinja
+    _backend = select_backend()
+    if SandboxedEnvironment is not None:
+        _jinja = SandboxedEnvironment(autoescape=True)
+    render_html(WARMUP_HTML)
+
+
+def render_template(template: str, data: dict[str, Any]) -> str:
+    if _jinja is None:
+        raise RuntimeError("Templates need jinja2, send pre-rendered html instead")
+    return _jinja.from_string(template).render(**data)
+
+
+def render_html(html: str) -> bytes:
+    if (_backend or select_backend()) == BACKEND_WEASYPRINT:
+        return weasyprint.HTML(string=html).write_pdf()
+    return FallbackRenderer().render(html)
+
+
+def render_job(job: dict[str, Any]) -> tuple[bytes, str, float]:
+    """
+    Render a job ({"html"} or {"template", "data"}) in a worker process.
+    Returns (pdf, backend, seconds spent rendering).
+    """
+    started = time.perf_counter()
+    html = job.get("html")
+    if html is None:
+        html = render_template(job["template"], job.get("data") or {})
+    pdf = render_html(html)
+    return pdf, _backend or select_backend(), time.perf_counter() - started
+
+
+class _TextExtractor(HTMLParser):
+    """Text of an HTML document, one line per block element."""
+
+    BLOCKS = set(
+        "p div br tr li h1 h2 h3 h4 h5 h6 table section header footer hr".split()
+    )
+    SKIPPED = {"script", "style", "head", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines: list[str] = [""]
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED:
+            self._skip += 1
+        elif tag in self.BLOCKS:
+            self.lines.append("")
+        elif tag in ("td", "th") and self.lines[-1]:
+            self.lines[-1] += "  "
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in self.BLOCKS:
+            self.lines.append("")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.lines[-1] += re.sub(r"\s+", " ", unescape(data))
+
+    def text_lines(self) -> list[str]:
+        return [line.strip() for line in self.lines if line.strip()]
+
+
+class FallbackRenderer:
+    """Minimal PDF 1.4 writer: A4 pages of wrapped Helvetica text."""
+
+    PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+    MARGIN = 50
+    FONT_SIZE = 10
+    LEADING = 14
+    WRAP = 95
+
+    def _lines(self, html: str) -> list[str]:
+        parser = _TextExtractor()
+        parser.feed(html)
+        parser.close()
+        lines = []
+        for line in parser.text_lines():
+            lines.extend(textwrap.wrap(line, self.WRAP) or [""])
+        return lines or [""]
+
+    @staticmethod
+    def _escape(line: str) -> bytes:
+        raw = line.encode("latin-1", "replace")
+        return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    def _page_stream(self, lines: list[str]) -> bytes:
+        top = self.PAGE_HEIGHT - self.MARGIN
+        parts = [
+            b"BT /F1 %d Tf %d TL %d %d Td"
+            % (self.FONT_SIZE, self.LEADING, self.MARGIN, top)
+        ]
+        parts.extend(b"(" + self._escape(line) + b") Tj T*" for line in lines)
+        parts.append(b"ET")
+        return b"\n".join(parts)
+
+    def render(self, html: str) -> bytes:
+        lines = self._lines(html)
+        per_page = (self.PAGE_HEIGHT - 2 * self.MARGIN) // self.LEADING
+        pages = [lines[i : i + per_page] for i in range(0, len(lines), per_page)]
+
+        # 1 catalog, 2 pages tree, 3 font, then (page, content) per page
+        font = (
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+            b"/Encoding /WinAnsiEncoding >>"
+        )
+        objects: list[bytes] = [b"", b"", font]
+        kids = []
+        for page_lines in pages:
+            stream = self._page_stream(page_lines)
+            page_id, content_id = len(objects) + 1, len(objects) + 2
+            kids.append(b"%d 0 R" % page_id)
+            objects.append(
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+                % (self.PAGE_WIDTH, self.PAGE_HEIGHT, content_id)
+            )
+            objects.append(
+                b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+            )
+        objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(kids),
+            len(kids),
+        )
+
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        xref = len(out)
+        out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+            len(objects) + 1,
+            xref,
+        )
+        return bytes(out)
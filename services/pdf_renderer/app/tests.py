@@ -0,0 +1,157 @@
+"""
+Tests of the pdf-renderer HTTP service, with the fallback renderer so they
+run without WeasyPrint. From services/pdf_renderer:
+
+    python -m unittest app.tests
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+try:
+    from app import main, renderers
+except ImportError:  # run from the app directory
+    import main
+    import renderers
+
+HMAC_KEY = b"test-key"
+
+
+class RenderServiceTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Inherited by the worker processes spawned below
+        cls.environ = mock.patch.dict(
+            os.environ, {"RENDERER_BACKEND": renderers.BACKEND_FALLBACK}
+        )
+        cls.environ.start()
+        cls.metrics = main.Metrics()
+        # A single slot: holding it makes the queue full
+        cls.pool = main.RendererPool(workers=1, queue_size=0, metrics=cls.metrics)
+        handler = type(
+            "Handler",
+            (main.RenderHandler,),
+            {"pool": cls.pool, "metrics": cls.metrics, "hmac_key": HMAC_KEY},
+        )
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.pool.shutdown()
+        cls.environ.stop()
+
+    def request(self, method, path, body=b"", headers=None):
+        connection = http.client.HTTPConnection(*self.server.server_address)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+    def render(self, job, timestamp=None, key=HMAC_KEY):
+        body = job if isinstance(job, bytes) else json.dumps(job).encode()
+        timestamp = str(int(time.time()) if timestamp is None else timestamp)
+        headers = {
+            "Content-Type": "application/json",
+            "X-Timestamp": timestamp,
+            "X-Signature": main.sign(key, timestamp, body),
+        }
+        return self.request("POST", "/render", body, headers)
+
+    def test_signed_html_is_rendered_by_the_fallback(self):
+        response, pdf = self.render({"html": "<h1>Workorder 42</h1><p>Brakes</p>"})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "application/pdf")
+        self.assertEqual(response.getheader("X-Renderer"), "fallback")
+        self.assertEqual(
+            response.getheader("X-Content-SHA256"), hashlib.sha256(pdf).hexdigest()
+        )
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        self.assertTrue(pdf.rstrip().endswith(b"%%EOF"))
+        self.assertIn(b"(Workorder 42) Tj", pdf)
+        self.assertIn(b"(Brakes) Tj", pdf)
+
+    def test_wrong_or_expired_signature_is_rejected(self):
+        response, _ = self.render({"html": "<p>x</p>"}, key=b"other-key")
+        self.assertEqual(response.status, 401)
+
+        expired = int(time.time()) - main.SIGNATURE_MAX_AGE - 60
+        response, _ = self.render({"html": "<p>x</p>"}, timestamp=expired)
+        self.assertEqual(response.status, 401)
+
+        response, _ = self.request("POST", "/render", b'{"html": "<p>x</p>"}')
+        self.assertEqual(response.status, 401)
+
+    def test_empty_or_oversized_body_is_rejected(self):
+        response, _ = self.render(b"")
+        self.assertEqual(response.status, 413)
+
+        with mock.patch.object(main, "MAX_BODY_SIZE", 16):
+            response, _ = self.render({"html": "<p>" + "x" * 32 + "</p>"})
+        self.assertEqual(response.status, 413)
+
+    def test_invalid_job_is_rejected(self):
+        for job in (b"not json", [], {"data": {}}, {"html": 1}):
+            with self.subTest(job=job):
+                response, body = self.render(job)
+                self.assertEqual(response.status, 400)
+                self.assertEqual(
+                    json.loads(body), {"error": "Send html, or template and data"}
+                )
+
+    def test_full_queue_answers_503_with_retry_after(self):
+        self.assertTrue(self.pool.try_acquire())
+        try:
+            response, body = self.render({"html": "<p>x</p>"})
+        finally:
+            self.pool.release()
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), main.RETRY_AFTER)
+        self.assertEqual(json.loads(body), {"error": "Render queue is full"})
+
+        response, _ = self.render({"html": "<p>x</p>"})
+        self.assertEqual(response.status, 200)
+
+    def test_metrics_are_exported(self):
+        self.render({"html": "<p>x</p>"})
+        response, body = self.request("GET", "/metrics")
+        self.assertEqual(response.status, 200)
+        self.assertTrue(response.getheader("Content-Type").startswith("text/plain"))
+
+        metrics = dict(
+            line.rsplit(" ", 1)
+            for line in body.decode().splitlines()
+            if not line.startswith("#")
+        )
+        self.assertGreaterEqual(
+            int(metrics['pdf_renderer_jobs_total{status="200"}']), 1
+        )
+        self.assertEqual(metrics["pdf_renderer_in_flight"], "0")
+        self.assertEqual(metrics["pdf_renderer_queue_capacity"], str(main.QUEUE_SIZE))
+        self.assertGreaterEqual(int(metrics["pdf_renderer_render_seconds_count"]), 1)
+        self.assertEqual(
+            metrics['pdf_renderer_request_seconds_bucket{le="+Inf"}'],
+            metrics["pdf_renderer_request_seconds_count"],
+        )
+
+    def test_healthz_and_unknown_paths(self):
+        response, body = self.request("GET", "/healthz")
+        self.assertEqual((response.status, json.loads(body)), (200, {"status": "ok"}))
+        response, _ = self.request("GET", "/nope")
+        self.assertEqual(response.status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -307,6 +307,8 @@ class WorkspaceMember(BaseUUID, BaseTimestamp):
         unique_together = [("workspace", "account")]
         indexes = [
             models.Index(fields=["workspace", "account", "role", "is_active"]),
+            # Delta sync ("changes since")
+            models.Index(fields=["workspace", "updated_at"]),
         ]
         # constraints = [
         #     CheckConstraint(
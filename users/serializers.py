@@ -5,7 +5,7 @@ from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.core.validators import RegexValidator
 from rest_framework.validators import UniqueValidator
-from users.models import Account
+from users.models import Account, WorkspaceMember
 from typing import Any
 
 User = get_user_model()
@@ -144,3 +144,10 @@ class UserMinimalSerializer(serializers.ModelSerializer):
         model = Account
         fields = ["username", "email", "uuid", "is_active", "first_name", "last_name"]
         read_only_fields = fields
+
+
+class WorkspaceMemberMinimalSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WorkspaceMember
+        fields = ["uuid", "name", "surname", "alias", "email", "phone"]
+        read_only_fields = fields
@@ -1,3 +1,4 @@
+from core.utils.upserts import upsert
 from users.models import Account
 
 
@@ -22,3 +23,36 @@ def create_customer_account(email: str, data: dict[str, str]) -> Account:
     )
     user.save()
     return user
+
+
+def upsert_customer_account(
+    email: str, first_name: str | None = None, last_name: str | None = None
+) -> Account:
+    """
+    Create the basic (inactive) Account of a workshop customer, or refresh the
+    names of the existing one, in a single INSERT ... ON CONFLICT statement.
+
+    Privilege flags, locale and account type are only written on insert, so an
+    existing (possibly active) account is never demoted by a check-in.
+    """
+    if not email:
+        raise ValueError("Email is required")
+
+    account = Account(
+        email=email,
+        first_name=(first_name or "")[:30],
+        last_name=(last_name or "")[:30],
+        account_type=Account.AccountType.PERSONAL,
+        preferred_locale=Account.AllowedLocales.EN,
+        is_active=False,
+        is_admin=False,
+        is_staff=False,
+        is_superuser=False,
+    )
+    account.set_unusable_password()
+    # Sets account.pk to the existing account on conflict
+    return upsert(
+        account,
+        unique_fields=["email"],
+        update_fields=["first_name", "last_name", "updated_at"],
+    )
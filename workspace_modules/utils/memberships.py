@@ -2,6 +2,20 @@ from users.models import Account
 from workspace_modules.models.base import Workspace
 from users.models import WorkspaceMember
 
+# Members administering the workspace (exports, reports, customer records).
+# MANAGER is a team role: it runs the workshop floor, not the workspace.
+WORKSPACE_MANAGER_ROLES = [
+    WorkspaceMember.WorkspaceRole.OWNER,
+    WorkspaceMember.WorkspaceRole.ADMIN,
+]
+# Members working in the workspace (customers excluded)
+WORKSPACE_TEAM_ROLES = [
+    *WORKSPACE_MANAGER_ROLES,
+    WorkspaceMember.WorkspaceRole.MANAGER,
+    WorkspaceMember.WorkspaceRole.MEMBER,
+    WorkspaceMember.WorkspaceRole.TECHNICHIAN,
+]
+
 
 def is_workspace_member(
     account: Account, workspace: Workspace
@@ -14,3 +28,22 @@ def is_workspace_member(
     if workspace_member is None:
         return None, False
     return workspace_member, True
+
+
+def get_workspace_membership(
+    account: Account, workspace_id: str, roles: list[str] | None = None
+) -> WorkspaceMember | None:
+    """
+    Return the active membership of `account` in the workspace `workspace_id`
+    (with the workspace already joined), or None if there is none.
+    Optionally restrict the lookup to the given roles.
+    """
+    if not workspace_id:
+        return None
+
+    qs = WorkspaceMember.objects.select_related("workspace").filter(
+        workspace_id=workspace_id, account=account, is_active=True
+    )
+    if roles:
+        qs = qs.filter(role__in=roles)
+    return qs.first()